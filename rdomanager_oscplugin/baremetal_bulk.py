@@ -0,0 +1,180 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Concurrent Ironic calls for many nodes at once"""
+
+import collections
+import functools
+import logging
+
+import six
+
+from rdomanager_oscplugin import exceptions
+from rdomanager_oscplugin import retry
+from rdomanager_oscplugin import utils
+
+LOG = logging.getLogger(__name__)
+
+# Kept below utils.CONNECTION_POOL_SIZE so every worker has a connection.
+DEFAULT_WORKERS = 16
+
+
+def is_conflict(error):
+    """Whether an ironicclient error is a 409, e.g. the node is locked"""
+
+    status = getattr(error, 'http_status', None) or getattr(
+        error, 'code', None)
+    return status == 409 or type(error).__name__ in ('Conflict', 'NodeLocked')
+
+
+def conflict_retry_policy(**kwargs):
+    """The policy for retrying node calls while the node is locked
+
+    Conductors lock nodes while they run periodic tasks, so under load
+    Ironic answers any call with 409 NodeLocked for a few seconds.
+    """
+
+    return retry.RetryPolicy(is_conflict, **kwargs)
+
+
+class BulkResult(object):
+    """The results and errors of a bulk operation, by node UUID"""
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.results = collections.OrderedDict()
+        self.errors = collections.OrderedDict()
+
+    def raise_for_errors(self):
+        if not self.errors:
+            return
+
+        for uuid, error in six.iteritems(self.errors):
+            LOG.error("%s failed for node %s: %s", self.operation, uuid,
+                      error)
+        raise exceptions.BulkOperationError(
+            "{0} failed for {1} of {2} nodes: {3}".format(
+                self.operation, len(self.errors),
+                len(self.errors) + len(self.results),
+                ', '.join(self.errors)))
+
+
+class BulkNodeClient(object):
+    """Run the same Ironic node call for many nodes over a thread pool
+
+    Each call is retried following the retry policy when Ironic reports a
+    conflict, which it does while a conductor holds the node lock. All the
+    calls of one operation share a retry budget. The outcome of every call
+    is collected in a BulkResult, so one failing node doesn't stop the
+    others.
+
+    :param client: Instance of Ironic client
+    :type  client: ironicclient.v1.client.Client
+
+    :param workers: The maximum number of concurrent calls
+    :type  workers: int
+
+    :param retry_policy: The policy for retrying conflicts
+    :type  retry_policy: rdomanager_oscplugin.retry.RetryPolicy
+    """
+
+    def __init__(self, client, workers=DEFAULT_WORKERS, retry_policy=None):
+        self.client = client
+        self.workers = workers
+        self.retry_policy = retry_policy or conflict_retry_policy()
+
+    def _outcome(self, call):
+        func, uuid, args, kwargs, budget, is_done = call
+        if is_done is not None:
+            is_done = functools.partial(is_done, uuid)
+        try:
+            return True, self.retry_policy.call_with_budget(
+                budget, is_done, func, uuid, *args, **kwargs)
+        except Exception as e:
+            return False, e
+
+    def run(self, operation, func, calls, is_done=None):
+        """Call func for every node and collect the outcomes
+
+        :param operation: The name of the operation, used in errors
+        :type  operation: string
+
+        :param func: The function to call, with the node UUID first
+        :type  func: callable
+
+        :param calls: The node UUID and the extra positional and keyword
+                      arguments of each call
+        :type  calls: [(string, tuple, dict)]
+
+        :param is_done: Called with the node UUID before a call is retried,
+                        returns True if the change was already applied
+        :type  is_done: callable or None
+        """
+
+        result = BulkResult(operation)
+        budget = self.retry_policy.budget(len(calls))
+        calls = [(func, uuid, args, kwargs, budget, is_done)
+                 for uuid, args, kwargs in calls]
+        if not calls:
+            return result
+
+        outcomes = utils.concurrent_map(self._outcome, calls, self.workers)
+
+        for call, (succeeded, value) in zip(calls, outcomes):
+            if succeeded:
+                result.results[call[1]] = value
+            else:
+                result.errors[call[1]] = value
+        return result
+
+    def get_many(self, uuids, *args, **kwargs):
+        return self.run('get', self.client.node.get,
+                        [(uuid, args, kwargs) for uuid in uuids])
+
+    def update_many(self, patches):
+        """Update many nodes
+
+        :param patches: The JSON patch for each node UUID
+        :type  patches: collections.OrderedDict
+        """
+
+        return self.run('update', self.client.node.update,
+                        [(uuid, (patch, ), {})
+                         for uuid, patch in six.iteritems(patches)])
+
+    def set_provision_state_many(self, uuids, state, target_state=None):
+        """Start a provision state transition on many nodes
+
+        :param target_state: The state the transition leads to. When given,
+                             a node that already reached it isn't retried.
+        :type  target_state: string
+        """
+
+        def reached_target_state(uuid):
+            node = self.client.node.get(uuid)
+            return node.provision_state == target_state
+
+        return self.run('set_provision_state',
+                        self.client.node.set_provision_state,
+                        [(uuid, (state, ), {}) for uuid in uuids],
+                        reached_target_state if target_state else None)
+
+    def set_power_state_many(self, uuids, state, *args, **kwargs):
+        return self.run('set_power_state', self.client.node.set_power_state,
+                        [(uuid, (state, ) + args, kwargs) for uuid in uuids])
+
+    def vendor_passthru_many(self, uuids, method, *args, **kwargs):
+        return self.run(method, self.client.node.vendor_passthru,
+                        [(uuid, (method, ) + args, kwargs) for uuid in uuids])
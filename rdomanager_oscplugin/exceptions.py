@@ -39,3 +39,8 @@ class NotFound(Exception):
 class DeploymentError(Exception):
     """Deployment failed"""
     pass
+
+
+class BulkOperationError(Exception):
+    """An operation failed for some of the nodes"""
+    pass
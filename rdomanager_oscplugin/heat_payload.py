@@ -0,0 +1,194 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Inspection helpers for Heat stack create/update payloads"""
+
+import collections
+import hashlib
+import json
+import os
+
+import six
+
+
+def _size_and_sha1(content):
+    # On Python 3, heatclient reads the get_file contents as bytes.
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+    elif not isinstance(content, six.binary_type):
+        content = json.dumps(content, sort_keys=True).encode('utf-8')
+    return len(content), hashlib.sha1(content).hexdigest()
+
+
+def _decode(value):
+    if isinstance(value, six.binary_type):
+        return value.decode('utf-8')
+    raise TypeError("%r is not JSON serializable" % (value, ))
+
+
+def _referenced_names(data, names):
+    """Yield every string in a nested structure that is a key in names"""
+
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, six.string_types) and item in names:
+            yield item
+
+
+def reachable_files(template, environment, files):
+    """Return the names in the files map used by the template or registry
+
+    heatclient replaces every ``get_file`` and nested template reference
+    with the absolute URL it uses as the key in the files map, and stores
+    nested templates as JSON, so the references can be followed from the
+    template and the environment through every nested template.
+    """
+
+    reachable = set()
+    pending = list(_referenced_names([template, environment], files))
+
+    while pending:
+        name = pending.pop()
+        if name in reachable:
+            continue
+        reachable.add(name)
+
+        try:
+            content = json.loads(files[name])
+        except (TypeError, ValueError):
+            # Not a nested template, so it can't refer to other files.
+            continue
+        pending.extend(_referenced_names(content, files))
+
+    return reachable
+
+
+def analyze(template, environment, files, largest=10):
+    """Report the largest, duplicated and unused files in a files map
+
+    :param largest: The number of largest files to report
+    :type  largest: int
+    """
+
+    sizes = {}
+    by_checksum = collections.defaultdict(list)
+    for name, content in six.iteritems(files):
+        size, sha1 = _size_and_sha1(content)
+        sizes[name] = size
+        by_checksum[sha1].append(name)
+
+    reachable = reachable_files(template, environment, files)
+    unreachable = sorted(set(files) - reachable)
+
+    return {
+        'files_bytes': sum(sizes.values()),
+        'largest': sorted(sizes.items(), key=lambda x: (-x[1], x[0]))[
+            :largest],
+        'duplicates': sorted(sorted(names) for names in by_checksum.values()
+                             if len(names) > 1),
+        'unreachable': unreachable,
+        'unreachable_bytes': sum(sizes[name] for name in unreachable),
+    }
+
+
+def log_analysis(log, analysis):
+    """Write a files map analysis to the debug log"""
+
+    log.debug("Heat files map: %d bytes, %d bytes in %d unused files",
+              analysis['files_bytes'], analysis['unreachable_bytes'],
+              len(analysis['unreachable']))
+    for name, size in analysis['largest']:
+        log.debug("Large Heat file %s: %d bytes", name, size)
+    for names in analysis['duplicates']:
+        log.debug("Duplicated Heat files: %s", ', '.join(names))
+    for name in analysis['unreachable']:
+        log.debug("Unused Heat file: %s", name)
+
+
+def prune(files, names):
+    """Return a copy of the files map without the given names"""
+
+    names = set(names)
+    return dict((name, content) for name, content in six.iteritems(files)
+                if name not in names)
+
+
+def summarize(stack_args):
+    """Summarise a stack create/update payload without any secret values
+
+    The summary holds the size of each part of the payload, the size and
+    checksum of every file in the files map and the parameter names. No
+    parameter values are included.
+
+    :param stack_args: The keyword arguments for stacks.create/update
+    :type  stack_args: dict
+    """
+
+    template_bytes, template_sha1 = _size_and_sha1(
+        stack_args.get('template') or {})
+    environment_bytes, _ = _size_and_sha1(stack_args.get('environment') or {})
+
+    files = {}
+    files_bytes = 0
+    for name, content in six.iteritems(stack_args.get('files') or {}):
+        size, sha1 = _size_and_sha1(content)
+        files[name] = {'size': size, 'sha1': sha1}
+        files_bytes += size
+
+    return {
+        'stack_name': stack_args.get('stack_name'),
+        'template_bytes': template_bytes,
+        'template_sha1': template_sha1,
+        'environment_bytes': environment_bytes,
+        'parameters': sorted(stack_args.get('parameters') or {}),
+        'file_count': len(files),
+        'files_bytes': files_bytes,
+        'files': files,
+        'total_bytes': template_bytes + environment_bytes + files_bytes,
+    }
+
+
+def log_summary(log, summary):
+    """Write a payload summary to the debug log"""
+
+    log.debug("Heat payload for stack %s: %d bytes (template %d bytes, "
+              "environment %d bytes, %d files %d bytes)",
+              summary['stack_name'], summary['total_bytes'],
+              summary['template_bytes'], summary['environment_bytes'],
+              summary['file_count'], summary['files_bytes'])
+    log.debug("Heat payload parameters (values redacted): %s",
+              ', '.join(summary['parameters']))
+    for name in sorted(summary['files']):
+        log.debug("Heat payload file %s: %d bytes sha1 %s", name,
+                  summary['files'][name]['size'],
+                  summary['files'][name]['sha1'])
+
+
+def dump(path, stack_args):
+    """Write the full payload, including secrets, to a file
+
+    The file is created readable by the current user only.
+    """
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.fchmod(fd, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(stack_args, f, indent=2, sort_keys=True,
+                  default=_decode)
@@ -0,0 +1,169 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Look up hiera keys in the YAML hieradata, without running hiera"""
+
+import glob
+import logging
+import os
+import re
+import threading
+
+import six
+
+from rdomanager_oscplugin import yaml_cache
+
+HIERA_CONFIG = "/etc/hiera.yaml"
+
+# The datadir of the yaml backend when hiera.yaml doesn't set one
+DEFAULT_DATADIR = "/var/lib/hiera"
+
+INTERPOLATION = re.compile(r'%\{[^}]*\}')
+
+LOG = logging.getLogger(__name__)
+
+_default_reader = None
+_default_reader_lock = threading.Lock()
+
+
+def _setting(config, name):
+    # hiera.yaml uses Ruby symbols, which YAML reads as ":name" strings.
+    if not isinstance(config, dict):
+        return None
+    return config.get(':' + name, config.get(name))
+
+
+class HieraReader(object):
+    """Priority lookups in the hieradata of the yaml backend
+
+    The hieradata files are loaded on the first lookup, in the order of the
+    hierarchy in hiera.yaml, and the lookups are answered from memory.
+
+    A hierarchy level interpolating facts, like "%{::hostname}", can't be
+    resolved without puppet. The files it could match are loaded as well,
+    and a key any of them sets isn't answered, as the value would depend on
+    the facts. Keys whose value interpolates other values aren't answered
+    either. get() raises KeyError for all of these, so the caller can ask
+    hiera itself.
+
+    :param config_path: The path of hiera.yaml
+    :type  config_path: string
+    """
+
+    def __init__(self, config_path=HIERA_CONFIG):
+        self.config_path = config_path
+        self._levels = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        import yaml
+
+        documents = yaml_cache.YamlCache()
+        try:
+            config = documents.load(self.config_path)
+        except (IOError, OSError):
+            LOG.debug("No hiera configuration at %s", self.config_path)
+            return []
+        except yaml.YAMLError as e:
+            LOG.warning("Failed to parse %s: %s", self.config_path, e)
+            return []
+
+        backends = _setting(config, 'backends') or []
+        if isinstance(backends, six.string_types):
+            backends = [backends]
+        if 'yaml' not in backends:
+            LOG.debug("The hiera yaml backend isn't enabled in %s",
+                      self.config_path)
+            return []
+
+        datadir = _setting(_setting(config, 'yaml'), 'datadir')
+        if not datadir or INTERPOLATION.search(datadir):
+            datadir = DEFAULT_DATADIR
+
+        hierarchy = _setting(config, 'hierarchy') or ['common']
+        if isinstance(hierarchy, six.string_types):
+            hierarchy = [hierarchy]
+
+        # The files of the levels without facts, and hiera.yaml, aren't
+        # files of the levels with facts, unless a fact is named like them.
+        static_paths = set(
+            os.path.join(datadir, source + '.yaml') for source in hierarchy
+            if not INTERPOLATION.search(source))
+        static_paths.add(self.config_path)
+
+        # A list of (resolved, data), where resolved is False for the files
+        # of a level which interpolates facts.
+        levels = []
+        for source in hierarchy:
+            resolved = not INTERPOLATION.search(source)
+            path = os.path.join(datadir,
+                                INTERPOLATION.sub('*', source) + '.yaml')
+            if resolved:
+                paths = [path]
+            else:
+                paths = sorted(set(glob.glob(path)) - static_paths)
+            for path in paths:
+                try:
+                    data = documents.load(path)
+                except (IOError, OSError):
+                    continue
+                except yaml.YAMLError as e:
+                    # Any key could be in it, so none can be answered.
+                    LOG.warning("Failed to parse %s: %s", path, e)
+                    return []
+                if isinstance(data, dict):
+                    levels.append((resolved, data))
+        return levels
+
+    def get(self, key):
+        """Return the value of a key, as text
+
+        :raises KeyError: if the key isn't set, or its value can't be known
+                          without hiera
+        """
+
+        with self._lock:
+            if self._levels is None:
+                self._levels = self._load()
+
+        for resolved, data in self._levels:
+            if key not in data:
+                continue
+            value = data[key]
+            if not resolved:
+                break
+            if isinstance(value, bool):
+                # As hiera prints them
+                value = 'true' if value else 'false'
+            elif isinstance(value, six.string_types + six.integer_types +
+                            (float, )):
+                value = six.text_type(value)
+            else:
+                break
+            if INTERPOLATION.search(value):
+                break
+            return value
+        raise KeyError(key)
+
+
+def default_reader():
+    """Return the HieraReader of HIERA_CONFIG, shared by the process"""
+
+    global _default_reader
+
+    with _default_reader_lock:
+        if _default_reader is None:
+            _default_reader = HieraReader()
+        return _default_reader
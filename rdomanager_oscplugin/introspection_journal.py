@@ -0,0 +1,123 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Checkpoint journal of a bulk introspection run"""
+
+import json
+import logging
+import os
+import time
+
+import six
+
+from rdomanager_oscplugin import secret_store
+
+DEFAULT_JOURNAL_PATH = "~/.cache/rdomanager-oscplugin/introspection.jsonl"
+
+PHASE_INTROSPECTION = 'introspection'
+
+LOG = logging.getLogger(__name__)
+
+
+class IntrospectionJournal(object):
+    """Record the progress of every node of a bulk introspection
+
+    Each node UUID maps to its phase, the time the phase started, whether it
+    finished and the error it finished with. Every change is appended to the
+    journal file as a JSON line, so an interrupted run can be resumed from
+    it. The last line of a node wins, and the file is compacted to one line
+    per node when it's loaded. The entries of earlier runs are kept until
+    the node is introspected again.
+
+    :param path: The path of the journal file
+    :type  path: string
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = os.path.expanduser(path)
+        self.load()
+
+    def load(self):
+        self.entries = {}
+        lines = 0
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry.pop('uuid')] = entry
+                    except (AttributeError, KeyError, TypeError, ValueError):
+                        # An interrupted run may leave a partial last line.
+                        LOG.warning("Ignoring unreadable line %d of the "
+                                    "introspection journal at %s", lines,
+                                    self.path)
+        except IOError:
+            LOG.debug("No introspection journal at %s", self.path)
+            return
+
+        if lines > len(self.entries):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the journal with only the last line of every node"""
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        secret_store.write_atomic(
+            self.path,
+            ''.join(self._line(uuid) for uuid in sorted(self.entries)))
+
+    def _line(self, uuid):
+        return json.dumps(dict(self.entries[uuid], uuid=uuid),
+                          sort_keys=True) + '\n'
+
+    def _append(self, uuid):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with open(self.path, 'a') as f:
+            f.write(self._line(uuid))
+
+    def start(self, uuid, phase=PHASE_INTROSPECTION):
+        self.entries[uuid] = {
+            'phase': phase,
+            'started_at': time.time(),
+            'finished': False,
+            'error': None,
+        }
+        self._append(uuid)
+
+    def finish(self, uuid, error=None):
+        entry = self.entries[uuid]
+        entry['finished'] = True
+        entry['error'] = None if error is None else six.text_type(error)
+        self._append(uuid)
+
+    def is_finished(self, uuid, phase=PHASE_INTROSPECTION):
+        """Whether the node finished the phase without an error"""
+
+        entry = self.entries.get(uuid)
+        return bool(entry and entry['phase'] == phase and entry['finished'] and
+                    entry['error'] is None)
+
+    def in_flight(self, phase=PHASE_INTROSPECTION):
+        """The UUIDs of the nodes that started the phase but didn't finish"""
+
+        return sorted(uuid for uuid, entry in self.entries.items()
+                      if entry['phase'] == phase and not entry['finished'])
@@ -0,0 +1,149 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""IP networks and address ranges as integer intervals
+
+Addresses are compared as integers, keyed by IP version so IPv4 and IPv6
+ranges never overlap each other. Overlaps are found with a sort and sweep
+and lookups use bisect, so checking n ranges costs O(n log n) rather than
+comparing every pair of ipaddress objects.
+"""
+
+import bisect
+import collections
+import heapq
+
+import six
+
+IPRange = collections.namedtuple('IPRange', ['version', 'start', 'end',
+                                             'label'])
+
+
+def network_range(cidr, label=None):
+    """Return the IPRange of a network in CIDR notation
+
+    :raises ValueError: if the CIDR is invalid
+    """
+
+    import ipaddress
+
+    network = ipaddress.ip_network(six.text_type(cidr))
+    return IPRange(network.version, int(network.network_address),
+                   int(network.broadcast_address),
+                   cidr if label is None else label)
+
+
+def address_range(start, end, label=None):
+    """Return the IPRange between two addresses, both included
+
+    :raises ValueError: if an address is invalid, the addresses aren't of the
+                        same IP version or the end comes before the start
+    """
+
+    import ipaddress
+
+    first = ipaddress.ip_address(six.text_type(start))
+    last = ipaddress.ip_address(six.text_type(end))
+    if first.version != last.version:
+        raise ValueError('%s and %s are not of the same IP version' %
+                         (start, end))
+    if last < first:
+        raise ValueError('%s comes after %s' % (start, end))
+    return IPRange(first.version, int(first), int(last),
+                   (start, end) if label is None else label)
+
+
+def address_value(address):
+    """Return the IP version and the integer value of an address
+
+    :raises ValueError: if the address is invalid
+    """
+
+    import ipaddress
+
+    ip = ipaddress.ip_address(six.text_type(address))
+    return ip.version, int(ip)
+
+
+def find_overlaps(ranges):
+    """Return every pair of overlapping ranges
+
+    The ranges are swept in order of their start, keeping a heap of the
+    ranges still open ordered by their end. Every range still open when
+    another one starts overlaps it. This takes O(n log n + k) for k overlaps.
+
+    :param ranges: The ranges to check
+    :type  ranges: [IPRange]
+
+    :returns: The overlapping pairs, in the order they are found
+    :rtype: [(IPRange, IPRange)]
+    """
+
+    overlaps = []
+    open_ranges = []
+    for index, current in sorted(enumerate(ranges),
+                                 key=lambda r: (r[1].version, r[1].start,
+                                                r[0])):
+        while open_ranges and (
+                open_ranges[0][0] < (current.version, current.start)):
+            heapq.heappop(open_ranges)
+        for _, _, other in sorted(open_ranges, key=lambda r: r[1]):
+            overlaps.append((other, current))
+        heapq.heappush(open_ranges,
+                       ((current.version, current.end), index, current))
+    return overlaps
+
+
+class RangeIndex(object):
+    """Find the ranges containing an address
+
+    The ranges are sorted by their start, with the largest end seen so far
+    kept alongside, so a lookup bisects to the last range starting before
+    the address and only walks back while a range could still contain it.
+
+    :param ranges: The ranges to index, they may overlap
+    :type  ranges: [IPRange]
+    """
+
+    def __init__(self, ranges):
+        self._ranges = sorted(ranges, key=lambda r: (r.version, r.start))
+        self._starts = [(r.version, r.start) for r in self._ranges]
+        self._max_ends = []
+        max_end = None
+        for r in self._ranges:
+            end = (r.version, r.end)
+            max_end = end if max_end is None else max(max_end, end)
+            self._max_ends.append(max_end)
+
+    def containing(self, version, value):
+        """Return the ranges containing an address, in order of their start
+
+        :param version: The IP version of the address
+        :type  version: int
+
+        :param value: The integer value of the address
+        :type  value: int
+        """
+
+        key = (version, value)
+        found = []
+        index = bisect.bisect_right(self._starts, key) - 1
+        while index >= 0 and self._max_ends[index] >= key:
+            candidate = self._ranges[index]
+            if (candidate.version, candidate.end) >= key:
+                found.append(candidate)
+            index -= 1
+        found.reverse()
+        return found
@@ -0,0 +1,236 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Register the overcloud services and endpoints in Keystone concurrently
+
+The registration is done in three steps. The existing roles, tenants,
+users, services and endpoints are listed, concurrently. The missing ones are
+computed from the lists, and then created concurrently: the roles, users
+and services first, and then the endpoints, which need the service IDs. An
+endpoint whose URLs changed is replaced. Running it again changes nothing.
+"""
+
+import collections
+import logging
+
+from rdomanager_oscplugin import utils
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_REGION = 'regionOne'
+
+DEFAULT_WORKERS = 8
+
+# The roles os-cloud-config creates with the endpoints
+ROLES = ('swiftoperator', 'ResellerAdmin', 'heat_stack_user')
+
+# The service users are members of this tenant, with the admin role
+SERVICE_TENANT = 'service'
+
+# The users which also have the admin role in the admin tenant, to poll the
+# other services
+ADMIN_TENANT_USERS = ('ceilometer', )
+
+Endpoint = collections.namedtuple('Endpoint', [
+    'name', 'type', 'description', 'user', 'password', 'publicurl',
+    'adminurl', 'internalurl'])
+
+Plan = collections.namedtuple('Plan', [
+    'roles', 'users', 'services', 'endpoints', 'stale_endpoints'])
+
+
+def endpoint(service, data, public_host, internal_host):
+    """Return the Endpoint of a service, as os-cloud-config registers it
+
+    :param service: The name of the service in os-cloud-config SERVICES
+    :type  service: string
+
+    :param data: The settings of the service overriding the defaults of
+                 os-cloud-config, like the password or the internal_host
+    :type  data: dict
+
+    :param public_host: The host of the public URLs
+    :type  public_host: string
+
+    :param internal_host: The host of the internal and admin URLs
+    :type  internal_host: string
+    """
+
+    from os_cloud_config import keystone
+
+    conf = keystone.SERVICES[service].copy()
+    conf.update({'internal_host': internal_host, 'public_host': public_host})
+    conf.update(data)
+
+    path = conf.get('path', '/')
+    internal_host = conf['internal_host']
+    port = conf.get('port')
+    public_host = conf['public_host']
+    public_protocol = 'http'
+    public_port = port
+    if public_host and 'ssl_port' in conf:
+        public_protocol = 'https'
+        public_port = conf['ssl_port']
+
+    name = conf.get('name', service)
+    return Endpoint(
+        name=name,
+        type=conf['type'],
+        description=conf.get('description'),
+        user=None if conf.get('nouser') else name,
+        password=conf.get('password'),
+        publicurl='{0}://{1}:{2}{3}'.format(
+            public_protocol, public_host or internal_host, public_port, path),
+        adminurl='http://{0}:{1}{2}'.format(
+            internal_host, conf.get('admin_port', port),
+            conf.get('admin_path', path)),
+        internalurl='http://{0}:{1}{2}'.format(internal_host, port, path))
+
+
+def plan(endpoints, existing, region=DEFAULT_REGION):
+    """Return what has to be created or replaced
+
+    :param endpoints: The endpoints to register
+    :type  endpoints: [Endpoint]
+
+    :param existing: The existing roles, users, services and endpoints, by
+                     the name of their client manager
+    :type  existing: dict
+
+    :returns: The role names, the Endpoints whose user or service is
+              missing, the Endpoints to create and the existing endpoints
+              to delete first
+    :rtype: Plan
+    """
+
+    role_names = set(role.name for role in existing['roles'])
+    user_names = set(user.name for user in existing['users'])
+    service_ids = {}
+    for service in existing['services']:
+        service_ids.setdefault(service.type, service.id)
+    by_service = collections.defaultdict(list)
+    for ep in existing['endpoints']:
+        if ep.region == region:
+            by_service[ep.service_id].append(ep)
+
+    users, services, to_create, stale = {}, {}, [], []
+    for ep in endpoints:
+        if ep.user and ep.user not in user_names:
+            users.setdefault(ep.user, ep)
+        service_id = service_ids.get(ep.type)
+        if service_id is None:
+            services.setdefault(ep.type, ep)
+            to_create.append(ep)
+            continue
+
+        current = by_service[service_id]
+        urls = (ep.publicurl, ep.adminurl, ep.internalurl)
+        if any((e.publicurl, e.adminurl, e.internalurl) == urls
+               for e in current):
+            continue
+        stale.extend(current)
+        to_create.append(ep)
+
+    return Plan(
+        roles=sorted(set(ROLES) - role_names),
+        users=[users[name] for name in sorted(users)],
+        services=[services[service_type] for service_type in sorted(services)],
+        endpoints=to_create,
+        stale_endpoints=stale)
+
+
+def setup_endpoints(keystone, services, public_host, internal_host,
+                    region=DEFAULT_REGION, workers=DEFAULT_WORKERS):
+    """Register services and their endpoints, if they aren't yet
+
+    :param keystone: The Keystone v2 client
+    :type  keystone: keystoneclient.v2_0.client.Client
+
+    :param services: The settings of the services, by os-cloud-config name
+    :type  services: dict
+
+    :param public_host: The host of the public URLs
+    :type  public_host: string
+
+    :param internal_host: The host of the internal and admin URLs, unless a
+                          service sets its own
+    :type  internal_host: string
+
+    :param workers: The number of requests sent at the same time
+    :type  workers: int
+
+    :returns: What was created or replaced
+    :rtype: Plan
+    """
+
+    managers = ('roles', 'tenants', 'users', 'services', 'endpoints')
+    existing = dict(zip(managers, utils.concurrent_map(
+        lambda name: getattr(keystone, name).list(), managers, workers)))
+
+    endpoints = [endpoint(service, data, public_host, internal_host)
+                 for service, data in sorted(services.items())]
+    todo = plan(endpoints, existing, region)
+
+    tenants = dict((tenant.name, tenant) for tenant in existing['tenants'])
+    roles = dict((role.name, role) for role in existing['roles'])
+    service_ids = {}
+    for service in existing['services']:
+        service_ids.setdefault(service.type, service.id)
+
+    def create_role(name):
+        LOG.debug('Creating %s role.', name)
+        keystone.roles.create(name)
+
+    def create_user(ep):
+        LOG.debug('Creating user %s.', ep.user)
+        service_tenant = tenants[SERVICE_TENANT]
+        user = keystone.users.create(ep.user, ep.password,
+                                     tenant_id=service_tenant.id,
+                                     email='nobody@example.com')
+        keystone.roles.add_user_role(user, roles['admin'], service_tenant)
+        if ep.user in ADMIN_TENANT_USERS:
+            keystone.roles.add_user_role(user, roles['admin'],
+                                         tenants['admin'])
+
+    def create_service(ep):
+        LOG.debug('Creating service for %s.', ep.type)
+        service = keystone.services.create(ep.name, ep.type,
+                                           description=ep.description)
+        service_ids[ep.type] = service.id
+
+    def create_endpoint(ep):
+        LOG.debug('Creating endpoint for %s.', ep.type)
+        keystone.endpoints.create(region, service_ids[ep.type], ep.publicurl,
+                                  ep.adminurl, ep.internalurl)
+
+    def delete_endpoint(ep):
+        LOG.debug('Deleting endpoint %s, its URLs changed.', ep.id)
+        keystone.endpoints.delete(ep.id)
+
+    # The creations of a step don't depend on each other, the endpoints
+    # need the IDs of the services created before.
+    utils.concurrent_map(
+        lambda call: call[0](call[1]),
+        [(create_role, name) for name in todo.roles] +
+        [(create_user, ep) for ep in todo.users] +
+        [(create_service, ep) for ep in todo.services] +
+        [(delete_endpoint, ep) for ep in todo.stale_endpoints], workers)
+    utils.concurrent_map(create_endpoint, todo.endpoints, workers)
+
+    LOG.info('Created %d roles, %d users, %d services and %d endpoints, '
+             'replacing %d endpoints.', len(todo.roles), len(todo.users),
+             len(todo.services), len(todo.endpoints),
+             len(todo.stale_endpoints))
+    return todo
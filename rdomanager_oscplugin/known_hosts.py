@@ -0,0 +1,107 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Remove hosts from an OpenSSH known_hosts file"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import os
+import stat
+import tempfile
+
+KNOWN_HOSTS = "~/.ssh/known_hosts"
+
+# The prefix of a hostname hashed by ssh, "|1|<salt>|<HMAC-SHA1>"
+HASH_MAGIC = b'|1|'
+
+LOG = logging.getLogger(__name__)
+
+
+def _hashed_name_matches(entry, names):
+    try:
+        salt, digest = entry[len(HASH_MAGIC):].split(b'|')
+        salt = base64.b64decode(salt)
+        digest = base64.b64decode(digest)
+    except (TypeError, ValueError, binascii.Error):
+        return False
+    return any(hmac.new(salt, name, hashlib.sha1).digest() == digest
+               for name in names)
+
+
+def _line_matches(line, names):
+    fields = line.split()
+    if not fields or fields[0].startswith(b'#'):
+        return False
+    if fields[0].startswith(b'@'):
+        # Like ssh-keygen, keep the @cert-authority and @revoked lines, the
+        # hosts they match may be patterns for many hosts and removing a
+        # revocation would trust the key again.
+        return False
+
+    for entry in fields[0].split(b','):
+        if entry.startswith(HASH_MAGIC):
+            if _hashed_name_matches(entry, names):
+                return True
+        elif entry.lower() in names:
+            return True
+    return False
+
+
+def remove_hosts(hosts, path=KNOWN_HOSTS):
+    """Remove the keys of hosts from a known_hosts file
+
+    Like "ssh-keygen -R", a line is removed when any of its hostnames, hashed
+    or not, is one of the hosts, and the @cert-authority and @revoked lines
+    are kept. Hosts on another port than 22 are given as "[host]:port". The
+    file is read once for all the hosts and replaced by a rename, only if a
+    line was removed.
+
+    :param hosts: The hostnames or addresses to remove
+    :type  hosts: iterable
+
+    :param path: The path of the known_hosts file
+    :type  path: string
+
+    :returns: The number of lines removed
+    :rtype: int
+    """
+
+    names = set(host.lower().encode('utf-8') for host in hosts)
+    # Replace the file a symlink points to, not the symlink.
+    path = os.path.realpath(os.path.expanduser(path))
+    if not names or not os.path.exists(path):
+        return 0
+
+    removed = 0
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, 'wb') as out:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if _line_matches(line, names):
+                        removed += 1
+                    else:
+                        out.write(line)
+        if removed:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+            os.rename(tmp_path, path)
+            LOG.debug("Removed %d lines of %s", removed, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return removed
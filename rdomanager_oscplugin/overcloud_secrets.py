@@ -0,0 +1,136 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Generate the overcloud passwords and Keystone PKI in the background"""
+
+import json
+import logging
+from multiprocessing import pool
+
+import six
+
+from rdomanager_oscplugin import secret_store
+from rdomanager_oscplugin import utils
+
+DEFAULT_PASSWORDS_FILE = secret_store.OVERCLOUD_PASSWORDS_FILE
+DEFAULT_PKI_FILE = "tripleo-overcloud-pki.json"
+
+PKI_KEYS = ('ca_key', 'ca_cert', 'signing_key', 'signing_cert')
+
+LOG = logging.getLogger(__name__)
+
+
+def load_passwords(path=DEFAULT_PASSWORDS_FILE):
+    """Return the overcloud passwords, creating them on the first run"""
+
+    return utils.generate_overcloud_passwords(path)
+
+
+def _text(pem):
+    if isinstance(pem, six.binary_type):
+        return pem.decode('utf-8')
+    return pem
+
+
+def load_keystone_pki(path=DEFAULT_PKI_FILE):
+    """Return the Keystone CA and signing pair, creating them on the first run
+
+    The keys and certificates are PEM encoded, under the names in PKI_KEYS.
+    They are kept in the file, so later runs reuse them instead of
+    generating new RSA keys.
+    """
+
+    with secret_store.file_lock(path):
+        try:
+            with open(path) as f:
+                pki = json.load(f)
+            if all(pki.get(key) for key in PKI_KEYS):
+                return pki
+            LOG.warning("Ignoring incomplete Keystone PKI in %s", path)
+        except IOError:
+            pass
+        except ValueError:
+            LOG.warning("Ignoring unreadable Keystone PKI in %s", path)
+
+        from os_cloud_config import keystone_pki
+
+        LOG.debug("Creating Keystone certificates")
+        ca_key_pem, ca_cert_pem = keystone_pki.create_ca_pair()
+        signing_key_pem, signing_cert_pem = (
+            keystone_pki.create_signing_pair(ca_key_pem, ca_cert_pem))
+        pki = {
+            'ca_key': _text(ca_key_pem),
+            'ca_cert': _text(ca_cert_pem),
+            'signing_key': _text(signing_key_pem),
+            'signing_cert': _text(signing_cert_pem),
+        }
+        secret_store.write_atomic(
+            path, json.dumps(pki, indent=2, sort_keys=True))
+        return pki
+
+
+class SecretsStage(object):
+    """The secrets of a deploy, generated while the deploy does other work
+
+    start() generates the secrets in background threads. passwords() and
+    keystone_pki() wait for them, or generate them in the foreground if the
+    stage wasn't started. The secrets are stored on disk and reused by the
+    next runs, so only the first deploy pays for generating them.
+
+    :param passwords_file: The path of the overcloud passwords file
+    :type  passwords_file: string
+
+    :param pki_file: The path of the Keystone PKI file
+    :type  pki_file: string
+    """
+
+    def __init__(self, passwords_file=DEFAULT_PASSWORDS_FILE,
+                 pki_file=DEFAULT_PKI_FILE):
+        self.passwords_file = passwords_file
+        self.pki_file = pki_file
+        self._results = {}
+
+    def start(self, keystone_pki=True):
+        """Start generating the secrets in the background
+
+        :param keystone_pki: Whether the Keystone PKI is needed, it only is
+                             for a new stack
+        :type  keystone_pki: bool
+        """
+
+        jobs = [('passwords', load_passwords, self.passwords_file)]
+        if keystone_pki:
+            jobs.append(('keystone_pki', load_keystone_pki, self.pki_file))
+
+        threads = pool.ThreadPool(len(jobs))
+        for name, func, path in jobs:
+            self._results[name] = threads.apply_async(func, (path, ))
+        threads.close()
+
+    def passwords(self):
+        """Return the overcloud passwords, raising any generation error"""
+
+        result = self._results.get('passwords')
+        if result is None:
+            return load_passwords(self.passwords_file)
+        return result.get()
+
+    def keystone_pki(self):
+        """Return the Keystone PKI, raising any generation error"""
+
+        result = self._results.get('keystone_pki')
+        if result is None:
+            return load_keystone_pki(self.pki_file)
+        return result.get()
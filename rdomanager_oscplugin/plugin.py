@@ -15,11 +15,13 @@
 
 """OpenStackClient Plugin interface"""
 
+import atexit
 import logging
 
-from ironicclient import client as ironic_client
 from openstackclient.common import utils
-from tuskarclient import client as tuskar_client
+
+from rdomanager_oscplugin import profiling
+from rdomanager_oscplugin import utils as plugin_utils
 
 
 LOG = logging.getLogger(__name__)
@@ -58,6 +60,14 @@ def build_option_parser(parser):
         help='RDO Manager OSC Plugin API version, default=' +
              DEFAULT_RDOMANAGER_OSCPLUGIN_API_VERSION +
              ' (Env: OS_RDOMANAGER_OSCPLUGIN_API_VERSION)')
+    parser.add_argument(
+        '--os-rdomanager-oscplugin-api-stats',
+        metavar='<file>',
+        default=utils.env('OS_RDOMANAGER_OSCPLUGIN_API_STATS'),
+        help='Record the calls made with the RDO Manager OSC Plugin '
+             'clients and write their counts, latency and request sizes '
+             'as JSON to this file on exit, or print them to stderr if '
+             'the file is "-" (Env: OS_RDOMANAGER_OSCPLUGIN_API_STATS)')
     return parser
 
 
@@ -69,6 +79,76 @@ class ClientWrapper(object):
         self._orchestration = None
         self._management = None
 
+        # The token each memoized client was built with, so a client that
+        # can't use the session is rebuilt once the auth plugin has renewed
+        # an expiring token.
+        self._client_tokens = {}
+        self._endpoints = {}
+        self._session = None
+
+        self._profiler = None
+        self._api_stats = getattr(instance._cli_options,
+                                  'os_rdomanager_oscplugin_api_stats', None)
+        if self._api_stats:
+            self._profiler = profiling.Profiler()
+            atexit.register(self.report_api_stats)
+
+    def _shared_session(self):
+        """The OSC session, with a connection pool sized for the plugin
+
+        Clients built on it share keep-alive connections and the auth
+        plugin, which renews the token before it expires.
+        """
+
+        if self._session is None:
+            plugin_utils.configure_connection_pool(self._instance.session)
+            self._session = self._instance.session
+        return self._session
+
+    def _token(self):
+        # The auth plugin caches the token and only fetches a new one when
+        # the current one is about to expire.
+        return self._instance.auth.get_token(self._instance.session)
+
+    def _endpoint(self, service_type, **kwargs):
+        if service_type not in self._endpoints:
+            self._endpoints[service_type] = (
+                self._instance.get_endpoint_for_service_type(
+                    service_type, **kwargs))
+        return self._endpoints[service_type]
+
+    def _cached(self, name, token=None):
+        """Return the memoized client if it was built with this token"""
+
+        client = getattr(self, '_' + name)
+        if client is not None and self._client_tokens.get(name) == token:
+            return client
+        return None
+
+    def _cache(self, name, client, token=None):
+        setattr(self, '_' + name, client)
+        self._client_tokens[name] = token
+        return client
+
+    def _instrumented(self, client, service):
+        if self._profiler is None:
+            return client
+        return self._profiler.instrument_client(client, service)
+
+    def report_api_stats(self):
+        """Print or write the calls recorded with the API stats option"""
+
+        if self._profiler is None:
+            return
+
+        if self._api_stats == '-':
+            self._profiler.print_summary()
+        else:
+            self._profiler.write(self._api_stats)
+
+    # The client libraries are imported when a client is first built, as
+    # this module is loaded on every openstack command.
+
     def baremetal(self):
         """Returns an baremetal service client"""
 
@@ -76,21 +156,22 @@ class ClientWrapper(object):
         # following client handling code should be removed in favor of the
         # upstream version.
 
-        if self._baremetal is not None:
-            return self._baremetal
+        client = self._cached('baremetal')
+        if client is not None:
+            return client
+
+        from ironicclient import client as ironic_client
 
-        endpoint = self._instance.get_endpoint_for_service_type(
+        endpoint = self._endpoint(
             "baremetal",
             region_name=self._instance._region_name,
         )
 
-        token = self._instance.auth.get_token(self._instance.session)
+        client = ironic_client.Client(
+            1, endpoint, session=self._shared_session(),
+            region_name=self._instance._region_name)
 
-        self._baremetal = ironic_client.get_client(
-            1, os_auth_token=token, ironic_url=endpoint,
-            ca_file=self._instance._cli_options.os_cacert)
-
-        return self._baremetal
+        return self._cache('baremetal', self._instrumented(client, 'ironic'))
 
     def orchestration(self):
         """Returns an orchestration service client"""
@@ -99,8 +180,9 @@ class ClientWrapper(object):
         # and should be removed when it lands:
         # https://review.openstack.org/#/c/111786
 
-        if self._orchestration is not None:
-            return self._orchestration
+        client = self._cached('orchestration')
+        if client is not None:
+            return client
 
         API_VERSIONS = {
             '1': 'heatclient.v1.client.Client',
@@ -112,35 +194,37 @@ class ClientWrapper(object):
             API_VERSIONS)
         LOG.debug('Instantiating orchestration client: %s', heat_client)
 
-        endpoint = self._instance.get_endpoint_for_service_type(
-            'orchestration')
-        token = self._instance.auth.get_token(self._instance.session)
+        endpoint = self._endpoint('orchestration')
 
         client = heat_client(
             endpoint=endpoint,
-            auth_url=self._instance._auth_url,
-            token=token,
-            username=self._instance._username,
-            password=self._instance._password,
+            session=self._shared_session(),
+            auth=self._instance.auth,
+            service_type='orchestration',
             region_name=self._instance._region_name,
-            insecure=self._instance._insecure,
-            ca_file=self._instance._cli_options.os_cacert,
         )
 
-        self._orchestration = client
-        return self._orchestration
+        return self._cache('orchestration', self._instrumented(client, 'heat'))
 
     def management(self):
         """Returns an management service client"""
 
-        endpoint = self._instance.get_endpoint_for_service_type(
+        # tuskarclient can't use a session, so the client is built with the
+        # token and rebuilt when the token is renewed.
+        token = self._token()
+        client = self._cached('management', token)
+        if client is not None:
+            return client
+
+        from tuskarclient import client as tuskar_client
+
+        endpoint = self._endpoint(
             "management",
             region_name=self._instance._region_name,
         )
 
-        token = self._instance.auth.get_token(self._instance.session)
-
-        self._management = tuskar_client.get_client(
+        client = tuskar_client.get_client(
             2, os_auth_token=token, tuskar_url=endpoint)
 
-        return self._management
+        return self._cache('management', self._instrumented(client, 'tuskar'),
+                           token)
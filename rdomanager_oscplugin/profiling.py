@@ -0,0 +1,242 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Timing of command phases and remote API calls"""
+
+from __future__ import print_function
+
+import collections
+import contextlib
+import json
+import numbers
+import os
+import sys
+import threading
+import time
+
+import six
+
+# Map of client manager attributes and plugin client factories to the name
+# of the service they talk to.
+SERVICE_NAMES = {
+    'baremetal': 'ironic',
+    'compute': 'nova',
+    'identity': 'keystone',
+    'image': 'glance',
+    'management': 'tuskar',
+    'network': 'neutron',
+    'orchestration': 'heat',
+}
+
+PROFILE_FORMATS = ('json', 'chrome')
+
+# Upper bounds, in seconds, of the call latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Spans are timed with a monotonic clock where there is one, Python 3, so
+# wall clock adjustments during a deploy don't skew them.
+_clock = getattr(time, 'monotonic', time.time)
+
+_PLAIN_TYPES = six.string_types + (numbers.Number, bool, type(None), list,
+                                   tuple, dict, set)
+
+
+class _InstrumentedProxy(object):
+    """Time every call made through a client or one of its managers"""
+
+    def __init__(self, target, profiler, service, path, name=''):
+        self._target = target
+        self._profiler = profiler
+        self._service = service
+        self._path = path
+        self._name = name
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if isinstance(value, _PLAIN_TYPES) or name.startswith('_'):
+            return value
+
+        if name in SERVICE_NAMES:
+            return _InstrumentedProxy(value, self._profiler,
+                                      SERVICE_NAMES[name], '', name)
+
+        path = '.'.join(x for x in (self._path, name) if x)
+        return _InstrumentedProxy(value, self._profiler, self._service, path,
+                                  name)
+
+    def __call__(self, *args, **kwargs):
+        if self._name in SERVICE_NAMES:
+            # A plugin client factory, e.g. baremetal(). Building the client
+            # isn't a call to the service itself.
+            with self._profiler.span(self._name, 'client'):
+                client = self._target(*args, **kwargs)
+            return _InstrumentedProxy(client, self._profiler, self._service,
+                                      '')
+
+        with self._profiler.span(self._path, self._service or 'client',
+                                 _payload_size(args, kwargs)):
+            return self._target(*args, **kwargs)
+
+
+def _payload_size(args, kwargs):
+    """Estimate the size of the request made for a client call"""
+    try:
+        return len(json.dumps([args, kwargs], default=six.text_type))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _bucket(duration):
+    for bound in LATENCY_BUCKETS:
+        if duration <= bound:
+            return '<={0}s'.format(bound)
+    return '>{0}s'.format(LATENCY_BUCKETS[-1])
+
+
+class NullProfiler(object):
+    """A profiler that records nothing"""
+
+    @contextlib.contextmanager
+    def span(self, name, category='phase', request_bytes=0):
+        yield
+
+    def instrument(self, client_manager):
+        return client_manager
+
+
+class Profiler(NullProfiler):
+    """Record timed spans for command phases and remote API calls
+
+    Phases are recorded with the span() context manager. Remote calls are
+    recorded by using the client manager returned by instrument(), which
+    times every method called on a service client, grouped by service.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._start = _clock()
+
+    def _record(self, name, category, start, end, request_bytes):
+        with self._lock:
+            self.spans.append({
+                'name': name,
+                'category': category,
+                'start': start - self._start,
+                'duration': end - start,
+                'request_bytes': request_bytes,
+                'thread': threading.current_thread().ident,
+            })
+
+    @contextlib.contextmanager
+    def span(self, name, category='phase', request_bytes=0):
+        start = _clock()
+        try:
+            yield
+        finally:
+            self._record(name, category, start, _clock(), request_bytes)
+
+    def instrument(self, client_manager):
+        """Return a client manager that records every remote call"""
+        return _InstrumentedProxy(client_manager, self, None, '')
+
+    def instrument_client(self, client, service):
+        """Return a service client that records every call made with it"""
+        return _InstrumentedProxy(client, self, service, '')
+
+    def call_count(self, service=None):
+        """The number of remote calls made, optionally to one service"""
+        return len([span for span in self.spans
+                    if span['category'] not in ('phase', 'client') and
+                    service in (None, span['category'])])
+
+    def summary(self):
+        """Total time per phase and call counts and time per service"""
+
+        phases = collections.OrderedDict()
+        services = {}
+        for span in self.spans:
+            if span['category'] == 'phase':
+                phases[span['name']] = (
+                    phases.get(span['name'], 0) + span['duration'])
+                continue
+            calls = services.setdefault(span['category'], {})
+            call = calls.setdefault(span['name'], {
+                'count': 0,
+                'time': 0,
+                'request_bytes': 0,
+                'latency_histogram': {},
+            })
+            call['count'] += 1
+            call['time'] += span['duration']
+            call['request_bytes'] += span['request_bytes']
+            bucket = _bucket(span['duration'])
+            call['latency_histogram'][bucket] = (
+                call['latency_histogram'].get(bucket, 0) + 1)
+
+        return {
+            'phases': phases,
+            'services': dict(
+                (service, {
+                    'count': sum(c['count'] for c in calls.values()),
+                    'time': sum(c['time'] for c in calls.values()),
+                    'calls': calls,
+                })
+                for service, calls in services.items()),
+        }
+
+    def chrome_trace(self):
+        """The spans in the Chrome trace event format"""
+
+        pid = os.getpid()
+        return {
+            'displayTimeUnit': 'ms',
+            'traceEvents': [{
+                'name': span['name'],
+                'cat': span['category'],
+                'ph': 'X',
+                'ts': int(span['start'] * 1000000),
+                'dur': int(span['duration'] * 1000000),
+                'pid': pid,
+                'tid': span['thread'],
+            } for span in self.spans],
+        }
+
+    def print_summary(self, stream=None):
+        """Print the call counts and latency of each service and method"""
+
+        stream = stream or sys.stderr
+        services = self.summary()['services']
+        for service in sorted(services):
+            print("{0}: {1} calls, {2:.3f}s".format(
+                service, services[service]['count'],
+                services[service]['time']), file=stream)
+            calls = services[service]['calls']
+            for name in sorted(calls):
+                call = calls[name]
+                print("  {0}: {1} calls, {2:.3f}s, avg {3:.3f}s, "
+                      "{4} request bytes".format(
+                          name, call['count'], call['time'],
+                          call['time'] / call['count'],
+                          call['request_bytes']), file=stream)
+
+    def write(self, path, profile_format='json'):
+        if profile_format == 'chrome':
+            data = self.chrome_trace()
+        else:
+            data = dict(self.summary(), spans=self.spans)
+
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
@@ -0,0 +1,127 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Retries with jittered exponential backoff and a shared budget"""
+
+import logging
+import math
+import random
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+
+class RetryBudget(object):
+    """A number of retries shared by all the calls of one operation
+
+    Once the budget is spent, failing calls are no longer retried, so an
+    operation against an overloaded service fails quickly instead of
+    multiplying the load.
+    """
+
+    def __init__(self, retries):
+        self.remaining = retries
+        self._lock = threading.Lock()
+
+    def spend(self):
+        """Take one retry from the budget, if any are left"""
+
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """Retry calls that fail with errors expected to go away
+
+    :param retry_on: Whether an error should be retried
+    :type  retry_on: callable
+
+    :param retries: The maximum number of retries of a single call
+    :type  retries: int
+
+    :param base_delay: The upper bound of the first delay, in seconds
+    :type  base_delay: float
+
+    :param max_delay: The upper bound of any delay, in seconds
+    :type  max_delay: float
+
+    :param budget_ratio: The retries of an operation as a share of its calls
+    :type  budget_ratio: float
+    """
+
+    def __init__(self, retry_on, retries=5, base_delay=1, max_delay=30,
+                 budget_ratio=0.5):
+        self.retry_on = retry_on
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+
+    def budget(self, calls=1):
+        """The retry budget of an operation made of a number of calls
+
+        A single call can always use all of its retries.
+        """
+
+        return RetryBudget(
+            self.retries + int(math.ceil(self.budget_ratio * (calls - 1))))
+
+    def delay(self, attempt):
+        """The time to wait before a retry, with full jitter
+
+        The delay is picked at random up to an exponentially growing bound,
+        so calls that failed together don't all retry at the same time.
+        """
+
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func, *args, **kwargs):
+        """Call func, retrying it while it fails with retryable errors"""
+
+        return self.call_with_budget(self.budget(), None, func, *args,
+                                     **kwargs)
+
+    def call_with_budget(self, budget, is_done, func, *args, **kwargs):
+        """Call func, retrying within an operation's retry budget
+
+        :param budget: The retry budget shared with the other calls
+        :type  budget: RetryBudget
+
+        :param is_done: Checked before every retry. When it returns True
+                        the change was already applied and the call isn't
+                        made again.
+        :type  is_done: callable or None
+        """
+
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if (not self.retry_on(e) or attempt >= self.retries or
+                        not budget.spend()):
+                    raise
+                delay = self.delay(attempt)
+                LOG.debug("Retrying in %.1f seconds after: %s", delay, e)
+                time.sleep(delay)
+                attempt += 1
+
+                if is_done is not None and is_done():
+                    return None
@@ -0,0 +1,217 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Password files, read once per process and written atomically"""
+
+import contextlib
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+
+from six.moves import configparser
+
+OVERCLOUD_PASSWORDS_FILE = "tripleo-overcloud-passwords"
+UNDERCLOUD_PASSWORDS_FILE = "~/undercloud-passwords.conf"
+
+LOG = logging.getLogger(__name__)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on a file, across processes
+
+    The lock is taken on a separate ".lock" file next to it, so the file
+    itself can be replaced by a rename while the lock is held. The lock file
+    is removed when the lock is released.
+    """
+
+    lock_path = path + '.lock'
+    while True:
+        f = open(lock_path, 'a')
+        fcntl.flock(f, fcntl.LOCK_EX)
+        # The holder we waited for may have removed the file we locked, and
+        # another process may have created a new one, so retry unless the
+        # lock is on the file at lock_path.
+        try:
+            if os.path.samestat(os.fstat(f.fileno()), os.stat(lock_path)):
+                break
+        except OSError:
+            pass
+        f.close()
+
+    try:
+        yield
+    finally:
+        # Removed while it's locked, so nobody can lock it in between.
+        try:
+            os.unlink(lock_path)
+        finally:
+            f.close()
+
+
+def write_atomic(path, data, mode=0o600):
+    """Replace the content of a file, readable by its owner only"""
+
+    directory = os.path.dirname(os.path.abspath(path))
+
+    # Write to a temporary file and rename it, so an interrupted run never
+    # leaves a partially written secret behind.
+    handle, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(handle, 'w') as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+class PasswordsFile(object):
+    """A file of NAME=value lines
+
+    The file is read on the first lookup only. Values may contain '='.
+
+    :param path: The path of the file
+    :type  path: string
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._values = None
+        self._lock = threading.Lock()
+
+    def _read(self):
+        values = {}
+        try:
+            with open(self.path) as f:
+                for number, line in enumerate(f, 1):
+                    line = line.rstrip('\n')
+                    if not line.strip():
+                        continue
+                    if '=' not in line:
+                        LOG.warning("Ignoring line %d of %s, it has no '='",
+                                    number, self.path)
+                        continue
+                    name, value = line.split('=', 1)
+                    values[name] = value
+        except IOError:
+            LOG.debug("No passwords file at %s", self.path)
+        return values
+
+    def values(self):
+        """Return the passwords, by name"""
+
+        with self._lock:
+            if self._values is None:
+                self._values = self._read()
+            return dict(self._values)
+
+    def get(self, name, default=None):
+        return self.values().get(name, default)
+
+    def ensure(self, names, generate):
+        """Return the passwords, generating the missing ones
+
+        The existing passwords are kept. When some are missing, the file is
+        read again under the lock, in case another process added them, and
+        rewritten with the new ones.
+
+        :param names: The names of the passwords that are needed
+        :type  names: iterable
+
+        :param generate: Called without arguments to create a password
+        :type  generate: callable
+        """
+
+        with self._lock:
+            if self._values is not None and all(
+                    name in self._values for name in names):
+                return dict(self._values)
+
+            with file_lock(self.path):
+                values = self._read()
+                missing = sorted(set(names) - set(values))
+                if missing:
+                    LOG.debug("Generating %s in %s", ", ".join(missing),
+                              self.path)
+                    for name in missing:
+                        values[name] = generate()
+                    write_atomic(self.path, "".join(
+                        "{0}={1}\n".format(name, values[name])
+                        for name in sorted(values)))
+            self._values = values
+            return dict(values)
+
+
+class ConfigFile(object):
+    """An INI file of passwords, by section and option
+
+    The file is parsed on the first lookup only.
+
+    :param path: The path of the file
+    :type  path: string
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._parser = None
+        self._lock = threading.Lock()
+
+    def get(self, section, option):
+        """Return the value of an option
+
+        :raises configparser.Error: if the section or the option is missing
+        """
+
+        with self._lock:
+            if self._parser is None:
+                parser = configparser.ConfigParser()
+                parser.read(self.path)
+                self._parser = parser
+        return self._parser.get(section, option)
+
+
+def _store(cls, path):
+    path = os.path.abspath(os.path.expanduser(path))
+    with _stores_lock:
+        store = _stores.get(path)
+        if not isinstance(store, cls):
+            store = _stores[path] = cls(path)
+        return store
+
+
+def overcloud_passwords(path=OVERCLOUD_PASSWORDS_FILE):
+    """Return the shared PasswordsFile of a path"""
+
+    return _store(PasswordsFile, path)
+
+
+def undercloud_passwords(path=UNDERCLOUD_PASSWORDS_FILE):
+    """Return the shared ConfigFile of a path"""
+
+    return _store(ConfigFile, path)
+
+
+def clear_cache():
+    """Forget the files read so far, they are read again on the next use"""
+
+    with _stores_lock:
+        _stores.clear()
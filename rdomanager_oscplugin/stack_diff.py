@@ -0,0 +1,174 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Change detection between deploys of an existing stack"""
+
+import hashlib
+import json
+import os
+
+import six
+
+from rdomanager_oscplugin import secret_store
+
+DEFAULT_STATE_DIR = "~/.cache/rdomanager-oscplugin/stacks"
+
+# Heat returns this in place of the value of hidden parameters
+HIDDEN_PARAMETER_VALUE = '******'
+
+
+def _sha1(value):
+    # On Python 3, heatclient reads the get_file contents as bytes.
+    if not isinstance(value, six.binary_type):
+        value = json.dumps(value, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(value).hexdigest()
+
+
+def _updated_time(stack):
+    updated_time = getattr(stack, 'updated_time', None)
+    return None if updated_time is None else six.text_type(updated_time)
+
+
+def fingerprint(stack_id, stack_args, updated_time=None):
+    """Build a fingerprint of a stack create/update request
+
+    Only checksums are kept, so the fingerprint doesn't contain the
+    parameter values or the template contents. The updated_time of the
+    stack once deployed tells whether it was updated by something else
+    since.
+    """
+
+    return {
+        'stack_id': six.text_type(stack_id),
+        'updated_time': (None if updated_time is None
+                         else six.text_type(updated_time)),
+        'parameters': dict(
+            (name, _sha1(value))
+            for name, value in six.iteritems(stack_args['parameters'])),
+        'template': _sha1(stack_args['template']),
+        'environment': _sha1(stack_args['environment']),
+        'files': dict(
+            (name, _sha1(content))
+            for name, content in six.iteritems(stack_args['files'])),
+    }
+
+
+def _diff_checksums(kind, old, new):
+    changes = []
+    for name in sorted(set(old) | set(new)):
+        if name not in old:
+            changes.append("{0} {1} added".format(kind, name))
+        elif name not in new:
+            changes.append("{0} {1} removed".format(kind, name))
+        elif old[name] != new[name]:
+            changes.append("{0} {1} changed".format(kind, name))
+    return changes
+
+
+def diff(old, new):
+    """List the differences between two fingerprints"""
+
+    # Parameters that are not passed again keep their existing value, as the
+    # update is done with existing=true, so removed parameters are ignored.
+    old_parameters = dict((name, old['parameters'][name])
+                          for name in new['parameters']
+                          if name in old['parameters'])
+    changes = _diff_checksums('parameter', old_parameters, new['parameters'])
+
+    if old['template'] != new['template']:
+        changes.append("template changed")
+    if old['environment'] != new['environment']:
+        changes.append("environment changed")
+
+    changes.extend(_diff_checksums('file', old['files'], new['files']))
+    return changes
+
+
+def _normalise(value):
+    if isinstance(value, bool):
+        return six.text_type(value).lower()
+    return six.text_type(value)
+
+
+def live_parameter_changes(stack, parameters):
+    """List the parameters whose value differs from the deployed stack
+
+    Hidden parameters can't be compared and are skipped.
+    """
+
+    changes = []
+    live = stack.parameters
+    for name in sorted(parameters):
+        if name not in live or live[name] == HIDDEN_PARAMETER_VALUE:
+            continue
+        if _normalise(parameters[name]) != _normalise(live[name]):
+            changes.append("parameter {0} differs from the deployed "
+                           "stack".format(name))
+    return changes
+
+
+def changes(stack, last_fingerprint, stack_args):
+    """List the reasons a stack update is needed
+
+    An empty list means the update would not change anything.
+
+    :param stack: The existing stack
+    :type  stack: heatclient.v1.stacks.Stack
+
+    :param last_fingerprint: The fingerprint of the last deploy, if any
+    :type  last_fingerprint: dict
+
+    :param stack_args: The keyword arguments for stacks.update
+    :type  stack_args: dict
+    """
+
+    if not six.text_type(stack.stack_status).endswith('_COMPLETE'):
+        return ["stack status is {0}".format(stack.stack_status)]
+
+    if (last_fingerprint is None or
+            last_fingerprint.get('stack_id') != six.text_type(stack.id)):
+        return ["no record of the last deploy of this stack"]
+
+    # Like "overcloud update stack" adding hooks to the environment, an
+    # update done out of band can't be seen in the fingerprint.
+    if last_fingerprint.get('updated_time') != _updated_time(stack):
+        return ["stack was updated since the last deploy"]
+
+    return (diff(last_fingerprint, fingerprint(stack.id, stack_args)) +
+            live_parameter_changes(stack, stack_args['parameters']))
+
+
+class FingerprintStore(object):
+    """Store the fingerprint of the last deploy of each stack"""
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR):
+        self.state_dir = os.path.expanduser(state_dir)
+
+    def _path(self, stack_name):
+        return os.path.join(self.state_dir, stack_name + '.json')
+
+    def load(self, stack_name):
+        try:
+            with open(self._path(stack_name)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def save(self, stack_name, stack_fingerprint):
+        if not os.path.isdir(self.state_dir):
+            os.makedirs(self.state_dir)
+
+        secret_store.write_atomic(self._path(stack_name),
+                                  json.dumps(stack_fingerprint))
@@ -0,0 +1,241 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Local cache of processed Heat template bundles"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+import six
+
+from rdomanager_oscplugin import secret_store
+
+DEFAULT_CACHE_DIR = "~/.cache/rdomanager-oscplugin/templates"
+
+# The number of bundles kept, the least recently used are removed first
+DEFAULT_MAX_ENTRIES = 8
+
+# Environments setting parameters with these names carry credentials, like
+# the registration environment, and are never written to the cache.
+SECRET_PARAMETER = re.compile(r'password|secret|activation_key|private_key',
+                              re.IGNORECASE)
+
+LOG = logging.getLogger(__name__)
+
+
+def _file_sha1(path):
+    checksum = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for fragment in iter(lambda: f.read(65536), b''):
+            checksum.update(fragment)
+    return checksum.hexdigest()
+
+
+def _fingerprint(path):
+    """Return the mtime, size and checksum of a local file"""
+    stat = os.stat(path)
+    return {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha1': _file_sha1(path),
+    }
+
+
+def _is_temporary(path):
+    temp_dir = os.path.join(os.path.realpath(tempfile.gettempdir()), '')
+    return os.path.realpath(path).startswith(temp_dir)
+
+
+def _has_secrets(environment):
+    for section in ('parameters', 'parameter_defaults'):
+        parameters = environment.get(section) or {}
+        if any(SECRET_PARAMETER.search(name) for name in parameters):
+            return True
+    return False
+
+
+def _encode_files(files):
+    """Split a files map in its text values and base64 encoded bytes values
+
+    On Python 3, heatclient reads the get_file contents as bytes, which
+    JSON can't hold.
+    """
+
+    text, binary = {}, {}
+    for name, content in six.iteritems(files):
+        if isinstance(content, six.binary_type):
+            binary[name] = base64.b64encode(content).decode('ascii')
+        else:
+            text[name] = content
+    return text, binary
+
+
+def _decode_files(text, binary):
+    files = dict(text)
+    for name, content in six.iteritems(binary):
+        files[name] = base64.b64decode(content)
+    return files
+
+
+def local_sources(template_path, environments, files):
+    """List the local files a processed template bundle was built from
+
+    The template and environment paths are given directly, every other file
+    is found through the ``file://`` URLs heatclient uses as keys in the
+    files map.
+    """
+    sources = set([os.path.abspath(template_path)])
+    sources.update(os.path.abspath(env) for env in environments)
+
+    for url in files:
+        parsed = six.moves.urllib.parse.urlparse(url)
+        if parsed.scheme == 'file':
+            sources.add(six.moves.urllib.request.url2pathname(parsed.path))
+
+    return sorted(sources)
+
+
+class BundleCache(object):
+    """Cache the template, environment and files map for a deployment
+
+    Entries are keyed on the content of the template and environments, and
+    the directories relative paths in them are resolved from, and are only
+    reused while every local file they were built from is unchanged. A file
+    is considered unchanged when its mtime and size match, or, failing that,
+    when its content checksum still matches.
+
+    Bundles built from files in the temporary directory, which get a new
+    path on every deploy, or whose environment sets credentials are not
+    cached. Only the max_entries most recently used bundles are kept.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_entries = max_entries
+
+    def _entry_path(self, template_path, environments):
+        key = json.dumps([
+            [os.path.dirname(os.path.abspath(path)), _file_sha1(path)]
+            for path in [template_path] + list(environments)])
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.json')
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.json'):
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    continue
+        entries.sort(reverse=True)
+
+        for _, path in entries[self.max_entries:]:
+            LOG.debug("Removing cached template bundle %s", path)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _is_fresh(self, sources):
+        for path, cached in sources.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+
+            if (stat.st_mtime == cached['mtime'] and
+                    stat.st_size == cached['size']):
+                continue
+
+            if (stat.st_size != cached['size'] or
+                    _file_sha1(path) != cached['sha1']):
+                LOG.debug("Template source %s changed", path)
+                return False
+
+        return True
+
+    def load(self, template_path, environments):
+        """Return a cached (template, environment, files) tuple or None"""
+
+        try:
+            entry_path = self._entry_path(template_path, environments)
+            with open(entry_path) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if not self._is_fresh(entry['sources']):
+            return None
+
+        # Mark the entry as recently used, so it's evicted last.
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+
+        return (entry['template'], entry['environment'],
+                _decode_files(entry['files'], entry.get('binary_files', {})))
+
+    def store(self, template_path, environments, template, environment,
+              files):
+        """Store a processed bundle, returning True if it was cached
+
+        Bundles that refer to local files which can no longer be read, or
+        which can't be serialised, are not cached, nor are bundles built from
+        temporary files or setting credentials.
+        """
+
+        if any(_is_temporary(path)
+               for path in [template_path] + list(environments)):
+            LOG.debug("Not caching template bundle built from temporary "
+                      "files")
+            return False
+
+        if _has_secrets(environment):
+            LOG.debug("Not caching template bundle setting credentials")
+            return False
+
+        try:
+            entry_path = self._entry_path(template_path, environments)
+            sources = dict(
+                (path, _fingerprint(path))
+                for path in local_sources(template_path, environments, files))
+            text_files, binary_files = _encode_files(files)
+            data = json.dumps({
+                'sources': sources,
+                'template': template,
+                'environment': environment,
+                'files': text_files,
+                'binary_files': binary_files,
+            })
+        except (IOError, OSError, TypeError, ValueError) as e:
+            LOG.debug("Not caching template bundle: %s", e)
+            return False
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, 0o700)
+
+        secret_store.write_atomic(entry_path, data)
+
+        self._evict()
+        return True
@@ -0,0 +1,466 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""In-process fakes of the services used by the plugin commands
+
+The fakes stand in for the ironicclient, ironic_discoverd, heatclient and
+glanceclient objects the commands use, and keep their state in memory.
+Every call counts as one request and can be slowed down by a fixed
+latency. State changes take a configurable time, and calls that change a
+node can fail with a lock conflict, like Ironic does while a conductor
+holds the node lock.
+"""
+
+import collections
+import copy
+import itertools
+import random
+import threading
+import time
+import uuid
+
+# Bound at import, so tests that replace time.sleep don't remove the
+# latency of the fake services.
+_sleep = time.sleep
+
+# The provision state a transition leads to, and the state the node is in
+# until then.
+PROVISION_TRANSITIONS = {
+    'manage': ('manageable', 'verifying'),
+    'provide': ('available', 'cleaning'),
+    'inspect': ('manageable', 'inspecting'),
+    'active': ('active', 'deploying'),
+    'deleted': ('available', 'deleting'),
+}
+
+POWER_TRANSITIONS = {
+    'on': 'power on',
+    'off': 'power off',
+    'reboot': 'power on',
+}
+
+
+class Conflict(Exception):
+    """Mirrors ironicclient.exc.Conflict, raised for NodeLocked"""
+
+    http_status = 409
+
+
+class NotFound(Exception):
+    """Mirrors the NotFound errors of the clients"""
+
+    http_status = 404
+
+
+class FakeResource(object):
+    """A snapshot of a resource, as returned by a client"""
+
+    def __init__(self, **attrs):
+        self.__dict__.update(copy.deepcopy(attrs))
+
+    def to_dict(self):
+        return copy.deepcopy(self.__dict__)
+
+
+class FakeCloud(object):
+    """The shared state, request counts and timing of all the fakes
+
+    :param latency: The time every request takes, in seconds
+    :type  latency: float
+
+    :param conflict_rate: The share of node changes that fail with a lock
+                          conflict
+    :type  conflict_rate: float
+
+    :param transition_time: The time provision and power state changes
+                            take, in seconds
+    :type  transition_time: float
+    """
+
+    def __init__(self, nodes=10, latency=0, conflict_rate=0,
+                 transition_time=0, introspection_time=0, stack_time=0,
+                 upload_rate=None, driver='pxe_ipmitool', seed=0):
+        self.latency = latency
+        self.conflict_rate = conflict_rate
+        self.transition_time = transition_time
+        self.introspection_time = introspection_time
+        self.stack_time = stack_time
+        self.upload_rate = upload_rate
+        self.requests = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+
+        self.ironic = FakeIronic(self)
+        self.discoverd = FakeDiscoverd(self)
+        self.heat = FakeHeat(self)
+        self.glance = FakeGlance(self)
+
+        for i in range(nodes):
+            self.ironic.add_node(name='node-%d' % i, driver=driver)
+
+    def request(self, name, mutating=False):
+        """Account for a request, and fail it if a conflict is injected"""
+
+        with self._lock:
+            self.requests[name] += 1
+            conflict = (mutating and self.conflict_rate and
+                        self._random.random() < self.conflict_rate)
+        if self.latency:
+            _sleep(self.latency)
+        if conflict:
+            raise Conflict("Node is locked by host fake-conductor")
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def reset_requests(self):
+        with self._lock:
+            self.requests.clear()
+
+
+class _FakeNode(object):
+
+    def __init__(self, cloud, **attrs):
+        self._cloud = cloud
+        self.uuid = attrs.pop('uuid', None) or str(uuid.uuid4())
+        self.name = None
+        self.driver = 'pxe_ipmitool'
+        self.provision_state = 'available'
+        self.target_provision_state = None
+        self.power_state = 'power off'
+        self.target_power_state = None
+        self.maintenance = False
+        self.instance_uuid = None
+        self.properties = {}
+        self.driver_info = {}
+        self.extra = {}
+        self._busy_until = 0
+        self.__dict__.update(attrs)
+
+    def refresh(self):
+        """Complete the state change in progress, if its time has come"""
+
+        if self._busy_until and time.time() >= self._busy_until:
+            self._busy_until = 0
+            if self.target_provision_state:
+                self.provision_state = self.target_provision_state
+                self.target_provision_state = None
+            if self.target_power_state:
+                self.power_state = self.target_power_state
+                self.target_power_state = None
+
+    @property
+    def busy(self):
+        self.refresh()
+        return bool(self._busy_until)
+
+    def start_transition(self):
+        self._busy_until = time.time() + self._cloud.transition_time
+        self.refresh()
+
+    def snapshot(self):
+        self.refresh()
+        return FakeResource(**dict(
+            (k, v) for k, v in self.__dict__.items()
+            if not k.startswith('_') and k not in (
+                'target_provision_state', 'target_power_state')))
+
+
+class _FakeNodeManager(object):
+
+    def __init__(self, cloud, ironic):
+        self._cloud = cloud
+        self._ironic = ironic
+
+    def _node(self, node_id):
+        if node_id in self._ironic.nodes:
+            return self._ironic.nodes[node_id]
+        for node in self._ironic.nodes.values():
+            if node_id in (node.uuid, node.name):
+                return node
+        raise NotFound("Node %s could not be found." % node_id)
+
+    def _locked_node(self, node_id):
+        node = self._node(node_id)
+        if node.busy:
+            raise Conflict("Node %s is locked by host fake-conductor, "
+                           "please retry after the current operation is "
+                           "completed." % node.uuid)
+        return node
+
+    def list(self, associated=None, maintenance=None, detail=False,
+             **kwargs):
+        self._cloud.request('ironic.node.list')
+        nodes = []
+        for node in self._ironic.nodes.values():
+            if maintenance is not None and node.maintenance != maintenance:
+                continue
+            if (associated is not None and
+                    bool(node.instance_uuid) != associated):
+                continue
+            snapshot = node.snapshot()
+            if not detail:
+                for attr in ('properties', 'driver_info', 'extra'):
+                    delattr(snapshot, attr)
+            nodes.append(snapshot)
+        return nodes
+
+    def get(self, node_id, fields=None):
+        self._cloud.request('ironic.node.get')
+        return self._node(node_id).snapshot()
+
+    def update(self, node_id, patch):
+        self._cloud.request('ironic.node.update', mutating=True)
+        with self._cloud._lock:
+            node = self._locked_node(node_id)
+            for op in patch:
+                parts = op['path'].strip('/').split('/')
+                if len(parts) == 1:
+                    target, key = node.__dict__, parts[0]
+                else:
+                    target, key = getattr(node, parts[0]), parts[1]
+                if op['op'] == 'remove':
+                    target.pop(key, None)
+                else:
+                    target[key] = op['value']
+            return node.snapshot()
+
+    def set_provision_state(self, node_id, state, configdrive=None):
+        self._cloud.request('ironic.node.set_provision_state', mutating=True)
+        with self._cloud._lock:
+            node = self._locked_node(node_id)
+            target, transitional = PROVISION_TRANSITIONS[state]
+            node.provision_state = transitional
+            node.target_provision_state = target
+            node.start_transition()
+
+    def set_power_state(self, node_id, state):
+        self._cloud.request('ironic.node.set_power_state', mutating=True)
+        with self._cloud._lock:
+            node = self._locked_node(node_id)
+            node.power_state = None
+            node.target_power_state = POWER_TRANSITIONS[state]
+            node.start_transition()
+
+    def vendor_passthru(self, node_id, method, args=None, http_method=None):
+        self._cloud.request('ironic.node.vendor_passthru',
+                            mutating=http_method != 'GET')
+        node = self._node(node_id)
+        if method == 'list_unfinished_jobs':
+            return FakeResource(unfinished_jobs=[])
+        if method == 'list_virtual_disks':
+            return FakeResource(virtual_disks=node.extra.get(
+                'virtual_disks', []))
+        if method == 'delete_virtual_disk':
+            node.extra['virtual_disks'] = [
+                disk for disk in node.extra.get('virtual_disks', [])
+                if disk['id'] != args['virtual_disk']]
+
+
+class FakeIronic(object):
+    """Stands in for ironicclient.v1.client.Client"""
+
+    def __init__(self, cloud):
+        self._cloud = cloud
+        self.nodes = collections.OrderedDict()
+        self.node = _FakeNodeManager(cloud, self)
+
+    def add_node(self, **attrs):
+        node = _FakeNode(self._cloud, **attrs)
+        self.nodes[node.uuid] = node
+        return node
+
+
+class FakeDiscoverd(object):
+    """Stands in for the ironic_discoverd.client module"""
+
+    def __init__(self, cloud):
+        self._cloud = cloud
+        self._started = {}
+
+    def introspect(self, uuid, base_url=None, auth_token=None,
+                   new_ipmi_password=None, new_ipmi_username=None):
+        self._cloud.request('discoverd.introspect')
+        node = self._cloud.ironic.node._node(uuid)
+        if node.provision_state not in ('manageable', 'available'):
+            raise Conflict("Node %s is in state %s" % (
+                uuid, node.provision_state))
+        self._started[uuid] = time.time()
+
+    def get_status(self, uuid, base_url=None, auth_token=None):
+        self._cloud.request('discoverd.get_status')
+        started = self._started.get(uuid)
+        if started is None:
+            raise NotFound("Introspection of node %s was not started" % uuid)
+
+        finished = time.time() - started >= self._cloud.introspection_time
+        if finished:
+            node = self._cloud.ironic.nodes[uuid]
+            node.properties.setdefault('cpus', '4')
+            node.properties.setdefault('memory_mb', '8192')
+            node.properties.setdefault('local_gb', '40')
+            node.properties.setdefault('cpu_arch', 'x86_64')
+        return {'finished': finished, 'error': None}
+
+
+class _FakeStack(object):
+
+    def __init__(self, cloud, name, action, **kwargs):
+        self._cloud = cloud
+        self.id = str(uuid.uuid4())
+        self.stack_name = name
+        self.parameters = {}
+        self.outputs = []
+        self.apply(action, **kwargs)
+
+    def apply(self, action, parameters=None, **kwargs):
+        self.parameters.update(dict(
+            (k, str(v)) for k, v in (parameters or {}).items()))
+        self.parameters['OS::stack_id'] = self.id
+        self.action = action
+        self._done_at = time.time() + self._cloud.stack_time
+
+    def snapshot(self):
+        state = ('COMPLETE' if time.time() >= self._done_at
+                 else 'IN_PROGRESS')
+        return FakeResource(id=self.id, stack_name=self.stack_name,
+                            parameters=self.parameters, outputs=self.outputs,
+                            stack_status='%s_%s' % (self.action, state))
+
+
+class _FakeStackManager(object):
+
+    def __init__(self, cloud):
+        self._cloud = cloud
+        self._stacks = {}
+
+    def get(self, stack_id):
+        from heatclient import exc
+
+        self._cloud.request('heat.stacks.get')
+        for stack in self._stacks.values():
+            if stack_id in (stack.id, stack.stack_name):
+                return stack.snapshot()
+        raise exc.HTTPNotFound("The Stack (%s) could not be found." %
+                               stack_id)
+
+    def list(self, **kwargs):
+        self._cloud.request('heat.stacks.list')
+        return [stack.snapshot() for stack in self._stacks.values()]
+
+    def create(self, stack_name, **kwargs):
+        self._cloud.request('heat.stacks.create')
+        stack = _FakeStack(self._cloud, stack_name, 'CREATE', **kwargs)
+        self._stacks[stack.id] = stack
+        return {'stack': {'id': stack.id}}
+
+    def update(self, stack_id, **kwargs):
+        self._cloud.request('heat.stacks.update')
+        stack = self._stacks[stack_id]
+        stack.apply('UPDATE', **kwargs)
+
+
+class FakeHeat(object):
+    """Stands in for heatclient.v1.client.Client"""
+
+    def __init__(self, cloud):
+        self.stacks = _FakeStackManager(cloud)
+
+
+class _FakeImageManager(object):
+
+    def __init__(self, cloud):
+        self._cloud = cloud
+        self._images = collections.OrderedDict()
+        self._ids = itertools.count()
+
+    def _image(self, image_id):
+        for image in self._images.values():
+            if image_id in (image.id, image.name):
+                return image
+        raise NotFound("No image with a name or ID of '%s' exists." %
+                       image_id)
+
+    def list(self, **kwargs):
+        self._cloud.request('glance.images.list')
+        return list(self._images.values())
+
+    def get(self, image_id):
+        self._cloud.request('glance.images.get')
+        return self._image(image_id)
+
+    def find(self, **kwargs):
+        self._cloud.request('glance.images.find')
+        for image in self._images.values():
+            if all(getattr(image, k, None) == v for k, v in kwargs.items()):
+                return image
+        raise NotFound("No image matching %s." % kwargs)
+
+    def create(self, data=None, **kwargs):
+        self._cloud.request('glance.images.create')
+        size = 0
+        if data is not None:
+            size = len(data.read())
+            if self._cloud.upload_rate:
+                _sleep(float(size) / self._cloud.upload_rate)
+        image = FakeResource(id='image-%d' % next(self._ids), size=size,
+                             status='active', properties={}, **kwargs)
+        self._images[image.id] = image
+        return image
+
+    def update(self, image_id, **kwargs):
+        self._cloud.request('glance.images.update')
+        image = self._image(image_id)
+        image.properties.update(kwargs.pop('properties', {}))
+        image.__dict__.update(kwargs)
+        return image
+
+    def delete(self, image_id):
+        self._cloud.request('glance.images.delete')
+        self._images.pop(self._image(image_id).id)
+
+
+class FakeGlance(object):
+    """Stands in for glanceclient.v1.client.Client"""
+
+    def __init__(self, cloud):
+        self.images = _FakeImageManager(cloud)
+
+
+class FakeClientWrapper(object):
+    """Stands in for rdomanager_oscplugin.plugin.ClientWrapper"""
+
+    def __init__(self, cloud):
+        self._cloud = cloud
+
+    def baremetal(self):
+        return self._cloud.ironic
+
+    def orchestration(self):
+        return self._cloud.heat
+
+    def management(self):
+        raise NotImplementedError("Tuskar isn't faked")
+
+
+class FakeClientManager(object):
+    """Stands in for the OSC client manager of a command"""
+
+    def __init__(self, cloud):
+        self.rdomanager_oscplugin = FakeClientWrapper(cloud)
+        self.image = cloud.glance
+        self.auth_ref = FakeResource(auth_token='fake-token')
+        self.region_name = 'regionOne'
@@ -0,0 +1,266 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Run the plugin commands against the fake cloud and measure them
+
+Usage::
+
+    python -m rdomanager_oscplugin.tests.benchmarks.harness \\
+        --nodes 10,100,1000 --latency 0.01 --conflict-rate 0.05 \\
+        --wall-time-per-node 0.05
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+import mock
+import six
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2.7, peak memory isn't reported.
+    tracemalloc = None
+
+from rdomanager_oscplugin.tests.benchmarks import fake_cloud
+from rdomanager_oscplugin.v1 import baremetal
+
+NODE_COUNTS = (10, 100, 1000)
+
+# How much the API calls per node may grow between the smallest and the
+# largest inventory before the scaling counts as worse than linear.
+CALLS_PER_NODE_TOLERANCE = 1.1
+
+
+def _start_introspection(cloud):
+    for node in cloud.ironic.nodes.values():
+        node.provision_state = 'manageable'
+        cloud.discoverd.introspect(node.uuid)
+
+
+def _upload_deploy_images(cloud):
+    cloud.glance.images.create(name='bm-deploy-kernel')
+    cloud.glance.images.create(name='bm-deploy-ramdisk')
+
+
+# The command class, its arguments, the node driver and the setup of the
+# fake cloud for each command.
+Scenario = collections.namedtuple(
+    'Scenario', ['command', 'argv', 'driver', 'setup'])
+
+SCENARIOS = collections.OrderedDict([
+    ('baremetal configure boot', Scenario(
+        baremetal.ConfigureBaremetalBoot, [], 'pxe_ipmitool',
+        _upload_deploy_images)),
+    ('baremetal show capabilities', Scenario(
+        baremetal.ShowNodeCapabilities, [], 'pxe_ipmitool', None)),
+    ('baremetal introspection bulk start', Scenario(
+        baremetal.StartBaremetalIntrospectionBulk, [], 'pxe_ipmitool', None)),
+    ('baremetal introspection bulk status', Scenario(
+        baremetal.StatusBaremetalIntrospectionBulk, [], 'pxe_ipmitool',
+        _start_introspection)),
+    ('baremetal configure ready state', Scenario(
+        baremetal.ConfigureReadyState, [], 'pxe_drac', None)),
+])
+
+
+class FakeApp(object):
+
+    def __init__(self, cloud):
+        self.client_manager = fake_cloud.FakeClientManager(cloud)
+        self.stdin = sys.stdin
+        self.stdout = six.StringIO()
+        self.stderr = six.StringIO()
+
+
+@contextlib.contextmanager
+def _patched(cloud, sleep_scale):
+    """Point the commands at the fake cloud and scale their sleeps
+
+    The commands sleep between polls and to pace the nodes. The sleeps are
+    scaled down, so the wait loops still see the state changes of the fake
+    cloud, which take real time.
+    """
+
+    discoverd = types.ModuleType('ironic_discoverd')
+    discoverd.client = cloud.discoverd
+
+    def sleep(seconds):
+        fake_cloud._sleep(seconds * sleep_scale)
+
+    # The files the commands keep in the home directory, like the
+    # introspection journal, go to a temporary one.
+    home = tempfile.mkdtemp()
+    try:
+        with mock.patch.dict(sys.modules, {
+                'ironic_discoverd': discoverd,
+                'ironic_discoverd.client': cloud.discoverd}):
+            with mock.patch.dict(os.environ, {'HOME': home}):
+                with mock.patch('time.sleep', sleep):
+                    with mock.patch('sys.stdout', six.StringIO()):
+                        yield
+    finally:
+        shutil.rmtree(home)
+
+
+def run(name, nodes, sleep_scale=0.001, **cloud_args):
+    """Run one command against a fake cloud with a number of nodes
+
+    :param name: The name of the scenario, one of SCENARIOS
+    :type  name: string
+
+    :param nodes: The number of nodes in the fake cloud
+    :type  nodes: int
+
+    :param sleep_scale: The factor applied to the sleeps of the command
+    :type  sleep_scale: float
+
+    :param cloud_args: The latency and timing of the fake cloud
+    :type  cloud_args: dict
+    """
+
+    scenario = SCENARIOS[name]
+    cloud = fake_cloud.FakeCloud(nodes=nodes, driver=scenario.driver,
+                                 **cloud_args)
+    if scenario.setup is not None:
+        scenario.setup(cloud)
+    cloud.reset_requests()
+
+    cmd = scenario.command(FakeApp(cloud), None)
+    parsed_args = cmd.get_parser('openstack ' + name).parse_args(
+        scenario.argv)
+
+    peak_memory = None
+    with _patched(cloud, sleep_scale):
+        if tracemalloc is not None:
+            tracemalloc.start()
+        try:
+            start = time.time()
+            cmd.take_action(parsed_args)
+            wall_time = time.time() - start
+        finally:
+            if tracemalloc is not None:
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+    return {
+        'command': name,
+        'nodes': nodes,
+        'wall_time': wall_time,
+        'peak_memory': peak_memory,
+        'requests': cloud.request_count,
+        'request_counts': dict(cloud.requests),
+    }
+
+
+def check_scaling(results, wall_time_per_node=None):
+    """Return the scaling problems found in the results of run()
+
+    For every command, the API calls per node must not grow from the
+    smallest to the largest inventory, within CALLS_PER_NODE_TOLERANCE,
+    and the wall time per node must stay within the budget, if one is set.
+    """
+
+    by_command = collections.OrderedDict()
+    for result in results:
+        by_command.setdefault(result['command'], []).append(result)
+
+    problems = []
+    for command, runs in by_command.items():
+        runs = sorted(runs, key=lambda r: r['nodes'])
+        smallest, largest = runs[0], runs[-1]
+        calls_small = float(smallest['requests']) / smallest['nodes']
+        calls_large = float(largest['requests']) / largest['nodes']
+        if calls_large > calls_small * CALLS_PER_NODE_TOLERANCE:
+            problems.append(
+                "{0}: {1:.1f} API calls per node with {2} nodes, {3:.1f} "
+                "with {4} nodes".format(command, calls_large,
+                                        largest['nodes'], calls_small,
+                                        smallest['nodes']))
+
+        if wall_time_per_node is None:
+            continue
+        for result in runs:
+            per_node = result['wall_time'] / result['nodes']
+            if per_node > wall_time_per_node:
+                problems.append(
+                    "{0}: {1:.4f}s per node with {2} nodes, the budget is "
+                    "{3:.4f}s".format(command, per_node, result['nodes'],
+                                      wall_time_per_node))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', default=','.join(map(str, NODE_COUNTS)),
+                        help='Comma separated node counts')
+    parser.add_argument('--command', action='append', dest='commands',
+                        choices=list(SCENARIOS),
+                        help='The commands to run, defaults to all')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Seconds every request takes')
+    parser.add_argument('--conflict-rate', type=float, default=0,
+                        help='Share of node changes failing with NodeLocked')
+    parser.add_argument('--transition-time', type=float, default=0,
+                        help='Seconds a provision or power change takes')
+    parser.add_argument('--sleep-scale', type=float, default=0.001,
+                        help='Factor applied to the sleeps of the commands')
+    parser.add_argument('--wall-time-per-node', type=float,
+                        help='Fail if a command takes longer per node')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.commands or SCENARIOS:
+        for nodes in [int(n) for n in args.nodes.split(',')]:
+            results.append(run(
+                name, nodes, sleep_scale=args.sleep_scale,
+                latency=args.latency, conflict_rate=args.conflict_rate,
+                transition_time=args.transition_time))
+
+    problems = check_scaling(results, args.wall_time_per_node)
+
+    if args.json:
+        print(json.dumps({'results': results, 'problems': problems},
+                         indent=2, sort_keys=True))
+    else:
+        print("{0:<40} {1:>6} {2:>10} {3:>9} {4:>12}".format(
+            "Command", "Nodes", "Wall (s)", "Requests", "Peak (KiB)"))
+        for result in results:
+            peak = result['peak_memory']
+            print("{0:<40} {1:>6} {2:>10.3f} {3:>9} {4:>12}".format(
+                result['command'], result['nodes'], result['wall_time'],
+                result['requests'],
+                '-' if peak is None else peak // 1024))
+        for problem in problems:
+            print("FAIL: {0}".format(problem))
+
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Scaling checks of the bulk baremetal commands against the fake cloud
+
+The inventory sizes and the wall time budget per node can be raised to
+run the suite against larger clouds, e.g.::
+
+    RDOMANAGER_BENCHMARK_NODES=100,1000 \
+    RDOMANAGER_BENCHMARK_WALL_TIME_PER_NODE=0.01 python -m pytest \
+        rdomanager_oscplugin/tests/benchmarks/test_bulk_commands.py
+"""
+
+import os
+
+from rdomanager_oscplugin.tests import base
+from rdomanager_oscplugin.tests.benchmarks import harness
+
+NODE_COUNTS = [int(n) for n in os.environ.get(
+    'RDOMANAGER_BENCHMARK_NODES', '10,50').split(',')]
+
+# Generous, so the suite doesn't fail on a loaded machine. The commands
+# don't sleep, so the time is spent in the commands and the fake cloud.
+WALL_TIME_PER_NODE = float(os.environ.get(
+    'RDOMANAGER_BENCHMARK_WALL_TIME_PER_NODE', '0.05'))
+
+
+class TestBulkCommandScaling(base.TestCase):
+
+    def _check(self, name):
+        results = [harness.run(name, nodes, sleep_scale=0)
+                   for nodes in NODE_COUNTS]
+
+        for result in results:
+            if harness.tracemalloc is not None:
+                self.assertGreater(result['peak_memory'], 0)
+
+        self.assertEqual(
+            [], harness.check_scaling(results, WALL_TIME_PER_NODE))
+
+    def test_configure_boot(self):
+        self._check('baremetal configure boot')
+
+    def test_show_capabilities(self):
+        self._check('baremetal show capabilities')
+
+    def test_introspection_bulk_start(self):
+        self._check('baremetal introspection bulk start')
+
+    def test_introspection_bulk_status(self):
+        self._check('baremetal introspection bulk status')
+
+    def test_configure_ready_state(self):
+        self._check('baremetal configure ready state')
@@ -0,0 +1,77 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+from rdomanager_oscplugin import baremetal_bulk
+from rdomanager_oscplugin.tests import base
+from rdomanager_oscplugin.tests.benchmarks import fake_cloud
+from rdomanager_oscplugin.tests.benchmarks import harness
+
+
+class TestFakeCloud(base.TestCase):
+
+    def test_provision_transition(self):
+        cloud = fake_cloud.FakeCloud(nodes=1, transition_time=60)
+        node = cloud.ironic.node.list()[0]
+
+        cloud.ironic.node.set_provision_state(node.uuid, 'manage')
+
+        self.assertEqual('verifying',
+                         cloud.ironic.node.get(node.uuid).provision_state)
+        self.assertRaises(fake_cloud.Conflict, cloud.ironic.node.update,
+                          node.uuid, [])
+        self.assertEqual(4, cloud.request_count)
+
+    def test_conflict_injection(self):
+        cloud = fake_cloud.FakeCloud(nodes=100, conflict_rate=0.2)
+        bulk_client = baremetal_bulk.BulkNodeClient(
+            cloud.ironic,
+            retry_policy=baremetal_bulk.conflict_retry_policy(base_delay=0))
+
+        result = bulk_client.set_power_state_many(list(cloud.ironic.nodes),
+                                                  'on')
+
+        result.raise_for_errors()
+        self.assertGreater(cloud.requests['ironic.node.set_power_state'],
+                           100)
+
+
+class TestHarness(base.TestCase):
+
+    def test_scenarios(self):
+        for name in harness.SCENARIOS:
+            result = harness.run(name, 10, sleep_scale=0)
+
+            self.assertEqual(10, result['nodes'])
+            self.assertGreaterEqual(result['requests'], 10)
+
+    def test_check_scaling(self):
+        results = [
+            {'command': 'linear', 'nodes': 10, 'requests': 21,
+             'wall_time': 0.1},
+            {'command': 'linear', 'nodes': 100, 'requests': 201,
+             'wall_time': 1.0},
+            {'command': 'quadratic', 'nodes': 10, 'requests': 100,
+             'wall_time': 0.1},
+            {'command': 'quadratic', 'nodes': 100, 'requests': 10000,
+             'wall_time': 5.0},
+        ]
+
+        self.assertEqual([], harness.check_scaling(results[:2], 0.01))
+        self.assertEqual([
+            'quadratic: 100.0 API calls per node with 100 nodes, 10.0 with '
+            '10 nodes',
+            'quadratic: 0.0500s per node with 100 nodes, the budget is '
+            '0.0100s',
+        ], harness.check_scaling(results, 0.01))
@@ -0,0 +1,108 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Lookups of undercloud hiera keys, read from the hieradata or by hiera
+
+The number of keys and the time budget per lookup can be changed, e.g.::
+
+    RDOMANAGER_BENCHMARK_HIERA_KEYS=10000 \
+    RDOMANAGER_BENCHMARK_HIERA_LOOKUP_TIME=0.0001 python -m pytest \
+        rdomanager_oscplugin/tests/benchmarks/test_hiera_lookup.py
+
+The comparison with the hiera command only runs where hiera is installed.
+"""
+
+import os
+import subprocess
+import time
+
+import fixtures
+import six
+
+from rdomanager_oscplugin import hiera
+from rdomanager_oscplugin.tests import base
+
+KEY_COUNT = int(os.environ.get('RDOMANAGER_BENCHMARK_HIERA_KEYS', '1000'))
+
+# Generous, a lookup in memory takes microseconds.
+LOOKUP_TIME = float(os.environ.get(
+    'RDOMANAGER_BENCHMARK_HIERA_LOOKUP_TIME', '0.001'))
+
+# Keys looked up with the hiera command, each one starts Ruby.
+SUBPROCESS_LOOKUPS = 5
+
+
+def _hiera_installed():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(['hiera', '--version'], stdout=devnull,
+                                  stderr=devnull)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return True
+
+
+class TestHieraLookup(base.TestCase):
+
+    def setUp(self):
+        super(TestHieraLookup, self).setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.config_path = os.path.join(self.tmp_dir, 'hiera.yaml')
+        with open(self.config_path, 'w') as f:
+            f.write(":backends:\n  - yaml\n"
+                    ":yaml:\n  :datadir: {0}\n"
+                    ":hierarchy:\n  - puppet-stack-config\n  - common\n"
+                    .format(self.tmp_dir))
+
+        self.keys = ['key_{0}'.format(i) for i in six.moves.range(KEY_COUNT)]
+        for name, keys in (('puppet-stack-config', self.keys[::2]),
+                           ('common', self.keys)):
+            with open(os.path.join(self.tmp_dir, name + '.yaml'), 'w') as f:
+                for key in keys:
+                    f.write('{0}: {1}-{0}\n'.format(key, name))
+
+    def _expected(self, index):
+        source = 'puppet-stack-config' if index % 2 == 0 else 'common'
+        return '{0}-{1}'.format(source, self.keys[index])
+
+    def _read_all(self):
+        reader = hiera.HieraReader(self.config_path)
+        start = time.time()
+        values = [reader.get(key) for key in self.keys]
+        return values, (time.time() - start) / len(self.keys)
+
+    def test_reader(self):
+        values, per_lookup = self._read_all()
+
+        self.assertEqual(
+            [self._expected(i) for i in six.moves.range(KEY_COUNT)], values)
+        self.assertLess(per_lookup, LOOKUP_TIME)
+
+    def test_reader_against_hiera(self):
+        if not _hiera_installed():
+            self.skipTest("hiera isn't installed")
+
+        values, per_lookup = self._read_all()
+
+        step = max(1, KEY_COUNT // SUBPROCESS_LOOKUPS)
+        indexes = list(six.moves.range(0, KEY_COUNT, step))
+        start = time.time()
+        for index in indexes:
+            out = subprocess.check_output(
+                ['hiera', '-c', self.config_path, self.keys[index]])
+            self.assertEqual(values[index], out.decode('utf-8').strip())
+        per_subprocess = (time.time() - start) / len(indexes)
+
+        self.assertLess(per_lookup, per_subprocess)
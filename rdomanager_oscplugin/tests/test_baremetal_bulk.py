@@ -0,0 +1,135 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import collections
+
+import mock
+
+from rdomanager_oscplugin import baremetal_bulk
+from rdomanager_oscplugin import exceptions
+from rdomanager_oscplugin.tests import base
+
+
+class Conflict(Exception):
+    http_status = 409
+
+
+class TestBulkNodeClient(base.TestCase):
+
+    def setUp(self):
+        super(TestBulkNodeClient, self).setUp()
+
+        self.bm_client = mock.Mock()
+        self.retry_policy = baremetal_bulk.conflict_retry_policy(
+            base_delay=0)
+        self.bulk_client = baremetal_bulk.BulkNodeClient(
+            self.bm_client, workers=4, retry_policy=self.retry_policy)
+        self.uuids = ['UUID%d' % i for i in range(10)]
+
+    def test_get_many(self):
+        self.bm_client.node.get.side_effect = lambda uuid: uuid.lower()
+
+        result = self.bulk_client.get_many(self.uuids)
+
+        self.assertEqual(self.uuids, list(result.results))
+        self.assertEqual([uuid.lower() for uuid in self.uuids],
+                         list(result.results.values()))
+        self.assertEqual({}, result.errors)
+        result.raise_for_errors()
+
+    def test_update_many(self):
+        patches = collections.OrderedDict(
+            (uuid, [{'op': 'add', 'path': '/extra/uuid', 'value': uuid}])
+            for uuid in self.uuids)
+
+        self.bulk_client.update_many(patches).raise_for_errors()
+
+        self.bm_client.node.update.assert_has_calls(
+            [mock.call(uuid, patch) for uuid, patch in patches.items()],
+            any_order=True)
+
+    def test_vendor_passthru_many(self):
+        self.bulk_client.vendor_passthru_many(
+            self.uuids[:2], 'list_virtual_disks', http_method='GET')
+
+        self.bm_client.node.vendor_passthru.assert_has_calls([
+            mock.call('UUID0', 'list_virtual_disks', http_method='GET'),
+            mock.call('UUID1', 'list_virtual_disks', http_method='GET'),
+        ], any_order=True)
+
+    def test_errors(self):
+        def set_power_state(uuid, state):
+            if uuid in ('UUID3', 'UUID7'):
+                raise ValueError(uuid)
+
+        self.bm_client.node.set_power_state.side_effect = set_power_state
+
+        result = self.bulk_client.set_power_state_many(self.uuids, 'off')
+
+        self.assertEqual(8, len(result.results))
+        self.assertEqual(['UUID3', 'UUID7'], list(result.errors))
+        self.assertEqual(10, self.bm_client.node.set_power_state.call_count)
+        error = self.assertRaises(exceptions.BulkOperationError,
+                                  result.raise_for_errors)
+        self.assertEqual(
+            'set_power_state failed for 2 of 10 nodes: UUID3, UUID7',
+            str(error))
+
+    def test_is_conflict(self):
+        self.assertTrue(baremetal_bulk.is_conflict(Conflict()))
+        self.assertFalse(baremetal_bulk.is_conflict(ValueError()))
+
+    def test_conflict_retried(self):
+        self.bm_client.node.set_provision_state.side_effect = [
+            Conflict(), Conflict(), None]
+
+        result = self.bulk_client.set_provision_state_many(['UUID0'],
+                                                           'provide')
+
+        self.assertEqual({'UUID0': None}, dict(result.results))
+        self.assertEqual(3, self.bm_client.node.set_provision_state.call_count)
+
+    def test_conflict_retries_exhausted(self):
+        self.bm_client.node.set_provision_state.side_effect = Conflict()
+
+        result = self.bulk_client.set_provision_state_many(['UUID0'],
+                                                           'provide')
+
+        self.assertIsInstance(result.errors['UUID0'], Conflict)
+        self.assertEqual(self.retry_policy.retries + 1,
+                         self.bm_client.node.set_provision_state.call_count)
+
+    def test_retry_budget_shared(self):
+        self.bm_client.node.set_power_state.side_effect = Conflict()
+
+        result = self.bulk_client.set_power_state_many(self.uuids, 'off')
+
+        self.assertEqual(10, len(result.errors))
+        # Every node is called once, and the retries stop once the budget
+        # of the operation is spent.
+        self.assertEqual(
+            10 + self.retry_policy.budget(10).remaining,
+            self.bm_client.node.set_power_state.call_count)
+
+    def test_transition_already_applied(self):
+        self.bm_client.node.set_provision_state.side_effect = Conflict()
+        self.bm_client.node.get.return_value = mock.Mock(
+            provision_state='available')
+
+        result = self.bulk_client.set_provision_state_many(
+            ['UUID0'], 'provide', target_state='available')
+
+        self.assertEqual({'UUID0': None}, dict(result.results))
+        self.assertEqual(1, self.bm_client.node.set_provision_state.call_count)
@@ -0,0 +1,125 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import json
+import os
+import stat
+import tempfile
+
+import mock
+
+from rdomanager_oscplugin import heat_payload
+from rdomanager_oscplugin.tests import base
+
+
+class TestHeatPayload(base.TestCase):
+
+    def setUp(self):
+        super(TestHeatPayload, self).setUp()
+
+        self.stack_args = {
+            'stack_name': 'overcloud',
+            'template': {'resources': {}},
+            'parameters': {'NovaPassword': 'secret', 'ControllerCount': 1},
+            'environment': {'parameters': {}},
+            'files': {
+                'file:///tht/a.yaml': 'aaaa',
+                'file:///tht/b.yaml': 'bb',
+            },
+        }
+
+    def test_summarize(self):
+        summary = heat_payload.summarize(self.stack_args)
+
+        self.assertEqual('overcloud', summary['stack_name'])
+        self.assertEqual(['ControllerCount', 'NovaPassword'],
+                         summary['parameters'])
+        self.assertEqual(2, summary['file_count'])
+        self.assertEqual(6, summary['files_bytes'])
+        self.assertEqual(4, summary['files']['file:///tht/a.yaml']['size'])
+        self.assertEqual('70c881d4a26984ddce795f6f71817c9cf4480e79',
+                         summary['files']['file:///tht/a.yaml']['sha1'])
+        self.assertEqual(
+            summary['template_bytes'] + summary['environment_bytes'] + 6,
+            summary['total_bytes'])
+        self.assertNotIn('secret', json.dumps(summary))
+
+    def test_summarize_bytes(self):
+        self.stack_args['files']['file:///tht/script.sh'] = b'echo hello'
+
+        summary = heat_payload.summarize(self.stack_args)
+
+        self.assertEqual(
+            {'size': 10, 'sha1': '2e26648e784ec7a0cf4d08534ddda41df35f1a30'},
+            summary['files']['file:///tht/script.sh'])
+
+    def test_log_summary(self):
+        log = mock.Mock()
+
+        heat_payload.log_summary(log,
+                                 heat_payload.summarize(self.stack_args))
+
+        self.assertEqual(4, log.debug.call_count)
+        self.assertNotIn('secret', str(log.debug.mock_calls))
+
+    def test_analyze(self):
+        nested = json.dumps({'resources': {'Config': {
+            'properties': {'config': {'get_file': 'file:///tht/script.sh'}},
+        }}})
+        files = {
+            'file:///tht/nested.yaml': nested,
+            'file:///tht/script.sh': b'echo hello',
+            'file:///tht/copy.sh': 'echo hello',
+            'file:///tht/default-nic.yaml': 'resources: {}',
+        }
+        template = {'resources': {'Foo': {'type': 'OS::TripleO::Foo'}}}
+        environment = {'resource_registry': {
+            'OS::TripleO::Foo': 'file:///tht/nested.yaml',
+        }}
+
+        analysis = heat_payload.analyze(template, environment, files,
+                                        largest=1)
+
+        self.assertEqual([('file:///tht/nested.yaml', len(nested))],
+                         analysis['largest'])
+        self.assertEqual([['file:///tht/copy.sh', 'file:///tht/script.sh']],
+                         analysis['duplicates'])
+        self.assertEqual(['file:///tht/copy.sh',
+                          'file:///tht/default-nic.yaml'],
+                         analysis['unreachable'])
+        self.assertEqual(23, analysis['unreachable_bytes'])
+
+        self.assertEqual(
+            ['file:///tht/nested.yaml', 'file:///tht/script.sh'],
+            sorted(heat_payload.prune(files, analysis['unreachable'])))
+
+    def test_dump(self):
+        path = os.path.join(tempfile.mkdtemp(), 'payload.json')
+
+        heat_payload.dump(path, self.stack_args)
+
+        with open(path) as f:
+            self.assertEqual(self.stack_args, json.load(f))
+
+    def test_dump_bytes(self):
+        path = os.path.join(tempfile.mkdtemp(), 'payload.json')
+        self.stack_args['files']['file:///tht/script.sh'] = b'echo hello'
+
+        heat_payload.dump(path, self.stack_args)
+
+        with open(path) as f:
+            self.assertEqual('echo hello',
+                             json.load(f)['files']['file:///tht/script.sh'])
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
@@ -0,0 +1,93 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import os
+
+import fixtures
+import mock
+
+from rdomanager_oscplugin import hiera
+from rdomanager_oscplugin.tests import base
+
+HIERA_YAML = """---
+:backends:
+  - yaml
+:yaml:
+  :datadir: %s
+:hierarchy:
+  - "%%{::fqdn}"
+  - puppet-stack-config
+  - common
+"""
+
+
+class TestHieraReader(base.TestCase):
+
+    def setUp(self):
+        super(TestHieraReader, self).setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.config_path = os.path.join(self.tmp_dir, 'hiera.yaml')
+        self._write('hiera.yaml', HIERA_YAML % self.tmp_dir)
+        self._write('puppet-stack-config.yaml',
+                    'admin_password: secret\n'
+                    'debug: true\n'
+                    'workers: 4\n'
+                    'controller_host: "%{hiera(\'ip\')}"\n'
+                    'servers: [a, b]\n')
+        self._write('common.yaml',
+                    'admin_password: common\n'
+                    'region: regionOne\n')
+        self.reader = hiera.HieraReader(self.config_path)
+
+    def _write(self, name, data):
+        with open(os.path.join(self.tmp_dir, name), 'w') as f:
+            f.write(data)
+
+    def test_priority(self):
+        self.assertEqual('secret', self.reader.get('admin_password'))
+        self.assertEqual('regionOne', self.reader.get('region'))
+
+    def test_scalars(self):
+        self.assertEqual('true', self.reader.get('debug'))
+        self.assertEqual('4', self.reader.get('workers'))
+
+    def test_unanswered(self):
+        self.assertRaises(KeyError, self.reader.get, 'missing')
+        self.assertRaises(KeyError, self.reader.get, 'controller_host')
+        self.assertRaises(KeyError, self.reader.get, 'servers')
+
+    def test_fact_level(self):
+        self._write('node.example.com.yaml', 'region: regionTwo\n')
+
+        self.assertRaises(KeyError, self.reader.get, 'region')
+        self.assertEqual('secret', self.reader.get('admin_password'))
+
+    def test_loaded_once(self):
+        self.reader.get('region')
+
+        with mock.patch('six.moves.builtins.open') as mock_open:
+            self.assertEqual('secret', self.reader.get('admin_password'))
+        self.assertFalse(mock_open.called)
+
+    def test_no_config(self):
+        reader = hiera.HieraReader(os.path.join(self.tmp_dir, 'missing'))
+
+        self.assertRaises(KeyError, reader.get, 'admin_password')
+
+    def test_unparseable_data(self):
+        self._write('common.yaml', 'region: [\n')
+
+        self.assertRaises(KeyError, self.reader.get, 'admin_password')
+        self.assertIn('Failed to parse', self.log_fixture.output)
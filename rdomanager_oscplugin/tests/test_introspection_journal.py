@@ -0,0 +1,94 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import json
+import os
+
+from rdomanager_oscplugin import introspection_journal
+from rdomanager_oscplugin.tests import base
+
+
+class TestIntrospectionJournal(base.TestCase):
+
+    def setUp(self):
+        super(TestIntrospectionJournal, self).setUp()
+        self.path = os.path.expanduser(
+            introspection_journal.DEFAULT_JOURNAL_PATH)
+
+    def _read(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_appended_on_every_change(self):
+        journal = introspection_journal.IntrospectionJournal()
+
+        journal.start('UUID0')
+
+        entry, = self._read()
+        self.assertEqual('UUID0', entry['uuid'])
+        self.assertEqual('introspection', entry['phase'])
+        self.assertFalse(entry['finished'])
+        self.assertIsNone(entry['error'])
+
+        journal.finish('UUID0', 'Timeout')
+
+        _, entry = self._read()
+        self.assertTrue(entry['finished'])
+        self.assertEqual('Timeout', entry['error'])
+
+    def test_compacted_on_load(self):
+        journal = introspection_journal.IntrospectionJournal()
+        journal.start('UUID0')
+        journal.finish('UUID0')
+        journal.start('UUID1')
+        with open(self.path, 'a') as f:
+            f.write('{"uuid": "UUID1", "fini')
+
+        resumed = introspection_journal.IntrospectionJournal()
+
+        self.assertEqual(['UUID0', 'UUID1'],
+                         [entry['uuid'] for entry in self._read()])
+        self.assertTrue(resumed.is_finished('UUID0'))
+        self.assertEqual(['UUID1'], resumed.in_flight())
+
+    def test_resume(self):
+        journal = introspection_journal.IntrospectionJournal()
+        journal.start('UUID0')
+        journal.finish('UUID0')
+        journal.start('UUID1')
+        journal.start('UUID2')
+        journal.finish('UUID2', 'Timeout')
+
+        resumed = introspection_journal.IntrospectionJournal()
+
+        self.assertTrue(resumed.is_finished('UUID0'))
+        self.assertFalse(resumed.is_finished('UUID1'))
+        self.assertFalse(resumed.is_finished('UUID2'))
+        self.assertEqual(['UUID1'], resumed.in_flight())
+
+    def test_missing(self):
+        journal = introspection_journal.IntrospectionJournal()
+
+        self.assertEqual({}, journal.entries)
+        self.assertEqual([], journal.in_flight())
+
+    def test_unreadable(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{')
+
+        journal = introspection_journal.IntrospectionJournal()
+
+        self.assertEqual({}, journal.entries)
@@ -0,0 +1,94 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import itertools
+import random
+
+from rdomanager_oscplugin import ip_ranges
+from rdomanager_oscplugin.tests import base
+
+
+class TestIPRanges(base.TestCase):
+
+    def test_network_range(self):
+        network = ip_ranges.network_range('172.17.0.0/24')
+
+        self.assertEqual(4, network.version)
+        self.assertEqual(0xAC110000, network.start)
+        self.assertEqual(0xAC1100FF, network.end)
+        self.assertEqual('172.17.0.0/24', network.label)
+        self.assertRaises(ValueError, ip_ranges.network_range,
+                          '172.17.0.278/24')
+
+    def test_address_range(self):
+        pool = ip_ranges.address_range('172.17.0.10', '172.17.0.200')
+
+        self.assertEqual(190, pool.end - pool.start)
+        self.assertRaises(ValueError, ip_ranges.address_range,
+                          '172.17.0.200', '172.17.0.10')
+        self.assertRaises(ValueError, ip_ranges.address_range,
+                          '172.17.0.10', 'fd00::1')
+
+    def test_find_overlaps(self):
+        networks = [ip_ranges.network_range(cidr) for cidr in (
+            '172.17.0.0/16', '10.0.0.0/24', '172.17.1.0/24', 'fd00::/64',
+            '172.17.1.128/25', '10.0.1.0/24', 'fd00::/48')]
+
+        overlaps = ip_ranges.find_overlaps(networks)
+
+        self.assertEqual([
+            ('172.17.0.0/16', '172.17.1.0/24'),
+            ('172.17.0.0/16', '172.17.1.128/25'),
+            ('172.17.1.0/24', '172.17.1.128/25'),
+            ('fd00::/64', 'fd00::/48'),
+        ], sorted((a.label, b.label) for a, b in overlaps))
+
+    def test_find_overlaps_matches_pairwise(self):
+        rand = random.Random(42)
+        ranges = []
+        for i in range(300):
+            start = rand.randint(0, 100000)
+            ranges.append(ip_ranges.IPRange(4, start,
+                                            start + rand.randint(0, 500), i))
+
+        expected = set(
+            frozenset((a.label, b.label))
+            for a, b in itertools.combinations(ranges, 2)
+            if a.start <= b.end and b.start <= a.end)
+
+        overlaps = ip_ranges.find_overlaps(ranges)
+
+        self.assertEqual(len(expected), len(overlaps))
+        self.assertEqual(expected, set(frozenset((a.label, b.label))
+                                       for a, b in overlaps))
+
+    def test_range_index(self):
+        index = ip_ranges.RangeIndex([
+            ip_ranges.address_range('10.0.0.10', '10.0.0.100', 'wide'),
+            ip_ranges.address_range('10.0.0.20', '10.0.0.30', 'narrow'),
+            ip_ranges.address_range('10.0.0.40', '10.0.0.50', 'other'),
+            ip_ranges.network_range('fd00::/64', 'v6'),
+        ])
+
+        def labels(address):
+            return [r.label for r in index.containing(
+                *ip_ranges.address_value(address))]
+
+        self.assertEqual(['wide', 'narrow'], labels('10.0.0.25'))
+        self.assertEqual(['wide'], labels('10.0.0.35'))
+        self.assertEqual(['wide', 'other'], labels('10.0.0.50'))
+        self.assertEqual([], labels('10.0.0.101'))
+        self.assertEqual([], labels('10.0.0.1'))
+        self.assertEqual(['v6'], labels('fd00::1'))
@@ -0,0 +1,164 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import sys
+
+import fixtures
+import mock
+
+from rdomanager_oscplugin import keystone_endpoints
+from rdomanager_oscplugin.tests import base
+
+SERVICES = {
+    'glance': {
+        'description': 'Glance Image Service',
+        'type': 'image',
+        'port': 9292,
+    },
+    'ceilometer': {
+        'description': 'Ceilometer Service',
+        'type': 'metering',
+        'port': 8777,
+    },
+    'horizon': {
+        'description': 'OpenStack Dashboard',
+        'type': 'dashboard',
+        'nouser': True,
+        'path': '/',
+        'admin_path': '/admin'
+    },
+}
+
+
+def _resource(**kwargs):
+    resource = mock.Mock()
+    resource.configure_mock(**kwargs)
+    return resource
+
+
+class TestKeystoneEndpoints(base.TestCase):
+
+    def setUp(self):
+        super(TestKeystoneEndpoints, self).setUp()
+        os_cloud_config = mock.Mock()
+        os_cloud_config.keystone.SERVICES = SERVICES
+        self.useFixture(fixtures.MonkeyPatch('sys.modules', dict(
+            sys.modules, os_cloud_config=os_cloud_config,
+            **{'os_cloud_config.keystone': os_cloud_config.keystone})))
+
+        self.keystone = mock.Mock()
+        self.admin_role = _resource(name='admin', id='ROLE')
+        self.admin_tenant = _resource(name='admin', id='ADMIN')
+        self.service_tenant = _resource(name='service', id='SERVICE')
+        self.keystone.roles.list.return_value = [self.admin_role]
+        self.keystone.tenants.list.return_value = [self.admin_tenant,
+                                                   self.service_tenant]
+        self.keystone.users.list.return_value = [_resource(name='admin')]
+        self.keystone.services.list.return_value = [
+            _resource(name='keystone', type='identity', id='KEYSTONE')]
+        self.keystone.endpoints.list.return_value = [
+            _resource(id='EP0', service_id='KEYSTONE', region='regionOne',
+                      publicurl='http://192.0.2.1:5000/v2.0',
+                      adminurl='http://192.0.2.1:35357/v2.0',
+                      internalurl='http://192.0.2.1:5000/v2.0')]
+
+        def create_service(name, service_type, description):
+            return _resource(id=service_type.upper())
+
+        self.keystone.services.create.side_effect = create_service
+
+        self.services = {
+            'glance': {'password': 'GLANCE'},
+            'ceilometer': {'password': 'CEILOMETER'},
+            'horizon': {'port': '80', 'path': '/dashboard/'},
+        }
+
+    def _setup(self):
+        return keystone_endpoints.setup_endpoints(
+            self.keystone, self.services, public_host='192.0.2.1',
+            internal_host='192.0.2.1')
+
+    def test_fresh_overcloud(self):
+        self._setup()
+
+        self.assertEqual(
+            sorted(['swiftoperator', 'ResellerAdmin', 'heat_stack_user']),
+            sorted(c[0][0] for c in self.keystone.roles.create.call_args_list))
+
+        self.assertEqual(2, self.keystone.users.create.call_count)
+        self.keystone.users.create.assert_any_call(
+            'glance', 'GLANCE', tenant_id='SERVICE',
+            email='nobody@example.com')
+        ceilometer = self.keystone.users.create.return_value
+        self.keystone.roles.add_user_role.assert_any_call(
+            ceilometer, self.admin_role, self.admin_tenant)
+        self.assertEqual(3, self.keystone.roles.add_user_role.call_count)
+
+        self.assertEqual(3, self.keystone.services.create.call_count)
+        self.assertEqual(3, self.keystone.endpoints.create.call_count)
+        self.keystone.endpoints.create.assert_any_call(
+            'regionOne', 'IMAGE', 'http://192.0.2.1:9292/',
+            'http://192.0.2.1:9292/', 'http://192.0.2.1:9292/')
+        self.keystone.endpoints.create.assert_any_call(
+            'regionOne', 'DASHBOARD', 'http://192.0.2.1:80/dashboard/',
+            'http://192.0.2.1:80/admin', 'http://192.0.2.1:80/dashboard/')
+        self.assertFalse(self.keystone.endpoints.delete.called)
+
+    def test_rerun_changes_nothing(self):
+        self.keystone.roles.list.return_value = [
+            _resource(name=name) for name in
+            ('admin', 'swiftoperator', 'ResellerAdmin', 'heat_stack_user')]
+        self.keystone.users.list.return_value = [
+            _resource(name='glance'), _resource(name='ceilometer')]
+        self.keystone.services.list.return_value = [
+            _resource(type='image', id='IMAGE')]
+        self.keystone.endpoints.list.return_value = [
+            _resource(id='EP1', service_id='IMAGE', region='regionOne',
+                      publicurl='http://192.0.2.1:9292/',
+                      adminurl='http://192.0.2.1:9292/',
+                      internalurl='http://192.0.2.1:9292/')]
+        del self.services['ceilometer']
+        del self.services['horizon']
+
+        todo = self._setup()
+
+        self.assertEqual(
+            keystone_endpoints.Plan([], [], [], [], []), todo)
+        self.assertFalse(self.keystone.roles.create.called)
+        self.assertFalse(self.keystone.users.create.called)
+        self.assertFalse(self.keystone.services.create.called)
+        self.assertFalse(self.keystone.endpoints.create.called)
+
+    def test_changed_endpoint_replaced(self):
+        self.keystone.services.list.return_value = [
+            _resource(type='image', id='IMAGE')]
+        self.keystone.endpoints.list.return_value = [
+            _resource(id='EP1', service_id='IMAGE', region='regionOne',
+                      publicurl='http://192.0.2.9:9292/',
+                      adminurl='http://192.0.2.9:9292/',
+                      internalurl='http://192.0.2.9:9292/'),
+            _resource(id='EP2', service_id='IMAGE', region='regionTwo',
+                      publicurl='http://192.0.2.9:9292/',
+                      adminurl='http://192.0.2.9:9292/',
+                      internalurl='http://192.0.2.9:9292/')]
+        self.services = {'glance': {'password': 'GLANCE'}}
+
+        self._setup()
+
+        self.keystone.endpoints.delete.assert_called_once_with('EP1')
+        self.keystone.endpoints.create.assert_called_once_with(
+            'regionOne', 'IMAGE', 'http://192.0.2.1:9292/',
+            'http://192.0.2.1:9292/', 'http://192.0.2.1:9292/')
+        self.assertFalse(self.keystone.services.create.called)
@@ -0,0 +1,121 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import base64
+import hashlib
+import hmac
+import os
+import stat
+
+import fixtures
+
+from rdomanager_oscplugin import known_hosts
+from rdomanager_oscplugin.tests import base
+
+
+def _hashed(host, salt=b'0123456789abcdefghij'):
+    digest = hmac.new(salt, host.encode('utf-8'), hashlib.sha1).digest()
+    return '|1|{0}|{1}'.format(base64.b64encode(salt).decode('ascii'),
+                               base64.b64encode(digest).decode('ascii'))
+
+
+class TestKnownHosts(base.TestCase):
+
+    def setUp(self):
+        super(TestKnownHosts, self).setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.path = os.path.join(self.tmp_dir, 'known_hosts')
+
+    def _write(self, lines):
+        with open(self.path, 'w') as f:
+            f.write(''.join(line + '\n' for line in lines))
+
+    def _read(self):
+        with open(self.path) as f:
+            return f.read().splitlines()
+
+    def test_remove_hosts(self):
+        self._write([
+            '# comment 192.168.0.1',
+            '192.168.0.1 ssh-rsa AAAA1',
+            'undercloud,192.168.0.2 ssh-rsa AAAA2',
+            '[192.168.0.1]:2222 ssh-rsa AAAA3',
+            _hashed('192.168.0.3') + ' ssh-rsa AAAA4',
+            _hashed('192.168.0.4') + ' ssh-rsa AAAA5',
+            '@cert-authority 192.168.0.2 ssh-rsa AAAA6',
+            '',
+            '192.168.0.10 ssh-rsa AAAA7',
+        ])
+        os.chmod(self.path, 0o644)
+
+        removed = known_hosts.remove_hosts(
+            ['192.168.0.1', '192.168.0.2', '192.168.0.3'], self.path)
+
+        self.assertEqual(3, removed)
+        self.assertEqual([
+            '# comment 192.168.0.1',
+            '[192.168.0.1]:2222 ssh-rsa AAAA3',
+            _hashed('192.168.0.4') + ' ssh-rsa AAAA5',
+            '@cert-authority 192.168.0.2 ssh-rsa AAAA6',
+            '',
+            '192.168.0.10 ssh-rsa AAAA7',
+        ], self._read())
+        self.assertEqual(0o644, stat.S_IMODE(os.stat(self.path).st_mode))
+        self.assertEqual(['known_hosts'], os.listdir(self.tmp_dir))
+
+    def test_remove_hosts_with_port(self):
+        self._write(['[192.168.0.1]:2222 ssh-rsa AAAA1',
+                     _hashed('[192.168.0.1]:2222') + ' ssh-rsa AAAA2'])
+
+        removed = known_hosts.remove_hosts(['[192.168.0.1]:2222'], self.path)
+
+        self.assertEqual(2, removed)
+        self.assertEqual([], self._read())
+
+    def test_marker_lines_kept(self):
+        lines = ['@revoked 192.168.0.1 ssh-rsa AAAA1',
+                 '@cert-authority 192.168.0.1,192.168.0.2 ssh-rsa AAAA2',
+                 '@revoked ' + _hashed('192.168.0.1') + ' ssh-rsa AAAA3']
+        self._write(lines)
+
+        self.assertEqual(0, known_hosts.remove_hosts(
+            ['192.168.0.1', '192.168.0.2'], self.path))
+
+        self.assertEqual(lines, self._read())
+
+    def test_unchanged_file_kept(self):
+        self._write(['192.168.0.10 ssh-rsa AAAA1', '|1|bad ssh-rsa AAAA2'])
+        inode = os.stat(self.path).st_ino
+
+        self.assertEqual(0, known_hosts.remove_hosts(['192.168.0.1'],
+                                                     self.path))
+
+        self.assertEqual(inode, os.stat(self.path).st_ino)
+        self.assertEqual(['known_hosts'], os.listdir(self.tmp_dir))
+
+    def test_symlink_kept(self):
+        self._write(['192.168.0.1 ssh-rsa AAAA1'])
+        link = os.path.join(self.tmp_dir, 'link')
+        os.symlink(self.path, link)
+
+        known_hosts.remove_hosts(['192.168.0.1'], link)
+
+        self.assertTrue(os.path.islink(link))
+        self.assertEqual([], self._read())
+
+    def test_no_file(self):
+        self.assertEqual(0, known_hosts.remove_hosts(['192.168.0.1'],
+                                                     self.path))
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,102 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import json
+import os
+import sys
+
+import fixtures
+import mock
+
+from rdomanager_oscplugin import overcloud_secrets
+from rdomanager_oscplugin.tests import base
+
+
+class TestOvercloudSecrets(base.TestCase):
+
+    def setUp(self):
+        super(TestOvercloudSecrets, self).setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.passwords_file = os.path.join(self.tmp_dir, 'passwords')
+        self.pki_file = os.path.join(self.tmp_dir, 'pki.json')
+
+        self.keystone_pki = mock.Mock()
+        self.keystone_pki.create_ca_pair.return_value = (b'ca key',
+                                                         b'ca cert')
+        self.keystone_pki.create_signing_pair.return_value = (
+            b'signing key', b'signing cert')
+        os_cloud_config = mock.Mock(keystone_pki=self.keystone_pki)
+        self.useFixture(fixtures.MonkeyPatch('sys.modules', dict(
+            sys.modules, os_cloud_config=os_cloud_config,
+            **{'os_cloud_config.keystone_pki': self.keystone_pki})))
+
+    def test_keystone_pki_reused(self):
+        pki = overcloud_secrets.load_keystone_pki(self.pki_file)
+
+        self.assertEqual({
+            'ca_key': 'ca key',
+            'ca_cert': 'ca cert',
+            'signing_key': 'signing key',
+            'signing_cert': 'signing cert',
+        }, pki)
+        self.keystone_pki.create_signing_pair.assert_called_once_with(
+            b'ca key', b'ca cert')
+        with open(self.pki_file) as f:
+            self.assertEqual(pki, json.load(f))
+
+        self.assertEqual(pki,
+                         overcloud_secrets.load_keystone_pki(self.pki_file))
+        self.assertEqual(1, self.keystone_pki.create_ca_pair.call_count)
+
+    def test_keystone_pki_unreadable(self):
+        with open(self.pki_file, 'w') as f:
+            f.write('{')
+
+        pki = overcloud_secrets.load_keystone_pki(self.pki_file)
+
+        self.assertEqual('ca cert', pki['ca_cert'])
+        self.assertIn('unreadable', self.log_fixture.output)
+
+    @mock.patch('rdomanager_oscplugin.utils.generate_overcloud_passwords')
+    def test_stage(self, mock_generate_passwords):
+        mock_generate_passwords.return_value = {'PASSWORD': 'password'}
+        stage = overcloud_secrets.SecretsStage(self.passwords_file,
+                                               self.pki_file)
+
+        stage.start()
+
+        self.assertEqual({'PASSWORD': 'password'}, stage.passwords())
+        self.assertEqual('signing key', stage.keystone_pki()['signing_key'])
+        mock_generate_passwords.assert_called_once_with(self.passwords_file)
+
+    @mock.patch('rdomanager_oscplugin.utils.generate_overcloud_passwords')
+    def test_stage_without_keystone_pki(self, mock_generate_passwords):
+        stage = overcloud_secrets.SecretsStage(self.passwords_file,
+                                               self.pki_file)
+
+        stage.start(keystone_pki=False)
+        stage.passwords()
+
+        self.assertFalse(self.keystone_pki.create_ca_pair.called)
+        self.assertFalse(os.path.exists(self.pki_file))
+
+    def test_stage_error(self):
+        self.keystone_pki.create_ca_pair.side_effect = ValueError('No RNG')
+        stage = overcloud_secrets.SecretsStage(self.passwords_file,
+                                               self.pki_file)
+
+        stage.start()
+
+        self.assertRaises(ValueError, stage.keystone_pki)
@@ -0,0 +1,141 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import json
+import os
+import tempfile
+
+import mock
+import six
+
+from rdomanager_oscplugin import profiling
+from rdomanager_oscplugin.tests import base
+
+
+class FakeClientWrapper(object):
+
+    def __init__(self):
+        self.bm_client = mock.Mock()
+
+    def baremetal(self):
+        return self.bm_client
+
+
+class FakeClientManager(object):
+
+    def __init__(self):
+        self.rdomanager_oscplugin = FakeClientWrapper()
+        self.compute = mock.Mock()
+        self.region_name = 'regionOne'
+
+
+class TestProfiler(base.TestCase):
+
+    def setUp(self):
+        super(TestProfiler, self).setUp()
+
+        self.profiler = profiling.Profiler()
+        self.client_manager = FakeClientManager()
+        self.clients = self.profiler.instrument(self.client_manager)
+
+    def test_null_profiler(self):
+        profiler = profiling.NullProfiler()
+
+        with profiler.span('phase'):
+            pass
+
+        self.assertIs(self.client_manager,
+                      profiler.instrument(self.client_manager))
+
+    def test_phases(self):
+        with self.profiler.span('validation'):
+            pass
+        with self.profiler.span('stack_wait'):
+            pass
+
+        summary = self.profiler.summary()
+
+        self.assertEqual(['validation', 'stack_wait'],
+                         list(summary['phases']))
+        self.assertEqual({}, summary['services'])
+
+    @mock.patch('time.time', side_effect=[1000.0, 10.0])
+    def test_wall_clock_change(self, time_mock):
+        # The wall clock is set back while the phase runs.
+        with self.profiler.span('stack_wait'):
+            pass
+
+        self.assertGreaterEqual(
+            self.profiler.summary()['phases']['stack_wait'], 0)
+
+    def test_remote_calls(self):
+        bm_client = self.clients.rdomanager_oscplugin.baremetal()
+        bm_client.node.get('UUID1')
+        bm_client.node.get('UUID2')
+        self.clients.compute.flavors.list()
+
+        self.assertEqual('regionOne', self.clients.region_name)
+        self.client_manager.rdomanager_oscplugin.bm_client.node.get.\
+            assert_called_with('UUID2')
+
+        services = self.profiler.summary()['services']
+
+        self.assertEqual(2, services['ironic']['count'])
+        self.assertEqual(2, services['ironic']['calls']['node.get']['count'])
+        self.assertEqual(1, services['nova']['calls']['flavors.list']['count'])
+        self.assertEqual(1, services['client']['calls']['baremetal']['count'])
+
+    def test_write(self):
+        with self.profiler.span('deploy'):
+            self.clients.compute.flavors.list()
+        path = os.path.join(tempfile.mkdtemp(), 'profile.json')
+
+        self.profiler.write(path)
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEqual(['deploy'], list(data['phases']))
+        self.assertEqual(2, len(data['spans']))
+
+        self.profiler.write(path, 'chrome')
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEqual(['flavors.list', 'deploy'],
+                         [e['name'] for e in data['traceEvents']])
+        self.assertEqual(set(['X']),
+                         set(e['ph'] for e in data['traceEvents']))
+
+    def test_call_accounting(self):
+        bm_client = self.profiler.instrument_client(mock.Mock(), 'ironic')
+        bm_client.node.update('UUID1', [{'op': 'add'}])
+        bm_client.node.update('UUID2', [{'op': 'add'}])
+        bm_client.node.list()
+
+        self.assertEqual(3, self.profiler.call_count())
+        self.assertEqual(3, self.profiler.call_count('ironic'))
+        self.assertEqual(0, self.profiler.call_count('heat'))
+
+        call = self.profiler.summary()['services']['ironic']['calls'][
+            'node.update']
+        self.assertEqual(
+            2 * len(json.dumps([['UUID1', [{'op': 'add'}]], {}])),
+            call['request_bytes'])
+        self.assertEqual({'<=0.01s': 2}, call['latency_histogram'])
+
+        stream = six.StringIO()
+        self.profiler.print_summary(stream)
+        self.assertEqual(['ironic: 3 calls', '  node.list: 1 calls',
+                          '  node.update: 2 calls'],
+                         [line.split(',')[0]
+                          for line in stream.getvalue().splitlines()])
@@ -0,0 +1,83 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import mock
+
+from rdomanager_oscplugin import retry
+from rdomanager_oscplugin.tests import base
+
+
+class Busy(Exception):
+    pass
+
+
+class TestRetryPolicy(base.TestCase):
+
+    def setUp(self):
+        super(TestRetryPolicy, self).setUp()
+
+        self.policy = retry.RetryPolicy(
+            lambda e: isinstance(e, Busy), retries=3, base_delay=1,
+            max_delay=4)
+        sleep = mock.patch('time.sleep')
+        self.mock_sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def test_retried(self):
+        func = mock.Mock(side_effect=[Busy(), Busy(), 'result'])
+
+        self.assertEqual('result', self.policy.call(func, 'a', b='c'))
+
+        self.assertEqual([mock.call('a', b='c')] * 3, func.mock_calls)
+        self.assertEqual(2, self.mock_sleep.call_count)
+
+    def test_other_errors_not_retried(self):
+        func = mock.Mock(side_effect=ValueError())
+
+        self.assertRaises(ValueError, self.policy.call, func)
+        self.assertEqual(1, func.call_count)
+
+    def test_retries_exhausted(self):
+        func = mock.Mock(side_effect=Busy())
+
+        self.assertRaises(Busy, self.policy.call, func)
+        self.assertEqual(4, func.call_count)
+
+    def test_delay(self):
+        for attempt in range(10):
+            delay = self.policy.delay(attempt)
+            self.assertTrue(0 <= delay <= min(4, 2 ** attempt))
+
+    def test_budget(self):
+        budget = self.policy.budget(5)
+        self.assertEqual(5, budget.remaining)
+
+        func = mock.Mock(side_effect=Busy())
+        self.assertRaises(Busy, self.policy.call_with_budget, budget, None,
+                          func)
+        self.assertRaises(Busy, self.policy.call_with_budget, budget, None,
+                          func)
+
+        # 3 retries for the first call and the last 2 for the second.
+        self.assertEqual(7, func.call_count)
+        self.assertEqual(0, budget.remaining)
+
+    def test_already_applied(self):
+        func = mock.Mock(side_effect=Busy())
+        is_done = mock.Mock(side_effect=[False, True])
+
+        self.assertIsNone(self.policy.call_with_budget(
+            self.policy.budget(), is_done, func))
+        self.assertEqual(2, func.call_count)
@@ -0,0 +1,102 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import os
+import stat
+
+import fixtures
+import mock
+from six.moves import configparser
+
+from rdomanager_oscplugin import secret_store
+from rdomanager_oscplugin.tests import base
+
+
+class TestSecretStore(base.TestCase):
+
+    def setUp(self):
+        super(TestSecretStore, self).setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.path = os.path.join(self.tmp_dir, 'passwords')
+        self.addCleanup(secret_store.clear_cache)
+
+    def test_write_atomic(self):
+        secret_store.write_atomic(self.path, 'data')
+
+        with open(self.path) as f:
+            self.assertEqual('data', f.read())
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.path).st_mode))
+        self.assertEqual(['passwords'], os.listdir(self.tmp_dir))
+
+    def test_file_lock_removed(self):
+        with secret_store.file_lock(self.path):
+            self.assertEqual(['passwords.lock'], os.listdir(self.tmp_dir))
+            secret_store.write_atomic(self.path, 'data')
+
+        self.assertEqual(['passwords'], os.listdir(self.tmp_dir))
+
+    def test_values_with_equal_sign(self):
+        with open(self.path, 'w') as f:
+            f.write('A=abc=\nB=x=y=z\n\n')
+
+        store = secret_store.PasswordsFile(self.path)
+
+        self.assertEqual({'A': 'abc=', 'B': 'x=y=z'}, store.values())
+        self.assertEqual('x=y=z', store.get('B'))
+
+    def test_ensure_generates_missing(self):
+        with open(self.path, 'w') as f:
+            f.write('A=old\n')
+        generate = mock.Mock(side_effect=['new-b', 'new-c'])
+
+        store = secret_store.PasswordsFile(self.path)
+        values = store.ensure(['A', 'B', 'C'], generate)
+
+        self.assertEqual({'A': 'old', 'B': 'new-b', 'C': 'new-c'}, values)
+        with open(self.path) as f:
+            self.assertEqual('A=old\nB=new-b\nC=new-c\n', f.read())
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.path).st_mode))
+
+    def test_ensure_reads_once(self):
+        generate = mock.Mock(return_value='password')
+        store = secret_store.PasswordsFile(self.path)
+        store.ensure(['A'], generate)
+
+        with mock.patch('six.moves.builtins.open') as mock_open:
+            self.assertEqual({'A': 'password'}, store.ensure(['A'], generate))
+            self.assertEqual('password', store.get('A'))
+
+        self.assertFalse(mock_open.called)
+        self.assertEqual(1, generate.call_count)
+
+    def test_shared_stores(self):
+        self.assertIs(secret_store.overcloud_passwords(self.path),
+                      secret_store.overcloud_passwords(self.path))
+
+        secret_store.clear_cache()
+
+        store = secret_store.overcloud_passwords(self.path)
+        self.assertIsNot(store, secret_store.undercloud_passwords(self.path))
+
+    def test_config_file(self):
+        with open(self.path, 'w') as f:
+            f.write('[auth]\nadmin_password = pa=ss\n')
+
+        store = secret_store.undercloud_passwords(self.path)
+        self.assertEqual('pa=ss', store.get('auth', 'admin_password'))
+
+        os.unlink(self.path)
+        self.assertEqual('pa=ss', store.get('auth', 'admin_password'))
+        self.assertRaises(configparser.Error, store.get, 'auth', 'missing')
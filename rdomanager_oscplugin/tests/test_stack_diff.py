@@ -0,0 +1,131 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import copy
+
+import mock
+
+from rdomanager_oscplugin import stack_diff
+from rdomanager_oscplugin.tests import base
+
+
+class TestStackDiff(base.TestCase):
+
+    def setUp(self):
+        super(TestStackDiff, self).setUp()
+
+        self.stack_args = {
+            'stack_name': 'overcloud',
+            'template': {'resources': {}},
+            'parameters': {
+                'ControllerCount': 1,
+                'NovaPassword': 'secret',
+                'NeutronL3HA': False,
+            },
+            'environment': {'parameters': {}},
+            'files': {'file:///tht/a.yaml': 'a'},
+        }
+        self.stack = mock.Mock(
+            id='STACK_ID', stack_status='UPDATE_COMPLETE',
+            updated_time='2015-06-01T10:00:00Z',
+            parameters={
+                'ControllerCount': '1',
+                'NovaPassword': '******',
+                'NeutronL3HA': 'false',
+                'OS::stack_id': 'STACK_ID',
+            })
+        self.last = stack_diff.fingerprint('STACK_ID', self.stack_args,
+                                           '2015-06-01T10:00:00Z')
+
+    def test_fingerprint_has_no_secrets(self):
+        self.assertNotIn('secret', str(self.last))
+
+    def test_no_changes(self):
+        self.assertEqual(
+            [], stack_diff.changes(self.stack, self.last, self.stack_args))
+
+    def test_changes(self):
+        stack_args = copy.deepcopy(self.stack_args)
+        stack_args['parameters']['NovaPassword'] = 'new secret'
+        stack_args['parameters']['NtpServer'] = 'pool.ntp.org'
+        stack_args['files']['file:///tht/b.yaml'] = 'b'
+        del stack_args['files']['file:///tht/a.yaml']
+        stack_args['template'] = {'resources': {'Foo': {}}}
+
+        self.assertEqual([
+            'parameter NovaPassword changed',
+            'parameter NtpServer added',
+            'template changed',
+            'file file:///tht/a.yaml removed',
+            'file file:///tht/b.yaml added',
+        ], stack_diff.changes(self.stack, self.last, stack_args))
+
+    def test_bytes_file_changes(self):
+        self.stack_args['files']['file:///tht/script.sh'] = b'echo hello'
+        last = stack_diff.fingerprint('STACK_ID', self.stack_args,
+                                      '2015-06-01T10:00:00Z')
+        stack_args = copy.deepcopy(self.stack_args)
+        stack_args['files']['file:///tht/script.sh'] = b'echo bye'
+
+        self.assertEqual(
+            ['file file:///tht/script.sh changed'],
+            stack_diff.changes(self.stack, last, stack_args))
+
+    def test_omitted_parameter_is_not_a_change(self):
+        stack_args = copy.deepcopy(self.stack_args)
+        del stack_args['parameters']['NovaPassword']
+
+        self.assertEqual(
+            [], stack_diff.changes(self.stack, self.last, stack_args))
+
+    def test_changed_on_live_stack(self):
+        self.stack.parameters['ControllerCount'] = '3'
+
+        self.assertEqual(
+            ['parameter ControllerCount differs from the deployed stack'],
+            stack_diff.changes(self.stack, self.last, self.stack_args))
+
+    def test_no_fingerprint(self):
+        self.assertEqual(
+            ['no record of the last deploy of this stack'],
+            stack_diff.changes(self.stack, None, self.stack_args))
+
+    def test_fingerprint_of_other_stack(self):
+        last = stack_diff.fingerprint('OTHER_ID', self.stack_args)
+
+        self.assertEqual(
+            ['no record of the last deploy of this stack'],
+            stack_diff.changes(self.stack, last, self.stack_args))
+
+    def test_updated_out_of_band(self):
+        self.stack.updated_time = '2015-06-02T10:00:00Z'
+
+        self.assertEqual(
+            ['stack was updated since the last deploy'],
+            stack_diff.changes(self.stack, self.last, self.stack_args))
+
+    def test_failed_stack(self):
+        self.stack.stack_status = 'UPDATE_FAILED'
+
+        self.assertEqual(
+            ['stack status is UPDATE_FAILED'],
+            stack_diff.changes(self.stack, self.last, self.stack_args))
+
+    def test_store(self):
+        store = stack_diff.FingerprintStore()
+
+        self.assertIsNone(store.load('overcloud'))
+        store.save('overcloud', self.last)
+        self.assertEqual(self.last, store.load('overcloud'))
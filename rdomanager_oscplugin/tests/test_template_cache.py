@@ -0,0 +1,173 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import os
+import stat
+import tempfile
+
+import fixtures
+
+from rdomanager_oscplugin import template_cache
+from rdomanager_oscplugin.tests import base
+
+
+class TestBundleCache(base.TestCase):
+
+    def setUp(self):
+        super(TestBundleCache, self).setUp()
+
+        self.tht_dir = tempfile.mkdtemp()
+        # The test files are all in the temporary directory, the bundles
+        # built from files in this one aren't cached.
+        self.temp_dir = tempfile.mkdtemp()
+        self.useFixture(fixtures.MonkeyPatch(
+            'tempfile.gettempdir', lambda: self.temp_dir))
+        self.template_path = self._write('overcloud.yaml', 'resources: {}\n')
+        self.env_path = self._write('env.yaml', 'parameters: {}\n')
+        self.nested_path = self._write('nested.yaml', 'outputs: {}\n')
+
+        self.template = {'resources': {'Foo': {
+            'type': 'file://' + self.nested_path}}}
+        self.environment = {'parameters': {}}
+        self.files = {'file://' + self.nested_path: '{"outputs": {}}'}
+
+        self.cache = template_cache.BundleCache(
+            cache_dir=os.path.join(self.tht_dir, 'cache'))
+
+    def _write(self, name, content, directory=None):
+        path = os.path.join(directory or self.tht_dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def _store(self):
+        return self.cache.store(self.template_path, [self.env_path],
+                                self.template, self.environment, self.files)
+
+    def test_local_sources(self):
+        self.assertEqual(
+            sorted([self.template_path, self.env_path, self.nested_path]),
+            template_cache.local_sources(
+                self.template_path, [self.env_path],
+                dict(self.files, **{'http://example.com/a.yaml': ''})))
+
+    def test_load_empty(self):
+        self.assertIsNone(
+            self.cache.load(self.template_path, [self.env_path]))
+
+    def test_store_and_load(self):
+        self.assertTrue(self._store())
+
+        self.assertEqual(
+            (self.template, self.environment, self.files),
+            tuple(self.cache.load(self.template_path, [self.env_path])))
+
+    def test_store_and_load_bytes(self):
+        script_path = self._write('script.sh', 'echo hello\n')
+        self.files['file://' + script_path] = b'echo hello\n'
+
+        self.assertTrue(self._store())
+
+        template, environment, files = self.cache.load(self.template_path,
+                                                       [self.env_path])
+        self.assertEqual(self.files, files)
+        self.assertIsInstance(files['file://' + script_path], bytes)
+
+    def test_store_entry_mode(self):
+        self._store()
+
+        entries = os.listdir(self.cache.cache_dir)
+        self.assertEqual(1, len(entries))
+        entry_path = os.path.join(self.cache.cache_dir, entries[0])
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(entry_path).st_mode))
+
+    def test_load_copied_environment(self):
+        self._store()
+
+        env_path = self._write('env-copy.yaml', 'parameters: {}\n')
+
+        self.assertIsNotNone(
+            self.cache.load(self.template_path, [env_path]))
+
+    def test_load_different_environments(self):
+        self._store()
+
+        self.assertIsNone(self.cache.load(self.template_path, []))
+
+    def test_load_nested_file_changed(self):
+        self._store()
+
+        self._write('nested.yaml', 'outputs: {foo: bar}\n')
+
+        self.assertIsNone(
+            self.cache.load(self.template_path, [self.env_path]))
+
+    def test_load_environment_rewritten_unchanged(self):
+        self._store()
+
+        self._write('env.yaml', 'parameters: {}\n')
+        os.utime(self.env_path, (0, 0))
+
+        self.assertIsNotNone(
+            self.cache.load(self.template_path, [self.env_path]))
+
+    def test_load_source_removed(self):
+        self._store()
+
+        os.unlink(self.nested_path)
+
+        self.assertIsNone(
+            self.cache.load(self.template_path, [self.env_path]))
+
+    def test_store_missing_source(self):
+        self.assertFalse(self.cache.store(
+            '/does/not/exist.yaml', [self.env_path], self.template,
+            self.environment, self.files))
+        self.assertIsNone(
+            self.cache.load('/does/not/exist.yaml', [self.env_path]))
+
+    def test_store_temporary_environment(self):
+        env_path = self._write('env.yaml', 'parameters: {}\n',
+                               directory=self.temp_dir)
+
+        self.assertFalse(self.cache.store(
+            self.template_path, [env_path], self.template, self.environment,
+            self.files))
+        self.assertFalse(os.path.exists(self.cache.cache_dir))
+
+    def test_store_credentials(self):
+        self.environment = {'parameter_defaults': {
+            'rhel_reg_activation_key': 'secret'}}
+
+        self.assertFalse(self._store())
+        self.assertFalse(os.path.exists(self.cache.cache_dir))
+
+    def test_store_evicts_least_recently_used(self):
+        self.cache.max_entries = 2
+        envs = [self._write('env%d.yaml' % i, 'parameters: {%d: 0}\n' % i)
+                for i in range(3)]
+
+        for i, env in enumerate(envs[:2]):
+            self.cache.store(self.template_path, [env], self.template,
+                             self.environment, self.files)
+            os.utime(self.cache._entry_path(self.template_path, [env]),
+                     (i, i))
+        self.assertIsNotNone(self.cache.load(self.template_path, [envs[0]]))
+        self.cache.store(self.template_path, [envs[2]], self.template,
+                         self.environment, self.files)
+
+        self.assertEqual(2, len(os.listdir(self.cache.cache_dir)))
+        self.assertIsNotNone(self.cache.load(self.template_path, [envs[0]]))
+        self.assertIsNone(self.cache.load(self.template_path, [envs[1]]))
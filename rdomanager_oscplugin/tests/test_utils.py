@@ -14,7 +14,16 @@
 #
 
 import mock
+import multiprocessing.pool
 import os.path
+import shutil
+import stat
+import tempfile
+import threading
+
+import requests
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
 
 from rdomanager_oscplugin import exceptions
 from rdomanager_oscplugin import utils
@@ -23,66 +32,64 @@ from unittest import TestCase
 
 class TestPasswordsUtil(TestCase):
 
-    @mock.patch("os.path.isfile", return_value=False)
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'tripleo-overcloud-passwords')
+
     @mock.patch("rdomanager_oscplugin.utils._generate_password",
                 return_value="PASSWORD")
-    def test_generate_passwords(self, generate_password_mock, isfile_mock):
-
-        mock_open = mock.mock_open()
-
-        with mock.patch('six.moves.builtins.open', mock_open):
-            passwords = utils.generate_overcloud_passwords()
-
-        self.assertEqual(sorted(mock_open().write.mock_calls), [
-            mock.call('OVERCLOUD_ADMIN_PASSWORD=PASSWORD\n'),
-            mock.call('OVERCLOUD_ADMIN_TOKEN=PASSWORD\n'),
-            mock.call('OVERCLOUD_CEILOMETER_PASSWORD=PASSWORD\n'),
-            mock.call('OVERCLOUD_CEILOMETER_SECRET=PASSWORD\n'),
-            mock.call('OVERCLOUD_CINDER_PASSWORD=PASSWORD\n'),
-            mock.call('OVERCLOUD_DEMO_PASSWORD=PASSWORD\n'),
-            mock.call('OVERCLOUD_GLANCE_PASSWORD=PASSWORD\n'),
-            mock.call('OVERCLOUD_HEAT_PASSWORD=PASSWORD\n'),
-            mock.call('OVERCLOUD_HEAT_STACK_DOMAIN_PASSWORD=PASSWORD\n'),
-            mock.call('OVERCLOUD_NEUTRON_PASSWORD=PASSWORD\n'),
-            mock.call('OVERCLOUD_NOVA_PASSWORD=PASSWORD\n'),
-            mock.call('OVERCLOUD_SWIFT_HASH=PASSWORD\n'),
-            mock.call('OVERCLOUD_SWIFT_PASSWORD=PASSWORD\n'),
-        ])
+    def test_generate_passwords(self, generate_password_mock):
+
+        passwords = utils.generate_overcloud_passwords(self.path)
+
+        with open(self.path) as f:
+            self.assertEqual(f.read().splitlines(), [
+                'OVERCLOUD_ADMIN_PASSWORD=PASSWORD',
+                'OVERCLOUD_ADMIN_TOKEN=PASSWORD',
+                'OVERCLOUD_CEILOMETER_PASSWORD=PASSWORD',
+                'OVERCLOUD_CEILOMETER_SECRET=PASSWORD',
+                'OVERCLOUD_CINDER_PASSWORD=PASSWORD',
+                'OVERCLOUD_DEMO_PASSWORD=PASSWORD',
+                'OVERCLOUD_GLANCE_PASSWORD=PASSWORD',
+                'OVERCLOUD_HEAT_PASSWORD=PASSWORD',
+                'OVERCLOUD_HEAT_STACK_DOMAIN_PASSWORD=PASSWORD',
+                'OVERCLOUD_NEUTRON_PASSWORD=PASSWORD',
+                'OVERCLOUD_NOVA_PASSWORD=PASSWORD',
+                'OVERCLOUD_SWIFT_HASH=PASSWORD',
+                'OVERCLOUD_SWIFT_PASSWORD=PASSWORD',
+            ])
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
         self.assertEqual(generate_password_mock.call_count, 13)
 
         self.assertEqual(len(passwords), 13)
 
-    @mock.patch("os.path.isfile", return_value=True)
     @mock.patch("rdomanager_oscplugin.utils._generate_password",
                 return_value="PASSWORD")
-    def test_load_passwords(self, generate_password_mock, isfile_mock):
-        PASSWORDS = [
-            'OVERCLOUD_ADMIN_PASSWORD=PASSWORD\n',
-            'OVERCLOUD_ADMIN_TOKEN=PASSWORD\n',
-            'OVERCLOUD_CEILOMETER_PASSWORD=PASSWORD\n',
-            'OVERCLOUD_CEILOMETER_SECRET=PASSWORD\n',
-            'OVERCLOUD_CINDER_PASSWORD=PASSWORD\n',
-            'OVERCLOUD_DEMO_PASSWORD=PASSWORD\n',
-            'OVERCLOUD_GLANCE_PASSWORD=PASSWORD\n',
-            'OVERCLOUD_HEAT_PASSWORD=PASSWORD\n',
-            'OVERCLOUD_HEAT_STACK_DOMAIN_PASSWORD=PASSWORD\n',
-            'OVERCLOUD_NEUTRON_PASSWORD=PASSWORD\n',
-            'OVERCLOUD_NOVA_PASSWORD=PASSWORD\n',
-            'OVERCLOUD_SWIFT_HASH=PASSWORD\n',
-            'OVERCLOUD_SWIFT_PASSWORD=PASSWORD\n',
-        ]
+    def test_load_passwords(self, generate_password_mock):
+        with open(self.path, 'w') as f:
+            for name in utils.OVERCLOUD_PASSWORD_NAMES:
+                f.write('{0}=pa=ss\n'.format(name))
 
-        mock_open = mock.mock_open(read_data=''.join(PASSWORDS))
-        mock_open.return_value.__iter__ = lambda self: self
-        mock_open.return_value.__next__ = lambda self: self.readline()
+        passwords = utils.generate_overcloud_passwords(self.path)
 
-        with mock.patch('six.moves.builtins.open', mock_open):
-            passwords = utils.generate_overcloud_passwords()
-
-        mock_open().write.assert_not_called()
         generate_password_mock.assert_not_called()
 
         self.assertEqual(len(passwords), 13)
+        self.assertEqual(passwords['OVERCLOUD_ADMIN_PASSWORD'], 'pa=ss')
+
+    @mock.patch("rdomanager_oscplugin.utils._generate_password",
+                return_value="PASSWORD")
+    def test_generate_missing_passwords(self, generate_password_mock):
+        with open(self.path, 'w') as f:
+            f.write('OVERCLOUD_ADMIN_PASSWORD=admin\n')
+
+        passwords = utils.generate_overcloud_passwords(self.path)
+
+        self.assertEqual(generate_password_mock.call_count, 12)
+        self.assertEqual(len(passwords), 13)
+        self.assertEqual(passwords['OVERCLOUD_ADMIN_PASSWORD'], 'admin')
+        self.assertEqual(passwords['OVERCLOUD_NOVA_PASSWORD'], 'PASSWORD')
 
 
 class TestCheckHypervisorUtil(TestCase):
@@ -264,25 +271,68 @@ class TestWaitForDiscovery(TestCase):
 
         self.assertEqual(uuids, ['IJKLMNOP', ])
 
+    @mock.patch('rdomanager_oscplugin.utils.wait_for_provision_state')
+    def test_set_nodes_state_error(self, wait_for_state_mock):
+
+        wait_for_state_mock.return_value = True
+        bm_client = mock.Mock()
+
+        def set_provision_state(uuid, transition):
+            if uuid == 'IJKLMNOP':
+                raise ValueError('Node in maintenance')
+
+        bm_client.node.set_provision_state.side_effect = set_provision_state
+        nodes = [
+            mock.Mock(uuid="ABCDEFGH", provision_state="manageable"),
+            mock.Mock(uuid="IJKLMNOP", provision_state="manageable")
+        ]
+
+        uuids = []
+        self.assertRaises(
+            exceptions.BulkOperationError, uuids.extend,
+            utils.set_nodes_state(bm_client, nodes, 'provide', 'available'))
+
+        # The node whose transition started is still waited for.
+        self.assertEqual(['ABCDEFGH'], uuids)
+        wait_for_state_mock.assert_called_once_with(bm_client, 'ABCDEFGH',
+                                                    'available')
+
     @mock.patch("subprocess.Popen")
-    def test_get_hiera_key(self, mock_popen):
+    @mock.patch("rdomanager_oscplugin.hiera.default_reader")
+    def test_get_hiera_key(self, mock_reader, mock_popen):
 
+        mock_reader().get.side_effect = KeyError('password_name')
         process_mock = mock.Mock()
-        process_mock.communicate.return_value = ["pa$$word", ""]
+        process_mock.communicate.return_value = [b"pa$$word\n", b""]
         mock_popen.return_value = process_mock
 
         value = utils.get_hiera_key('password_name')
 
         self.assertEqual(value, "pa$$word")
+        mock_popen.assert_called_once_with(['hiera', 'password_name'],
+                                           stdout=mock.ANY)
 
-    @mock.patch("six.moves.configparser")
-    def test_get_config_value(self, mock_config_parser):
+    @mock.patch("subprocess.Popen")
+    @mock.patch("rdomanager_oscplugin.hiera.default_reader")
+    def test_get_hiera_key_from_hieradata(self, mock_reader, mock_popen):
+
+        mock_reader().get.return_value = "pa$$word"
 
-        mock_config_parser.ConfigParser().get.return_value = "pa$$word"
+        value = utils.get_hiera_key('password_name')
+
+        self.assertEqual(value, "pa$$word")
+        self.assertFalse(mock_popen.called)
+
+    @mock.patch("rdomanager_oscplugin.secret_store.undercloud_passwords")
+    def test_get_config_value(self, mock_undercloud_passwords):
+
+        mock_undercloud_passwords().get.return_value = "pa$$word"
 
         value = utils.get_config_value('section', 'password_name')
 
         self.assertEqual(value, "pa$$word")
+        mock_undercloud_passwords().get.assert_called_once_with(
+            'section', 'password_name')
 
     def test_wait_for_provision_state(self):
 
@@ -320,27 +370,13 @@ class TestWaitForDiscovery(TestCase):
 
         self.assertEqual(result, False)
 
-    @mock.patch('subprocess.check_call')
-    @mock.patch('os.path.exists')
-    def test_remove_known_hosts(self, mock_exists, mock_check_call):
-
-        mock_exists.return_value = True
-
-        utils.remove_known_hosts('192.168.0.1')
-        known_hosts = os.path.expanduser("~/.ssh/known_hosts")
+    @mock.patch('rdomanager_oscplugin.known_hosts.remove_hosts')
+    def test_remove_known_hosts(self, mock_remove_hosts):
 
-        mock_check_call.assert_called_with(
-            ['ssh-keygen', '-R', '192.168.0.1', '-f', known_hosts])
+        utils.remove_known_hosts('192.168.0.1', '192.168.0.2')
 
-    @mock.patch('subprocess.check_call')
-    @mock.patch('os.path.exists')
-    def test_remove_known_hosts_no_file(self, mock_exists, mock_check_call):
-
-        mock_exists.return_value = False
-
-        utils.remove_known_hosts('192.168.0.1')
-
-        mock_check_call.assert_not_called()
+        mock_remove_hosts.assert_called_once_with(
+            ('192.168.0.1', '192.168.0.2'))
 
     def test_file_checksum(self):
         mock_open = mock.mock_open()
@@ -385,3 +421,132 @@ class TestCheckNodesCount(TestCase):
         self.assertRaises(exceptions.DeploymentError, utils.check_nodes_count,
                           self.baremetal, self.stack, user_params,
                           self.defaults)
+
+
+class TestFilterNodes(TestCase):
+
+    def _node(self, uuid, name, driver='pxe_ipmitool', capabilities='',
+              resource_class=None, provision_state='available'):
+        node = mock.Mock(uuid=uuid, driver=driver,
+                         properties={'capabilities': capabilities},
+                         resource_class=resource_class,
+                         provision_state=provision_state)
+        # NOTE: name is an argument of the Mock constructor itself.
+        node.name = name
+        return node
+
+    def setUp(self):
+        self.nodes = [
+            self._node('UUID0', 'rack1-node0',
+                       capabilities='profile:control,boot_option:local'),
+            self._node('UUID1', 'rack1-node1', driver='pxe_drac',
+                       capabilities='profile:compute'),
+            self._node('UUID2', 'rack2-node0', resource_class='large',
+                       provision_state='manageable'),
+            self._node('UUID3', None),
+        ]
+
+    def _uuids(self, **kwargs):
+        return [node.uuid for node in utils.filter_nodes(self.nodes,
+                                                         **kwargs)]
+
+    def test_no_criteria(self):
+        self.assertEqual(['UUID0', 'UUID1', 'UUID2', 'UUID3'], self._uuids())
+
+    def test_names(self):
+        self.assertEqual(['UUID0', 'UUID1'], self._uuids(names=['rack1-*']))
+        self.assertEqual(['UUID0', 'UUID2'],
+                         self._uuids(names=['*-node0', 'missing']))
+
+    def test_criteria(self):
+        self.assertEqual(['UUID1'], self._uuids(drivers=['pxe_drac']))
+        self.assertEqual(['UUID0'], self._uuids(profiles=['control']))
+        self.assertEqual(['UUID2'], self._uuids(resource_classes=['large']))
+        self.assertEqual(['UUID2'],
+                         self._uuids(provision_states=['manageable']))
+        self.assertEqual(['UUID1', 'UUID3'], self._uuids(
+            introspected=lambda uuid: uuid in ('UUID0', 'UUID2')))
+
+    def test_all_criteria_apply(self):
+        self.assertEqual([], self._uuids(names=['rack1-*'],
+                                         profiles=['control'],
+                                         drivers=['pxe_drac']))
+
+
+class TestConnectionPool(TestCase):
+
+    def setUp(self):
+        self.connections = []
+        connections = self.connections
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                connections.append(self.client_address)
+                BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0),
+                                                      Handler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+
+    def test_concurrent_calls_reuse_connections(self):
+        session = mock.Mock(session=requests.Session())
+        utils.configure_connection_pool(session, pool_size=4)
+
+        pool = multiprocessing.pool.ThreadPool(4)
+        self.addCleanup(pool.terminate)
+        for _ in range(5):
+            pool.map(lambda _: session.session.get(self.url), range(4))
+
+        self.assertLessEqual(len(self.connections), 4)
+
+    def test_adapter_class_kept(self):
+        from keystoneclient import session as ks_session
+
+        session = ks_session.Session()
+        utils.configure_connection_pool(session, pool_size=4)
+
+        for prefix in ('https://', 'http://'):
+            adapter = session.session.get_adapter(prefix)
+            self.assertIsInstance(adapter, ks_session.TCPKeepAliveAdapter)
+            self.assertEqual(4, adapter._pool_maxsize)
+
+
+class TestConcurrentMap(TestCase):
+
+    def test_concurrent_map(self):
+        threads = set()
+
+        def square(item):
+            threads.add(threading.current_thread().ident)
+            return item * item
+
+        self.assertEqual([0, 1, 4, 9], utils.concurrent_map(square, range(4),
+                                                            workers=2))
+        self.assertNotIn(threading.current_thread().ident, threads)
+
+    def test_single_worker(self):
+        threads = set()
+
+        def record(item):
+            threads.add(threading.current_thread().ident)
+
+        utils.concurrent_map(record, range(3), workers=1)
+
+        self.assertEqual(set([threading.current_thread().ident]), threads)
@@ -0,0 +1,294 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import json
+import os
+from xml.etree import ElementTree
+
+import mock
+import six
+import yaml
+
+from rdomanager_oscplugin import validation
+from rdomanager_oscplugin.tests import base
+
+
+NIC_CONFIG = {
+    'resources': {
+        'OsNetConfigImpl': {
+            'properties': {
+                'config': {
+                    'os_net_config': {
+                        'network_config': [{
+                            'type': 'ovs_bridge',
+                            'name': 'br-ex',
+                            'members': [
+                                {'type': 'interface', 'name': 'nic1'},
+                                {'type': 'interface', 'name': 'nic2'},
+                            ],
+                        }],
+                    },
+                },
+            },
+        },
+    },
+}
+
+NETENV = {
+    'resource_registry': {
+        'OS::TripleO::Controller::Net::SoftwareConfig': 'nic/controller.yaml',
+        'OS::TripleO::Compute::Net::SoftwareConfig': 'nic/controller.yaml',
+    },
+    'parameter_defaults': {
+        'InternalApiNetCidr': '172.17.0.0/24',
+        'StorageNetCidr': '172.17.0.0/16',
+        'InternalApiAllocationPools': [
+            {'start': '172.17.0.10', 'end': '172.17.1.200'}],
+        'InternalApiNetworkVlanID': 201,
+        'StorageNetworkVlanID': 201,
+    },
+}
+
+
+class TestValidation(base.TestCase):
+
+    def setUp(self):
+        super(TestValidation, self).setUp()
+        self.home = os.path.expanduser('~')
+
+    def _write_yaml(self, name, data):
+        path = os.path.join(self.home, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            yaml.safe_dump(data, f)
+        return path
+
+    def test_validate_netenv(self):
+        self._write_yaml('nic/controller.yaml', NIC_CONFIG)
+        path = self._write_yaml('network-environment.yaml', NETENV)
+
+        findings = list(validation.validate_netenv(path))
+
+        self.assertEqual([
+            'netenv.nic.interfaces',
+            'netenv.nic.interfaces',
+            'netenv.cidr.overlap',
+            'netenv.pool.outside-subnet',
+            'netenv.vlan.duplicate',
+        ], [finding.rule for finding in findings])
+        self.assertEqual(set([validation.ERROR]),
+                         set(finding.severity for finding in findings))
+
+        nic = findings[0]
+        self.assertEqual(os.path.join(self.home, 'nic/controller.yaml'),
+                         nic.file)
+        self.assertEqual('$.resources.OsNetConfigImpl.properties.config.'
+                         'os_net_config.network_config[0]', nic.path)
+
+        self.assertEqual(path, findings[2].file)
+        self.assertEqual('$.parameter_defaults.StorageNetCidr',
+                         findings[2].path)
+        self.assertEqual('$.parameter_defaults.InternalApiAllocationPools',
+                         findings[3].path)
+        self.assertEqual('$.parameter_defaults.StorageNetworkVlanID',
+                         findings[4].path)
+
+    @mock.patch('rdomanager_oscplugin.utils.run_shell')
+    def test_validate_instackenv(self, run_shell_mock):
+        run_shell_mock.return_value = 1
+        path = os.path.join(self.home, 'instackenv.json')
+        with open(path, 'w') as f:
+            json.dump({'nodes': [
+                {'pm_type': 'pxe_ipmitool', 'pm_addr': '10.0.0.1',
+                 'pm_user': 'admin', 'pm_password': '', 'mac': ['aa']},
+                {'pm_type': 'pxe_ssh', 'pm_addr': '10.0.0.2',
+                 'pm_password': 'key', 'mac': ['aa']},
+            ]}, f)
+
+        findings = list(validation.validate_instackenv(path))
+
+        self.assertEqual([
+            ('instackenv.pm_password.empty', '$.nodes[0].pm_password'),
+            ('instackenv.ipmi.failed', '$.nodes[0]'),
+            ('instackenv.pm_user.missing', '$.nodes[1].pm_user'),
+            ('instackenv.mac.duplicate', '$.nodes'),
+        ], [(finding.rule, finding.path) for finding in findings])
+
+        self.assertEqual(
+            3, len(list(validation.validate_instackenv(path,
+                                                       check_ipmi=False))))
+
+    def test_validate_files(self):
+        self._write_yaml('nic/controller.yaml', {'resources': {}})
+        valid = self._write_yaml('valid.yaml', {
+            'resource_registry': {
+                'OS::TripleO::Controller::Net::SoftwareConfig':
+                    'nic/controller.yaml'},
+            'parameter_defaults': {'InternalApiNetCidr': '172.17.0.0/24'},
+        })
+        missing = os.path.join(self.home, 'missing.yaml')
+
+        results = validation.validate_files([valid, missing],
+                                            validation.validate_netenv)
+
+        self.assertEqual([valid, missing], list(results))
+        self.assertEqual([], results[valid])
+        self.assertEqual(['file.unreadable'],
+                         [finding.rule for finding in results[missing]])
+
+    def test_validate_files_concurrently(self):
+        paths = ['file%d' % i for i in range(20)]
+
+        def validator(path, suffix):
+            yield validation.error('rule', path + suffix, path)
+
+        results = validation.validate_files(paths, validator, workers=8,
+                                            suffix='!')
+
+        self.assertEqual(paths, list(results))
+        for path in paths:
+            self.assertEqual([path + '!'],
+                             [finding.message for finding in results[path]])
+
+    def test_expand_paths(self):
+        for name in ('b.yaml', 'a.yaml', 'c.json'):
+            open(os.path.join(self.home, name), 'w').close()
+
+        self.assertEqual([
+            os.path.join(self.home, 'c.json'),
+            os.path.join(self.home, 'a.yaml'),
+            os.path.join(self.home, 'b.yaml'),
+            'missing-*.yaml',
+        ], validation.expand_paths([
+            os.path.join(self.home, 'c.json'),
+            os.path.join(self.home, '*.yaml'),
+            os.path.join(self.home, 'a.yaml'),
+            'missing-*.yaml',
+        ]))
+
+    def test_write_json(self):
+        results = {'netenv.yaml': [validation.error(
+            'netenv.vlan.duplicate', 'Duplicate', 'netenv.yaml',
+            '$.parameter_defaults.StorageNetworkVlanID')]}
+        stream = six.StringIO()
+
+        validation.write_report(results, 'json', stream)
+
+        self.assertEqual({'netenv.yaml': [{
+            'rule': 'netenv.vlan.duplicate',
+            'severity': 'error',
+            'file': 'netenv.yaml',
+            'path': '$.parameter_defaults.StorageNetworkVlanID',
+            'message': 'Duplicate',
+        }]}, json.loads(stream.getvalue()))
+
+    def test_write_junit(self):
+        results = {
+            'a.yaml': [],
+            'b.yaml': [validation.error('netenv.cidr.invalid', 'Invalid',
+                                        'b.yaml', '$.parameter_defaults.X')],
+        }
+        stream = six.StringIO()
+
+        validation.write_report(results, 'junit', stream)
+
+        suites = ElementTree.fromstring(stream.getvalue())
+        suites = dict((suite.get('name'), suite) for suite in suites)
+        self.assertEqual('0', suites['a.yaml'].get('failures'))
+        self.assertEqual('1', suites['b.yaml'].get('failures'))
+        failure = suites['b.yaml'].find('testcase/failure')
+        self.assertEqual('netenv.cidr.invalid', failure.get('type'))
+        self.assertEqual('Invalid', failure.text)
+
+
+class TestConflictIndex(base.TestCase):
+
+    def setUp(self):
+        super(TestConflictIndex, self).setUp()
+        self.home = os.path.expanduser('~')
+
+    def _netenv(self, name, vlans, pools):
+        parameters = dict(('%sNetworkVlanID' % net, vlan)
+                          for net, vlan in vlans.items())
+        parameters.update(('%sAllocationPools' % net,
+                           [{'start': start, 'end': end}])
+                          for net, (start, end) in pools.items())
+        path = os.path.join(self.home, name)
+        with open(path, 'w') as f:
+            yaml.safe_dump({'resource_registry': {},
+                            'parameter_defaults': parameters}, f)
+        return path
+
+    def _instackenv(self, name, nodes):
+        path = os.path.join(self.home, name)
+        with open(path, 'w') as f:
+            json.dump({'nodes': [{'pm_addr': addr, 'mac': macs}
+                                 for addr, macs in nodes]}, f)
+        return path
+
+    def test_conflicts(self):
+        site1 = self._netenv('site1.yaml',
+                             {'InternalApi': 201, 'Storage': 202},
+                             {'InternalApi': ('10.0.1.10', '10.0.1.100')})
+        site2 = self._netenv('site2.yaml',
+                             {'InternalApi': 301, 'Storage': 202},
+                             {'InternalApi': ('10.0.2.10', '10.0.2.100')})
+        rack1 = self._instackenv('rack1.json', [
+            ('10.0.0.1', ['aa:bb:cc:00:00:01']),
+            ('10.0.0.2', ['aa:bb:cc:00:00:02', 'aa:bb:cc:00:00:02']),
+        ])
+        rack2 = self._instackenv('rack2.json', [
+            ('10.0.2.50', ['AA:BB:CC:00:00:01']),
+            ('bmc.example.com', ['aa:bb:cc:00:00:03']),
+            ('10.0.0.1', []),
+        ])
+
+        findings = validation.find_conflicts([site1, site2], [rack1, rack2])
+
+        self.assertEqual([
+            ('index.vlan.reused', validation.WARNING, site2,
+             '$.parameter_defaults.StorageNetworkVlanID'),
+            ('index.mac.duplicate', validation.ERROR, rack2,
+             '$.nodes[0].mac[0]'),
+            ('index.pm_addr.duplicate', validation.ERROR, rack2,
+             '$.nodes[2].pm_addr'),
+            ('index.bmc.in-pool', validation.ERROR, rack2,
+             '$.nodes[0].pm_addr'),
+        ], [(finding.rule, finding.severity, finding.file, finding.path)
+            for finding in findings])
+        self.assertIn('InternalApiAllocationPools', findings[3].message)
+        self.assertIn(site2, findings[3].message)
+
+    def test_unreadable_skipped(self):
+        site1 = self._netenv('site1.yaml', {'InternalApi': 201}, {})
+
+        self.assertEqual([], validation.find_conflicts(
+            [site1, os.path.join(self.home, 'missing.yaml')],
+            [os.path.join(self.home, 'missing.json')]))
+
+    def test_fleet(self):
+        index = validation.ConflictIndex()
+        for site in range(100):
+            index.add_netenv(self._netenv(
+                'site%d.yaml' % site, {'InternalApi': 1000 + site},
+                {'InternalApi': ('10.%d.0.10' % site, '10.%d.0.200' % site)}))
+            index.add_instackenv(self._instackenv(
+                'rack%d.json' % site,
+                [('192.168.%d.%d' % (site, node),
+                  ['52:54:00:%02x:%02x:00' % (site, node)])
+                 for node in range(50)]))
+
+        self.assertEqual([], list(index.findings()))
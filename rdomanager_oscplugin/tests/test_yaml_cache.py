@@ -0,0 +1,71 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import os
+
+import mock
+import yaml
+
+from rdomanager_oscplugin import yaml_cache
+from rdomanager_oscplugin.tests import base
+
+
+class TestYamlCache(base.TestCase):
+
+    def setUp(self):
+        super(TestYamlCache, self).setUp()
+        self.cache = yaml_cache.YamlCache()
+        self.path = os.path.join(os.path.expanduser('~'), 'nic.yaml')
+        self._write({'resources': {}})
+
+    def _write(self, data, mtime=1000):
+        with open(self.path, 'w') as f:
+            yaml.safe_dump(data, f)
+        os.utime(self.path, (mtime, mtime))
+
+    def test_load_cached(self):
+        with mock.patch('yaml.load', wraps=yaml.load) as load_mock:
+            first = self.cache.load(self.path)
+            second = self.cache.load(self.path)
+
+        self.assertEqual({'resources': {}}, first)
+        self.assertIs(first, second)
+        self.assertEqual(1, load_mock.call_count)
+        self.assertEqual(yaml_cache.safe_loader(),
+                         load_mock.call_args[1]['Loader'])
+
+    def test_load_changed(self):
+        self.cache.load(self.path)
+        self._write({'resources': {'changed': True}}, mtime=2000)
+
+        self.assertEqual({'resources': {'changed': True}},
+                         self.cache.load(self.path))
+
+    def test_load_missing(self):
+        self.assertRaises((IOError, OSError), self.cache.load,
+                          self.path + '.missing')
+
+    def test_preload(self):
+        other = self.path + '.other'
+        with open(other, 'w') as f:
+            f.write('other: true\n')
+
+        with mock.patch('yaml.load', wraps=yaml.load) as load_mock:
+            self.cache.preload([self.path, other, self.path,
+                                self.path + '.missing'])
+            self.assertEqual({'other': True}, self.cache.load(other))
+            self.cache.load(self.path)
+
+        self.assertEqual(2, load_mock.call_count)
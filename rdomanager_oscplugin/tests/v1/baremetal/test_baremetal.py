@@ -15,13 +15,16 @@
 
 import tempfile
 
+import fixtures
 import json
 import mock
 import os
+import requests
 
 from ironic_discoverd import client as discoverd_client
 
 from rdomanager_oscplugin import exceptions
+from rdomanager_oscplugin import introspection_journal
 from rdomanager_oscplugin.tests.v1.baremetal import fakes
 from rdomanager_oscplugin.v1 import baremetal
 
@@ -452,6 +455,9 @@ class TestStartBaremetalIntrospectionBulk(fakes.TestBaremetal):
         # Get the command object to test
         self.cmd = baremetal.StartBaremetalIntrospectionBulk(self.app, None)
 
+        # The journal is kept in the home directory.
+        self.useFixture(fixtures.TempHomeDir())
+
     @mock.patch('ironic_discoverd.client.get_status', autospec=True)
     @mock.patch('ironic_discoverd.client.introspect', autospec=True)
     def test_introspect_bulk_one(self, introspect_mock, get_status_mock,):
@@ -516,6 +522,124 @@ class TestStartBaremetalIntrospectionBulk(fakes.TestBaremetal):
             mock.call('IJKLMNOP', 'provide'),
         ])
 
+    @mock.patch('ironic_discoverd.client.get_status', autospec=True)
+    @mock.patch('ironic_discoverd.client.introspect', autospec=True)
+    def test_introspect_bulk_resume(self, introspect_mock, get_status_mock):
+
+        journal = introspection_journal.IntrospectionJournal()
+        journal.start('ABCDEFGH')
+        journal.finish('ABCDEFGH')
+        journal.start('IJKLMNOP')
+        journal.start('QRSTUVWX')
+        journal.finish('QRSTUVWX', 'Timeout')
+
+        get_status_mock.return_value = {'finished': True, 'error': None}
+
+        client = self.app.client_manager.rdomanager_oscplugin.baremetal()
+        client.node.list.return_value = [
+            mock.Mock(uuid="ABCDEFGH", provision_state="manageable"),
+            mock.Mock(uuid="IJKLMNOP", provision_state="manageable"),
+            mock.Mock(uuid="QRSTUVWX", provision_state="manageable"),
+            mock.Mock(uuid="YZ012345", provision_state="manageable"),
+        ]
+
+        parsed_args = self.check_parser(self.cmd, ['--resume'],
+                                        [('resume', True)])
+        self.cmd.take_action(parsed_args)
+
+        # The finished node is skipped, the one that failed and the new one
+        # are introspected, and the one in flight is only waited for.
+        introspect_mock.assert_has_calls([
+            mock.call('QRSTUVWX', base_url=None, auth_token='TOKEN'),
+            mock.call('YZ012345', base_url=None, auth_token='TOKEN'),
+        ])
+        self.assertEqual(2, introspect_mock.call_count)
+        # The status of the one in flight is checked before waiting for it.
+        self.assertEqual(
+            ['IJKLMNOP', 'IJKLMNOP', 'QRSTUVWX', 'YZ012345'],
+            sorted(call[0][0] for call in get_status_mock.call_args_list))
+
+        journal.load()
+        self.assertEqual([], journal.in_flight())
+        for uuid in ('ABCDEFGH', 'IJKLMNOP', 'QRSTUVWX', 'YZ012345'):
+            self.assertTrue(journal.is_finished(uuid))
+
+    @mock.patch('ironic_discoverd.client.get_status', autospec=True)
+    @mock.patch('ironic_discoverd.client.introspect', autospec=True)
+    def test_introspect_bulk_resume_unknown(self, introspect_mock,
+                                            get_status_mock):
+
+        journal = introspection_journal.IntrospectionJournal()
+        journal.start('ABCDEFGH')
+
+        get_status_mock.side_effect = [
+            requests.HTTPError('Not found'),
+            {'finished': True, 'error': None},
+        ]
+
+        client = self.app.client_manager.rdomanager_oscplugin.baremetal()
+        client.node.list.return_value = [
+            mock.Mock(uuid="ABCDEFGH", provision_state="manageable"),
+        ]
+
+        parsed_args = self.check_parser(self.cmd, ['--resume'],
+                                        [('resume', True)])
+        self.cmd.take_action(parsed_args)
+
+        # Discoverd doesn't know the node in flight, it's introspected again.
+        introspect_mock.assert_called_once_with(
+            'ABCDEFGH', base_url=None, auth_token='TOKEN')
+        journal.load()
+        self.assertTrue(journal.is_finished('ABCDEFGH'))
+
+    @mock.patch('ironic_discoverd.client.introspect', autospec=True)
+    def test_introspect_bulk_failed_not_in_flight(self, introspect_mock):
+
+        introspect_mock.side_effect = requests.HTTPError('Bad request')
+
+        client = self.app.client_manager.rdomanager_oscplugin.baremetal()
+        client.node.list.return_value = [
+            mock.Mock(uuid="ABCDEFGH", provision_state="manageable"),
+        ]
+
+        parsed_args = self.check_parser(self.cmd, [], [])
+        self.assertRaises(requests.HTTPError, self.cmd.take_action,
+                          parsed_args)
+
+        journal = introspection_journal.IntrospectionJournal()
+        self.assertEqual([], journal.in_flight())
+
+    @mock.patch('ironic_discoverd.client.get_status', autospec=True)
+    @mock.patch('ironic_discoverd.client.introspect', autospec=True)
+    def test_introspect_bulk_not_introspected(self, introspect_mock,
+                                              get_status_mock):
+
+        journal = introspection_journal.IntrospectionJournal()
+        journal.start('ABCDEFGH')
+        journal.finish('ABCDEFGH')
+
+        get_status_mock.return_value = {'finished': True, 'error': None}
+
+        client = self.app.client_manager.rdomanager_oscplugin.baremetal()
+        client.node.list.return_value = [
+            mock.Mock(uuid="ABCDEFGH", provision_state="manageable"),
+            mock.Mock(uuid="IJKLMNOP", provision_state="manageable"),
+        ]
+
+        parsed_args = self.check_parser(self.cmd, ['--not-introspected'],
+                                        [('not_introspected', True)])
+        self.cmd.take_action(parsed_args)
+
+        introspect_mock.assert_called_once_with(
+            'IJKLMNOP', base_url=None, auth_token='TOKEN')
+        client.node.set_provision_state.assert_called_once_with(
+            'IJKLMNOP', 'provide')
+
+        # The journal keeps the nodes introspected by earlier runs.
+        journal.load()
+        self.assertTrue(journal.is_finished('ABCDEFGH'))
+        self.assertTrue(journal.is_finished('IJKLMNOP'))
+
 
 class TestStatusBaremetalIntrospectionBulk(fakes.TestBaremetal):
 
@@ -831,10 +955,10 @@ class TestConfigureBaremetalBoot(fakes.TestBaremetal):
             mock.Mock(uuid="IJKLMNOP"),
         ]
 
-        bm_client.node.get.side_effect = [
-            mock.Mock(uuid="ABCDEFGH", properties={}),
-            mock.Mock(uuid="IJKLMNOP", properties={}),
-        ]
+        bm_client.node.get.side_effect = lambda uuid: {
+            "ABCDEFGH": mock.Mock(uuid="ABCDEFGH", properties={}),
+            "IJKLMNOP": mock.Mock(uuid="IJKLMNOP", properties={}),
+        }[uuid]
 
         parsed_args = self.check_parser(self.cmd, [], [])
         self.cmd.take_action(parsed_args)
@@ -842,7 +966,7 @@ class TestConfigureBaremetalBoot(fakes.TestBaremetal):
         self.assertEqual(find_resource_mock.call_count, 2)
 
         self.assertEqual(bm_client.node.update.call_count, 2)
-        self.assertEqual(bm_client.node.update.mock_calls, [
+        bm_client.node.update.assert_has_calls(any_order=True, calls=[
             mock.call('ABCDEFGH', [{
                 'op': 'add', 'value': 'boot_option:local',
                 'path': '/properties/capabilities'
@@ -865,6 +989,55 @@ class TestConfigureBaremetalBoot(fakes.TestBaremetal):
             }])
         ])
 
+    @mock.patch('openstackclient.common.utils.find_resource', autospec=True)
+    def test_configure_boot_selected_nodes(self, find_resource_mock):
+
+        find_resource_mock.return_value = mock.Mock(id="IDIDID")
+        bm_client = self.app.client_manager.rdomanager_oscplugin.baremetal()
+        nodes = {
+            "ABCDEFGH": mock.Mock(uuid="ABCDEFGH", maintenance=False,
+                                  power_state='power off', properties={}),
+            "IJKLMNOP": mock.Mock(uuid="IJKLMNOP", maintenance=True,
+                                  power_state='power off', properties={}),
+        }
+        bm_client.node.get.side_effect = lambda uuid: nodes[uuid]
+
+        parsed_args = self.check_parser(
+            self.cmd, ['--node', 'ABCDEFGH', '--node', 'IJKLMNOP'],
+            [('nodes', ['ABCDEFGH', 'IJKLMNOP'])])
+        self.cmd.take_action(parsed_args)
+
+        # Only the given nodes are fetched, and the one in maintenance is
+        # left alone.
+        self.assertFalse(bm_client.node.list.called)
+        self.assertEqual(1, bm_client.node.update.call_count)
+        self.assertEqual('ABCDEFGH', bm_client.node.update.call_args[0][0])
+
+    @mock.patch('openstackclient.common.utils.find_resource', autospec=True)
+    def test_configure_boot_filtered(self, find_resource_mock):
+
+        find_resource_mock.return_value = mock.Mock(id="IDIDID")
+        bm_client = self.app.client_manager.rdomanager_oscplugin.baremetal()
+        bm_client.node.list.return_value = [
+            mock.Mock(uuid="ABCDEFGH", driver="pxe_ipmitool",
+                      provision_state="available", power_state='power off',
+                      properties={'capabilities': 'profile:compute'}),
+            mock.Mock(uuid="IJKLMNOP", driver="pxe_ipmitool",
+                      provision_state="available", power_state='power off',
+                      properties={'capabilities': 'profile:control'}),
+        ]
+        bm_client.node.get.side_effect = lambda uuid: mock.Mock(
+            uuid=uuid, properties={})
+
+        parsed_args = self.check_parser(self.cmd, ['--profile', 'compute'],
+                                        [('profiles', ['compute'])])
+        self.cmd.take_action(parsed_args)
+
+        bm_client.node.list.assert_called_once_with(maintenance=False,
+                                                    detail=True)
+        self.assertEqual(1, bm_client.node.update.call_count)
+        self.assertEqual('ABCDEFGH', bm_client.node.update.call_args[0][0])
+
     @mock.patch('openstackclient.common.utils.find_resource', autospec=True)
     @mock.patch.object(baremetal.ConfigureBaremetalBoot, 'sleep_time',
                        new_callable=mock.PropertyMock,
@@ -942,18 +1115,18 @@ class TestConfigureBaremetalBoot(fakes.TestBaremetal):
             mock.Mock(uuid="YZABCDEF"),
         ]
 
-        bm_client.node.get.side_effect = [
-            mock.Mock(uuid="ABCDEFGH", properties={
+        bm_client.node.get.side_effect = lambda uuid: {
+            "ABCDEFGH": mock.Mock(uuid="ABCDEFGH", properties={
                 'capabilities': 'existing:cap'
             }),
-            mock.Mock(uuid="IJKLMNOP", properties={
+            "IJKLMNOP": mock.Mock(uuid="IJKLMNOP", properties={
                 'capabilities': 'boot_option:local'
             }),
-            mock.Mock(uuid="QRSTUVWX", properties={
+            "QRSTUVWX": mock.Mock(uuid="QRSTUVWX", properties={
                 'capabilities': 'boot_option:remote'
             }),
-            mock.Mock(uuid="YZABCDEF", properties={}),
-        ]
+            "YZABCDEF": mock.Mock(uuid="YZABCDEF", properties={}),
+        }[uuid]
 
         parsed_args = self.check_parser(self.cmd, [], [])
         self.cmd.take_action(parsed_args)
@@ -961,7 +1134,7 @@ class TestConfigureBaremetalBoot(fakes.TestBaremetal):
         self.assertEqual(find_resource_mock.call_count, 2)
 
         self.assertEqual(bm_client.node.update.call_count, 4)
-        self.assertEqual(bm_client.node.update.mock_calls, [
+        bm_client.node.update.assert_has_calls(any_order=True, calls=[
             mock.call('ABCDEFGH', [{
                 'op': 'add', 'value': 'boot_option:local,existing:cap',
                 'path': '/properties/capabilities'
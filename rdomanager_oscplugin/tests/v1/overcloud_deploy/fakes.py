@@ -13,6 +13,9 @@
 #   under the License.
 #
 
+import os
+
+import fixtures
 import mock
 from openstackclient.tests import utils
 
@@ -66,6 +69,14 @@ class TestDeployOvercloud(utils.TestCommand):
     def setUp(self):
         super(TestDeployOvercloud, self).setUp()
 
+        self.useFixture(fixtures.TempHomeDir())
+
+        # The deploy keeps its passwords and Keystone PKI in the working
+        # directory.
+        cwd = os.getcwd()
+        os.chdir(self.useFixture(fixtures.TempDir()).path)
+        self.addCleanup(os.chdir, cwd)
+
         self.app.client_manager.auth_ref = mock.Mock(auth_token="TOKEN")
         self.app.client_manager.rdomanager_oscplugin = FakeClientWrapper()
         self.app.client_manager.network = mock.Mock()
@@ -44,6 +44,12 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
 
         self._get_passwords = generate_overcloud_passwords_mock
 
+    def test_state_not_shared(self):
+        cmd = overcloud_deploy.DeployOvercloud(self.app, None)
+
+        self.assertIsNot(self.cmd.secrets, cmd.secrets)
+        self.assertIsNot(self.cmd.profiler, cmd.profiler)
+
     @mock.patch('rdomanager_oscplugin.v1.overcloud_deploy.DeployOvercloud.'
                 '_deploy_postconfig')
     @mock.patch('rdomanager_oscplugin.v1.overcloud_deploy.DeployOvercloud.'
@@ -51,7 +57,8 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
     @mock.patch('rdomanager_oscplugin.utils.generate_overcloud_passwords')
     @mock.patch('rdomanager_oscplugin.v1.overcloud_deploy.DeployOvercloud.'
                 '_create_overcloudrc')
-    @mock.patch('os_cloud_config.keystone.setup_endpoints', autospec=True)
+    @mock.patch('rdomanager_oscplugin.keystone_endpoints.setup_endpoints',
+                autospec=True)
     @mock.patch('time.sleep', return_value=None)
     @mock.patch('os_cloud_config.keystone.initialize', autospec=True)
     @mock.patch('rdomanager_oscplugin.utils.remove_known_hosts', autospec=True)
@@ -61,7 +68,7 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
                 'process_multiple_environments_and_files', autospec=True)
     @mock.patch('heatclient.common.template_utils.get_template_contents',
                 autospec=True)
-    @mock.patch('os_cloud_config.keystone_pki.generate_certs_into_json',
+    @mock.patch('rdomanager_oscplugin.overcloud_secrets.load_keystone_pki',
                 autospec=True)
     @mock.patch('rdomanager_oscplugin.utils.create_environment_file',
                 autospec=True)
@@ -73,7 +80,7 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
     @mock.patch('uuid.uuid1', autospec=True)
     def test_tht_scale(self, mock_uuid1, mock_create_cephx_key,
                        mock_check_hypervisor_stats, mock_get_key,
-                       mock_create_env, generate_certs_mock,
+                       mock_create_env, mock_load_keystone_pki,
                        mock_get_templte_contents, mock_process_multiple_env,
                        wait_for_stack_ready_mock,
                        mock_remove_known_hosts, mock_keystone_initialize,
@@ -189,7 +196,8 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
     @mock.patch('rdomanager_oscplugin.utils.generate_overcloud_passwords')
     @mock.patch('rdomanager_oscplugin.v1.overcloud_deploy.DeployOvercloud.'
                 '_create_overcloudrc')
-    @mock.patch('os_cloud_config.keystone.setup_endpoints', autospec=True)
+    @mock.patch('rdomanager_oscplugin.keystone_endpoints.setup_endpoints',
+                autospec=True)
     @mock.patch('time.sleep', return_value=None)
     @mock.patch('os_cloud_config.keystone.initialize', autospec=True)
     @mock.patch('rdomanager_oscplugin.utils.remove_known_hosts', autospec=True)
@@ -199,7 +207,7 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
                 'process_multiple_environments_and_files', autospec=True)
     @mock.patch('heatclient.common.template_utils.get_template_contents',
                 autospec=True)
-    @mock.patch('os_cloud_config.keystone_pki.generate_certs_into_json',
+    @mock.patch('rdomanager_oscplugin.overcloud_secrets.load_keystone_pki',
                 autospec=True)
     @mock.patch('rdomanager_oscplugin.utils.create_environment_file',
                 autospec=True)
@@ -211,7 +219,7 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
     @mock.patch('uuid.uuid1', autospec=True)
     def test_tht_deploy(self, mock_uuid1, mock_create_cephx_key,
                         mock_check_hypervisor_stats, mock_get_key,
-                        mock_create_env, generate_certs_mock,
+                        mock_create_env, mock_load_keystone_pki,
                         mock_get_templte_contents, mock_process_multiple_env,
                         wait_for_stack_ready_mock,
                         mock_remove_known_hosts, mock_keystone_initialize,
@@ -230,6 +238,12 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
         mock_uuid1.return_value = "uuid"
 
         mock_generate_overcloud_passwords.return_value = self._get_passwords()
+        mock_load_keystone_pki.return_value = {
+            'ca_key': 'ca key',
+            'ca_cert': 'ca cert',
+            'signing_key': 'signing key',
+            'signing_cert': 'signing cert',
+        }
 
         clients = self.app.client_manager
         orchestration_client = clients.rdomanager_oscplugin.orchestration()
@@ -287,6 +301,9 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
             'HeatStackDomainAdminPassword': 'password',
             'HypervisorNeutronPhysicalBridge': 'br-ex',
             'HypervisorNeutronPublicInterface': 'nic1',
+            'KeystoneCACertificate': 'ca cert',
+            'KeystoneSigningCertificate': 'signing cert',
+            'KeystoneSigningKey': 'signing key',
             'NeutronAllowL3AgentFailover': False,
             'NeutronBridgeMappings': 'datacentre:br-ex',
             'NeutronControlPlaneID': 'network id',
@@ -341,7 +358,8 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
     @mock.patch('rdomanager_oscplugin.utils.generate_overcloud_passwords')
     @mock.patch('rdomanager_oscplugin.v1.overcloud_deploy.DeployOvercloud.'
                 '_create_overcloudrc')
-    @mock.patch('os_cloud_config.keystone.setup_endpoints', autospec=True)
+    @mock.patch('rdomanager_oscplugin.keystone_endpoints.setup_endpoints',
+                autospec=True)
     @mock.patch('time.sleep', return_value=None)
     @mock.patch('os_cloud_config.keystone.initialize', autospec=True)
     @mock.patch('rdomanager_oscplugin.utils.remove_known_hosts', autospec=True)
@@ -351,7 +369,7 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
                 'process_multiple_environments_and_files', autospec=True)
     @mock.patch('heatclient.common.template_utils.get_template_contents',
                 autospec=True)
-    @mock.patch('os_cloud_config.keystone_pki.generate_certs_into_json',
+    @mock.patch('rdomanager_oscplugin.overcloud_secrets.load_keystone_pki',
                 autospec=True)
     @mock.patch('rdomanager_oscplugin.utils.create_environment_file',
                 autospec=True)
@@ -360,7 +378,7 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
                 autospec=True)
     def test_deploy_custom_templates(self, mock_check_hypervisor_stats,
                                      mock_get_key,
-                                     mock_create_env, generate_certs_mock,
+                                     mock_create_env, mock_load_keystone_pki,
                                      mock_get_templte_contents,
                                      mock_process_multiple_env,
                                      wait_for_stack_ready_mock,
@@ -925,9 +943,12 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
                           self.cmd._validate_args,
                           parsed_args)
 
+    @mock.patch('rdomanager_oscplugin.overcloud_secrets.load_keystone_pki',
+                autospec=True)
     @mock.patch('rdomanager_oscplugin.utils.check_hypervisor_stats',
                 autospec=True)
-    def test_pre_heat_deploy_failed(self, mock_check_hypervisor_stats):
+    def test_pre_heat_deploy_failed(self, mock_check_hypervisor_stats,
+                                    mock_load_keystone_pki):
         clients = self.app.client_manager
         orchestration_client = clients.rdomanager_oscplugin.orchestration()
         orchestration_client.stacks.get.return_value = None
@@ -941,3 +962,38 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
         self.assertFalse(result)
         self.assertRaises(exceptions.DeploymentError,
                           self.cmd._pre_heat_deploy)
+
+    @mock.patch('rdomanager_oscplugin.utils.wait_for_stack_ready',
+                autospec=True)
+    @mock.patch('rdomanager_oscplugin.v1.overcloud_deploy.DeployOvercloud.'
+                '_process_templates')
+    def test_heat_deploy_skips_unchanged_update(self, mock_process_templates,
+                                                mock_wait_for_stack_ready):
+        clients = self.app.client_manager
+        orchestration_client = clients.rdomanager_oscplugin.orchestration()
+        stack = fakes.create_tht_stack(id='STACK_ID',
+                                       stack_status='CREATE_COMPLETE',
+                                       updated_time=None)
+        orchestration_client.stacks.get.return_value = stack
+        mock_process_templates.return_value = ({}, {}, {})
+        mock_wait_for_stack_ready.return_value = True
+        parameters = {'ControllerCount': 1}
+
+        self.cmd._heat_deploy(stack, 'overcloud', 'overcloud.yaml',
+                              parameters, [], 240)
+        self.assertEqual(orchestration_client.stacks.update.call_count, 1)
+
+        self.cmd._heat_deploy(stack, 'overcloud', 'overcloud.yaml',
+                              parameters, [], 240)
+        self.assertEqual(orchestration_client.stacks.update.call_count, 1)
+
+        parameters = {'ControllerCount': 3}
+        self.cmd._heat_deploy(stack, 'overcloud', 'overcloud.yaml',
+                              parameters, [], 240)
+        self.assertEqual(orchestration_client.stacks.update.call_count, 2)
+
+        # The stack was updated by something else since.
+        stack.updated_time = '2015-06-02T10:00:00Z'
+        self.cmd._heat_deploy(stack, 'overcloud', 'overcloud.yaml',
+                              parameters, [], 240)
+        self.assertEqual(orchestration_client.stacks.update.call_count, 3)
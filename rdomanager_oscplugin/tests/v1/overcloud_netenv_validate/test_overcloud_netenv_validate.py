@@ -13,9 +13,12 @@
 #   under the License.
 #
 
+import json
 import os
 import tempfile
 
+import mock
+import six
 import yaml
 
 from rdomanager_oscplugin.tests.v1.overcloud_netenv_validate import fakes
@@ -248,3 +251,103 @@ class TestValidateOvercloudNetenv(fakes.TestValidateOvercloudNetenv):
             'OS::TripleO::Controller::Net::SoftwareConfig', tmp)
         os.unlink(tmp)
         self.assertEqual(1, self.cmd.error_count)
+
+    def test_json_report(self):
+        nic_path = self.temporary_nic_config_file([])
+        netenv = {
+            'resource_registry': {
+                'OS::TripleO::Controller::Net::SoftwareConfig': nic_path,
+            },
+            'parameter_defaults': {
+                'InternalApiNetCidr': '172.17.0.0/24',
+                'StorageNetCidr': '172.17.0.0/24',
+            },
+        }
+        tmp = tempfile.NamedTemporaryFile(mode='w', delete=False)
+        yaml.dump(netenv, tmp)
+        tmp.close()
+
+        parsed_args = self.check_parser(
+            self.cmd, ['-f', tmp.name, '--format', 'json'],
+            [('output_format', 'json')])
+        with mock.patch('sys.stdout', new_callable=six.StringIO) as stdout:
+            self.cmd.take_action(parsed_args)
+        os.unlink(tmp.name)
+        os.unlink(nic_path)
+
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(['netenv.cidr.overlap'],
+                         [finding['rule'] for finding in report[tmp.name]])
+        self.assertEqual(1, self.cmd.error_count)
+
+    def test_many_files(self):
+        directory = tempfile.mkdtemp()
+        nic_path = os.path.join(directory, 'nic.yaml')
+        with open(nic_path, 'w') as f:
+            yaml.dump({'resources': {}}, f)
+        for site, cidr in (('a', '172.17.0.0/24'), ('b', '172.18.0.0/24'),
+                           ('c', 'nonsense')):
+            with open(os.path.join(directory, 'site-%s.yaml' % site),
+                      'w') as f:
+                yaml.dump({
+                    'resource_registry': {
+                        'OS::TripleO::Controller::Net::SoftwareConfig':
+                            'nic.yaml',
+                        'OS::TripleO::Compute::Net::SoftwareConfig':
+                            'nic.yaml',
+                    },
+                    'parameter_defaults': {'InternalApiNetCidr': cidr},
+                }, f)
+        missing = os.path.join(directory, 'missing.yaml')
+
+        parsed_args = self.check_parser(
+            self.cmd, ['-f', os.path.join(directory, 'site-*.yaml'),
+                       '-f', missing, '--format', 'json'], [])
+        with mock.patch('sys.stdout', new_callable=six.StringIO) as stdout:
+            with mock.patch('yaml.load', wraps=yaml.load) as load_mock:
+                self.cmd.take_action(parsed_args)
+
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(
+            sorted([os.path.join(directory, 'site-%s.yaml' % site)
+                    for site in 'abc'] + [missing]), sorted(report))
+        self.assertEqual(['netenv.cidr.invalid'], [
+            finding['rule'] for finding in
+            report[os.path.join(directory, 'site-c.yaml')]])
+        self.assertEqual(['file.unreadable'],
+                         [finding['rule'] for finding in report[missing]])
+        self.assertEqual(2, self.cmd.error_count)
+        # The three environments and the NIC template they share.
+        self.assertEqual(4, load_mock.call_count)
+
+    def test_instackenv_conflicts(self):
+        directory = tempfile.mkdtemp()
+        netenv = os.path.join(directory, 'network-environment.yaml')
+        with open(netenv, 'w') as f:
+            yaml.dump({
+                'resource_registry': {},
+                'parameter_defaults': {
+                    'ControlPlaneNetCidr': '192.0.2.0/24',
+                    'ControlPlaneAllocationPools': [
+                        {'start': '192.0.2.10', 'end': '192.0.2.100'}],
+                },
+            }, f)
+        instackenv = os.path.join(directory, 'instackenv.json')
+        with open(instackenv, 'w') as f:
+            json.dump({'nodes': [{
+                'pm_type': 'pxe_ipmitool', 'pm_addr': '192.0.2.20',
+                'pm_user': 'admin', 'pm_password': 'secret',
+                'mac': ['00:0b:d0:69:7e:59'],
+            }]}, f)
+
+        parsed_args = self.check_parser(
+            self.cmd, ['-f', netenv, '--instackenv', instackenv,
+                       '--format', 'json'], [])
+        with mock.patch('sys.stdout', new_callable=six.StringIO) as stdout:
+            self.cmd.take_action(parsed_args)
+
+        report = json.loads(stdout.getvalue())
+        self.assertEqual([], report[netenv])
+        self.assertEqual(['index.bmc.in-pool'],
+                         [finding['rule'] for finding in report[instackenv]])
+        self.assertEqual(1, self.cmd.error_count)
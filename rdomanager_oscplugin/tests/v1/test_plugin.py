@@ -13,6 +13,13 @@
 #   under the License.
 #
 
+import json
+import subprocess
+import sys
+
+import mock
+
+from rdomanager_oscplugin import plugin
 from rdomanager_oscplugin.tests import base
 from rdomanager_oscplugin.tests import fakes
 
@@ -20,6 +27,32 @@ from rdomanager_oscplugin.tests import fakes
 plugin_name = 'rdomanager_oscplugin'
 plugin_client = 'rdomanager_oscplugin.plugin'
 
+# Libraries that are only needed once a command runs, and must not be
+# imported when the openstack command loads the plugin.
+DEFERRED_IMPORTS = [
+    'heatclient',
+    'ipaddress',
+    'ironic_discoverd',
+    'ironicclient',
+    'os_cloud_config',
+    'prettytable',
+    'requests',
+    'tripleo_common',
+    'tuskarclient',
+    'yaml',
+]
+
+PLUGIN_MODULES = [
+    'rdomanager_oscplugin.plugin',
+    'rdomanager_oscplugin.v1.baremetal',
+    'rdomanager_oscplugin.v1.overcloud_deploy',
+    'rdomanager_oscplugin.v1.overcloud_image',
+    'rdomanager_oscplugin.v1.overcloud_netenv_validate',
+    'rdomanager_oscplugin.v1.overcloud_node',
+    'rdomanager_oscplugin.v1.overcloud_update',
+    'rdomanager_oscplugin.v1.undercloud',
+]
+
 
 class FakePluginV1Client(object):
     def __init__(self, **kwargs):
@@ -35,3 +68,110 @@ class TestPluginV1(base.TestCommand):
             endpoint=fakes.AUTH_URL,
             token=fakes.AUTH_TOKEN,
         )
+
+
+class TestClientWrapper(base.TestCase):
+
+    def setUp(self):
+        super(TestClientWrapper, self).setUp()
+
+        self.instance = mock.Mock()
+        self.instance._cli_options.os_rdomanager_oscplugin_api_stats = None
+        self.instance._api_version = {plugin_name: '1'}
+
+    @mock.patch('rdomanager_oscplugin.utils.configure_connection_pool')
+    @mock.patch('ironicclient.client.Client')
+    def test_baremetal(self, mock_client, mock_pool):
+        client = plugin.ClientWrapper(self.instance)
+
+        self.assertIs(mock_client.return_value, client.baremetal())
+        self.assertIs(client.baremetal(), client.baremetal())
+        mock_client.assert_called_once_with(
+            1, self.instance.get_endpoint_for_service_type.return_value,
+            session=self.instance.session,
+            region_name=self.instance._region_name)
+        mock_pool.assert_called_once_with(self.instance.session)
+
+    @mock.patch('rdomanager_oscplugin.utils.configure_connection_pool')
+    @mock.patch('ironicclient.client.Client')
+    @mock.patch('openstackclient.common.utils.get_client_class')
+    def test_clients_share_session(self, mock_client_class, mock_ironic,
+                                   mock_pool):
+        client = plugin.ClientWrapper(self.instance)
+
+        client.baremetal()
+        client.orchestration()
+
+        self.assertEqual(
+            self.instance.session,
+            mock_client_class.return_value.call_args[1]['session'])
+        mock_pool.assert_called_once_with(self.instance.session)
+
+    @mock.patch('atexit.register')
+    @mock.patch('rdomanager_oscplugin.utils.configure_connection_pool')
+    @mock.patch('ironicclient.client.Client')
+    def test_baremetal_api_stats(self, mock_get_client, mock_pool,
+                                 mock_register):
+        self.instance._cli_options.os_rdomanager_oscplugin_api_stats = '-'
+        client = plugin.ClientWrapper(self.instance)
+        mock_register.assert_called_once_with(client.report_api_stats)
+
+        client.baremetal().node.list()
+        client.baremetal().node.get('UUID')
+
+        mock_get_client.return_value.node.get.assert_called_once_with('UUID')
+        self.assertEqual(2, client._profiler.call_count('ironic'))
+
+    @mock.patch('tuskarclient.client.get_client')
+    def test_management_memoized(self, mock_get_client):
+        client = plugin.ClientWrapper(self.instance)
+
+        self.assertIs(client.management(), client.management())
+        self.assertEqual(1, mock_get_client.call_count)
+        self.assertEqual(
+            1, self.instance.get_endpoint_for_service_type.call_count)
+
+    @mock.patch('tuskarclient.client.get_client')
+    def test_management_token_renewed(self, mock_get_client):
+        self.instance.auth.get_token.side_effect = ['TOKEN1', 'TOKEN1',
+                                                    'TOKEN2']
+        client = plugin.ClientWrapper(self.instance)
+
+        client.management()
+        client.management()
+        client.management()
+
+        self.assertEqual([
+            mock.call(2, os_auth_token='TOKEN1', tuskar_url=mock.ANY),
+            mock.call(2, os_auth_token='TOKEN2', tuskar_url=mock.ANY),
+        ], mock_get_client.call_args_list)
+        self.assertEqual(
+            1, self.instance.get_endpoint_for_service_type.call_count)
+
+
+class TestPluginImports(base.TestCase):
+
+    def test_client_libraries_not_imported(self):
+        # A new interpreter is used, as the test run has already imported
+        # the client libraries. Some, like requests, are also imported by
+        # openstackclient, so the imports made by the plugin modules
+        # themselves are recorded rather than checking sys.modules.
+        script = (
+            "import json\n"
+            "from six.moves import builtins\n"
+            "imported = set()\n"
+            "real_import = builtins.__import__\n"
+            "def record_import(name, globals=None, *args, **kwargs):\n"
+            "    if (globals or {}).get('__name__', '').startswith(\n"
+            "            'rdomanager_oscplugin'):\n"
+            "        imported.add(name.split('.')[0])\n"
+            "    return real_import(name, globals, *args, **kwargs)\n"
+            "builtins.__import__ = record_import\n"
+            "for name in %r:\n"
+            "    __import__(name)\n"
+            "print(json.dumps(sorted(imported)))\n" % PLUGIN_MODULES)
+        output = subprocess.check_output([sys.executable, '-c', script])
+
+        imported = json.loads(output.decode('utf-8'))
+        self.assertEqual([], [name for name in DEFERRED_IMPORTS
+                              if name in imported])
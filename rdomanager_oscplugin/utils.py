@@ -13,10 +13,14 @@
 #   under the License.
 #
 
+from __future__ import print_function
+
 import base64
+import fnmatch
 import hashlib
 import json
 import logging
+from multiprocessing import pool
 import os
 import re
 import six
@@ -27,10 +31,15 @@ import time
 import uuid
 
 from rdomanager_oscplugin import exceptions
+from rdomanager_oscplugin import known_hosts
+from rdomanager_oscplugin import secret_store
 
 
 WEBROOT = '/dashboard/'
 
+# Keep-alive connections kept open per host by the plugin clients
+CONNECTION_POOL_SIZE = 32
+
 SERVICE_LIST = {
     'ceilometer': {'password_field': 'OVERCLOUD_CEILOMETER_PASSWORD'},
     'cinder': {'password_field': 'OVERCLOUD_CINDER_PASSWORD'},
@@ -60,41 +69,35 @@ def _generate_password():
     return hashlib.sha1(uuid_str).hexdigest()
 
 
-def generate_overcloud_passwords(output_file="tripleo-overcloud-passwords"):
+OVERCLOUD_PASSWORD_NAMES = (
+    "OVERCLOUD_ADMIN_PASSWORD",
+    "OVERCLOUD_ADMIN_TOKEN",
+    "OVERCLOUD_CEILOMETER_PASSWORD",
+    "OVERCLOUD_CEILOMETER_SECRET",
+    "OVERCLOUD_CINDER_PASSWORD",
+    "OVERCLOUD_DEMO_PASSWORD",
+    "OVERCLOUD_GLANCE_PASSWORD",
+    "OVERCLOUD_HEAT_PASSWORD",
+    "OVERCLOUD_HEAT_STACK_DOMAIN_PASSWORD",
+    "OVERCLOUD_NEUTRON_PASSWORD",
+    "OVERCLOUD_NOVA_PASSWORD",
+    "OVERCLOUD_SWIFT_HASH",
+    "OVERCLOUD_SWIFT_PASSWORD",
+)
+
+
+def generate_overcloud_passwords(
+        output_file=secret_store.OVERCLOUD_PASSWORDS_FILE):
     """Create the passwords needed for the overcloud
 
     This will create the set of passwords required by the overcloud, store
     them in the output file path and return a dictionary of passwords. If the
     file already exists the existing passwords will be returned instead,
+    and only the passwords it lacks are created and added to it.
     """
 
-    if os.path.isfile(output_file):
-        with open(output_file) as f:
-            return dict(line.split('=') for line in f.read().splitlines())
-
-    password_names = (
-        "OVERCLOUD_ADMIN_PASSWORD",
-        "OVERCLOUD_ADMIN_TOKEN",
-        "OVERCLOUD_CEILOMETER_PASSWORD",
-        "OVERCLOUD_CEILOMETER_SECRET",
-        "OVERCLOUD_CINDER_PASSWORD",
-        "OVERCLOUD_DEMO_PASSWORD",
-        "OVERCLOUD_GLANCE_PASSWORD",
-        "OVERCLOUD_HEAT_PASSWORD",
-        "OVERCLOUD_HEAT_STACK_DOMAIN_PASSWORD",
-        "OVERCLOUD_NEUTRON_PASSWORD",
-        "OVERCLOUD_NOVA_PASSWORD",
-        "OVERCLOUD_SWIFT_HASH",
-        "OVERCLOUD_SWIFT_PASSWORD",
-    )
-
-    passwords = dict((p, _generate_password()) for p in password_names)
-
-    with open(output_file, 'w') as f:
-        for name, password in passwords.items():
-            f.write("{0}={1}\n".format(name, password))
-
-    return passwords
+    return secret_store.overcloud_passwords(output_file).ensure(
+        OVERCLOUD_PASSWORD_NAMES, _generate_password)
 
 
 def check_hypervisor_stats(compute_client, nodes=1, memory=0, vcpu=0):
@@ -229,7 +232,7 @@ def wait_for_node_discovery(discoverd_client, auth_token, discoverd_url,
 
     for _ in range(0, loops):
 
-        for node_uuid in node_uuids:
+        for node_uuid in node_uuids[:]:
 
             status = discoverd_client.get_status(
                 node_uuid,
@@ -243,7 +246,7 @@ def wait_for_node_discovery(discoverd_client, auth_token, discoverd_url,
                 yield node_uuid, status
 
         if not len(node_uuids):
-            raise StopIteration
+            return
         time.sleep(sleep)
 
     if len(node_uuids):
@@ -315,57 +318,136 @@ def set_nodes_state(baremetal_client, nodes, transition, target_state,
                            are already deployed and the state can't always be
                            changed.
     :type  skipped_states: iterable of strings
+
+    :raises BulkOperationError: once the other nodes were waited for, if the
+                                transition of any node couldn't be started
     """
 
+    # Imported here, baremetal_bulk uses concurrent_map.
+    from rdomanager_oscplugin import baremetal_bulk
+
     log = logging.getLogger(__name__ + ".set_nodes_state")
 
+    nodes = [node for node in nodes
+             if node.provision_state not in skipped_states]
     for node in nodes:
-
-        if node.provision_state in skipped_states:
-            continue
-
         log.debug(
             "Setting provision state from {0} to '{1} for Node {2}"
             .format(node.provision_state, transition, node.uuid))
 
-        baremetal_client.node.set_provision_state(node.uuid, transition)
+    # The transitions are started for all the nodes at once, then waited for
+    # one node at a time.
+    result = baremetal_bulk.BulkNodeClient(
+        baremetal_client).set_provision_state_many(
+            [node.uuid for node in nodes], transition,
+            target_state=target_state)
 
-        if not wait_for_provision_state(baremetal_client, node.uuid,
+    for node_uuid in result.results:
+        if not wait_for_provision_state(baremetal_client, node_uuid,
                                         target_state):
-            print("FAIL: State not updated for Node {0}".format(
-                  node.uuid, file=sys.stderr))
+            print("FAIL: State not updated for Node {0}".format(node_uuid),
+                  file=sys.stderr)
         else:
-            yield node.uuid
+            yield node_uuid
+
+    result.raise_for_errors()
+
+
+def node_profiles(node):
+    """Return the profiles in the capabilities of a baremetal node"""
+
+    return re.findall(r'profile:(.*?)(?:,|$)',
+                      node.properties.get('capabilities') or '')
+
+
+def filter_nodes(nodes, names=None, drivers=None, profiles=None,
+                 resource_classes=None, provision_states=None,
+                 introspected=None):
+    """Select baremetal nodes matching all the given criteria
+
+    Criteria left as None aren't checked. The nodes need the details
+    returned by a detailed node list for the profile and resource class.
+
+    :param nodes: List of Baremetal Nodes
+    :type  nodes: [ironicclient.v1.node.Node]
+
+    :param names: Glob patterns, one of which the node name must match
+    :type  names: [string]
+
+    :param drivers: The drivers to select
+    :type  drivers: [string]
+
+    :param profiles: The profile capabilities to select
+    :type  profiles: [string]
+
+    :param resource_classes: The resource classes to select
+    :type  resource_classes: [string]
+
+    :param provision_states: The provision states to select
+    :type  provision_states: [string]
+
+    :param introspected: Called with a node UUID. When given, the nodes it
+                         returns True for are left out.
+    :type  introspected: callable
+    """
+
+    selected = []
+    for node in nodes:
+        if names is not None and not any(
+                fnmatch.fnmatchcase(node.name or '', name) for name in names):
+            continue
+        if drivers is not None and node.driver not in drivers:
+            continue
+        if profiles is not None and not set(node_profiles(node)).intersection(
+                profiles):
+            continue
+        if (resource_classes is not None and
+                getattr(node, 'resource_class', None) not in resource_classes):
+            continue
+        if (provision_states is not None and
+                node.provision_state not in provision_states):
+            continue
+        if introspected is not None and introspected(node.uuid):
+            continue
+        selected.append(node)
+    return selected
 
 
 def get_hiera_key(key_name):
     """Retrieve a key from the hiera store
 
+    The key is read from the hieradata files when it can be, which are
+    loaded once. Otherwise hiera is run for it.
+
     :param password_name: Name of the key to retrieve
     :type  password_name: type
 
     """
+    # Imported here, hiera uses yaml_cache, which uses concurrent_map.
+    from rdomanager_oscplugin import hiera
+
+    try:
+        return hiera.default_reader().get(key_name)
+    except KeyError:
+        pass
+
     command = ["hiera", key_name]
     p = subprocess.Popen(command, stdout=subprocess.PIPE)
     out, err = p.communicate()
-    return out
+    if isinstance(out, six.binary_type):
+        out = out.decode('utf-8')
+    return out.strip()
 
 
 def get_config_value(section, option):
 
-    p = six.moves.configparser.ConfigParser()
-    p.read(os.path.expanduser("~/undercloud-passwords.conf"))
-    return p.get(section, option)
-
+    return secret_store.undercloud_passwords().get(section, option)
 
-def remove_known_hosts(overcloud_ip):
-    """For a given IP address remove SSH keys from the known_hosts file"""
 
-    known_hosts = os.path.expanduser("~/.ssh/known_hosts")
+def remove_known_hosts(*addresses):
+    """For the given IP addresses remove SSH keys from the known_hosts file"""
 
-    if os.path.exists(known_hosts):
-        command = ['ssh-keygen', '-R', overcloud_ip, '-f', known_hosts]
-        subprocess.check_call(command)
+    known_hosts.remove_hosts(addresses)
 
 
 def create_cephx_key():
@@ -422,3 +504,48 @@ def check_nodes_count(baremetal_client, stack, parameters, defaults):
                 available, count))
     else:
         return True
+
+
+def configure_connection_pool(session, pool_size=CONNECTION_POOL_SIZE):
+    """Keep up to pool_size connections open per host on a session
+
+    The default requests pool keeps 10 connections per host, so threads
+    making concurrent calls beyond that open a new connection, and a new
+    TLS handshake, for every request.
+
+    :param session: A keystoneclient session
+    :type  session: keystoneclient.session.Session
+
+    :param pool_size: The number of connections kept open per host
+    :type  pool_size: int
+    """
+
+    # The session is shared by every OSC client, so the adapters are
+    # replaced by ones of the same class, like keystoneclient's
+    # TCPKeepAliveAdapter, keeping their socket options and retries.
+    for prefix in ('https://', 'http://'):
+        adapter = session.session.get_adapter(prefix)
+        session.session.mount(prefix, type(adapter)(
+            pool_connections=pool_size, pool_maxsize=pool_size,
+            max_retries=adapter.max_retries))
+
+
+def concurrent_map(func, items, workers):
+    """Call func with every item over a thread pool, returning the results
+
+    The results are in the order of the items. At most workers threads are
+    used, and none for a single item or worker.
+
+    :param workers: The maximum number of concurrent calls
+    :type  workers: int
+    """
+
+    items = list(items)
+    if workers > 1 and len(items) > 1:
+        threads = pool.ThreadPool(min(workers, len(items)))
+        try:
+            return threads.map(func, items)
+        finally:
+            threads.close()
+            threads.join()
+    return [func(item) for item in items]
@@ -16,6 +16,7 @@
 from __future__ import print_function
 
 import argparse
+import collections
 import csv
 import json
 import logging
@@ -24,12 +25,14 @@ import time
 
 from cliff import command
 from cliff import lister
-from ironic_discoverd import client as discoverd_client
 from openstackclient.common import utils as osc_utils
-from os_cloud_config import nodes
+import six
 
+from rdomanager_oscplugin import baremetal_bulk
 from rdomanager_oscplugin import exceptions
+from rdomanager_oscplugin import introspection_journal
 from rdomanager_oscplugin import utils
+from rdomanager_oscplugin import validation
 
 
 def _csv_to_nodes_dict(nodes_csv):
@@ -70,73 +73,26 @@ class ValidateInstackEnv(command.Command):
             '-f', '--file', dest='instackenv',
             help="Path to the instackenv.json file.",
             default='instackenv.json')
+        parser.add_argument(
+            '--format', dest='output_format', choices=validation.FORMATS,
+            default='text',
+            help="The format of the report, defaults to text")
         return parser
 
     def take_action(self, parsed_args):
         self.log.debug("take_action(%s)" % parsed_args)
 
-        self.error_count = 0
-
-        with open(parsed_args.instackenv, 'r') as net_file:
-            env_data = json.load(net_file)
-
-        maclist = []
-        baremetal_ips = []
-        for node in env_data['nodes']:
-            self.log.info("Checking node %s" % node['pm_addr'])
-
-            try:
-                if len(node['pm_password']) == 0:
-                    self.log.error('ERROR: Password 0 length.')
-                    self.error_count += 1
-            except Exception as e:
-                self.log.error('ERROR: Password does not exist: %s', e)
-                self.error_count += 1
-            try:
-                if len(node['pm_user']) == 0:
-                    self.log.error('ERROR: User 0 length.')
-                    self.error_count += 1
-            except Exception as e:
-                self.log.error('ERROR: User does not exist: %s', e)
-                self.error_count += 1
-            try:
-                if len(node['mac']) == 0:
-                    self.log.error('ERROR: MAC address 0 length.')
-                    self.error_count += 1
-                maclist.extend(node['mac'])
-            except Exception as e:
-                self.log.error('ERROR: MAC address does not exist: %s', e)
-                self.error_count += 1
-
-            if node['pm_type'] == "pxe_ssh":
-                self.log.debug("Identified virtual node")
-
-            if node['pm_type'] == "pxe_ipmitool":
-                self.log.debug("Identified baremetal node")
-
-                cmd = ('ipmitool -R 1 -I lanplus -H %s -U %s -P %s chassis '
-                       'status' % (node['pm_addr'], node['pm_user'],
-                                   node['pm_password']))
-                self.log.debug("Executing: %s", cmd)
-                status = utils.run_shell(cmd)
-                if status != 0:
-                    self.log.error('ERROR: ipmitool failed')
-                    self.error_count += 1
-                baremetal_ips.append(node['pm_addr'])
-
-        if not utils.all_unique(baremetal_ips):
-            self.log.error('ERROR: Baremetals IPs are not all unique.')
-            self.error_count += 1
-        else:
-            self.log.debug('Baremetal IPs are all unique.')
-
-        if not utils.all_unique(maclist):
-            self.log.error('ERROR: MAC addresses are not all unique.')
-            self.error_count += 1
-        else:
-            self.log.debug('MAC addresses are all unique.')
-
-        if self.error_count == 0:
+        findings = list(validation.validate_instackenv(
+            parsed_args.instackenv))
+        for finding in findings:
+            self.log.error('ERROR: %s', finding.message)
+        self.error_count = validation.error_count(findings)
+
+        if parsed_args.output_format != 'text':
+            validation.write_report(
+                collections.OrderedDict([(parsed_args.instackenv, findings)]),
+                parsed_args.output_format, sys.stdout)
+        elif self.error_count == 0:
             print('SUCCESS: found 0 errors')
         else:
             print('FAILURE: found %d errors' % self.error_count)
@@ -174,6 +130,8 @@ class ImportBaremetal(command.Command):
         else:
             nodes_json = _csv_to_nodes_dict(parsed_args.file_in)
 
+        from os_cloud_config import nodes
+
         nodes.register_all_nodes(
             parsed_args.service_host,
             nodes_json,
@@ -192,7 +150,97 @@ class IntrospectionParser(object):
         return parser
 
 
-class StartBaremetalIntrospectionBulk(IntrospectionParser, command.Command):
+class NodeFilterParser(object):
+
+    def get_parser(self, prog_name):
+        parser = super(NodeFilterParser, self).get_parser(prog_name)
+        parser.add_argument(
+            '--node', dest='nodes', metavar='<uuid>', action='append',
+            help='Only act on this node, can be repeated.')
+        parser.add_argument(
+            '--node-name', dest='node_names', metavar='<glob>',
+            action='append',
+            help='Only act on the nodes with a name matching this pattern, '
+                 'can be repeated.')
+        parser.add_argument(
+            '--driver', dest='drivers', metavar='<driver>', action='append',
+            help='Only act on the nodes using this driver, can be repeated.')
+        parser.add_argument(
+            '--profile', dest='profiles', metavar='<profile>',
+            action='append',
+            help='Only act on the nodes with this profile capability, can be '
+                 'repeated.')
+        parser.add_argument(
+            '--resource-class', dest='resource_classes',
+            metavar='<resource class>', action='append',
+            help='Only act on the nodes of this resource class, can be '
+                 'repeated.')
+        parser.add_argument(
+            '--provision-state', dest='provision_states',
+            metavar='<state>', action='append',
+            help='Only act on the nodes in this provision state, can be '
+                 'repeated.')
+        parser.add_argument(
+            '--not-introspected', action='store_true',
+            help='Only act on the nodes without a successful introspection '
+                 'in the introspection journal.')
+        parser.add_argument(
+            '--journal',
+            default=introspection_journal.DEFAULT_JOURNAL_PATH,
+            help='The file recording the progress of the introspection, '
+                 'defaults to %(default)s')
+        return parser
+
+
+def _has_node_filters(parsed_args):
+    return bool(parsed_args.nodes or parsed_args.node_names or
+                parsed_args.drivers or parsed_args.profiles or
+                parsed_args.resource_classes or
+                parsed_args.provision_states or
+                parsed_args.not_introspected)
+
+
+def _select_nodes(bm_client, parsed_args, **list_kwargs):
+    """List the nodes selected by the NodeFilterParser arguments
+
+    Without any filter this is a plain node list. Otherwise the nodes are
+    listed with their details once and filtered locally, or, when they are
+    given by UUID, only those nodes are fetched.
+    """
+
+    if not _has_node_filters(parsed_args):
+        return bm_client.node.list(**list_kwargs)
+
+    if parsed_args.nodes:
+        details = baremetal_bulk.BulkNodeClient(bm_client).get_many(
+            parsed_args.nodes)
+        details.raise_for_errors()
+        nodes = list(details.results.values())
+        maintenance = list_kwargs.get('maintenance')
+        if maintenance is not None:
+            nodes = [node for node in nodes
+                     if node.maintenance == maintenance]
+    else:
+        list_kwargs['detail'] = True
+        nodes = bm_client.node.list(**list_kwargs)
+
+    introspected = None
+    if parsed_args.not_introspected:
+        introspected = introspection_journal.IntrospectionJournal(
+            parsed_args.journal).is_finished
+
+    return utils.filter_nodes(
+        nodes,
+        names=parsed_args.node_names,
+        drivers=parsed_args.drivers,
+        profiles=parsed_args.profiles,
+        resource_classes=parsed_args.resource_classes,
+        provision_states=parsed_args.provision_states,
+        introspected=introspected)
+
+
+class StartBaremetalIntrospectionBulk(NodeFilterParser, IntrospectionParser,
+                                      command.Command):
     """Start bulk introspection on all baremetal nodes"""
 
     log = logging.getLogger(__name__ + ".StartBaremetalIntrospectionBulk")
@@ -200,36 +248,86 @@ class StartBaremetalIntrospectionBulk(IntrospectionParser, command.Command):
     def get_parser(self, prog_name):
         parser = super(
             StartBaremetalIntrospectionBulk, self).get_parser(prog_name)
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Resume an interrupted run from the journal: skip the '
+                 'nodes which finished introspection and wait for the ones '
+                 'still being introspected.')
         return parser
 
     def take_action(self, parsed_args):
 
+        from ironic_discoverd import client as discoverd_client
+        import requests
+
         self.log.debug("take_action(%s)" % parsed_args)
         client = self.app.client_manager.rdomanager_oscplugin.baremetal()
 
         auth_token = self.app.client_manager.auth_ref.auth_token
 
+        # The nodes are selected once, the later listings only refresh their
+        # provision state.
+        selected = None
+        if _has_node_filters(parsed_args):
+            selected = set(node.uuid for node in
+                           _select_nodes(client, parsed_args))
+
+        def is_selected(node):
+            return selected is None or node.uuid in selected
+
+        journal = introspection_journal.IntrospectionJournal(
+            parsed_args.journal)
+
+        def is_skipped(node):
+            return parsed_args.resume and journal.is_finished(node.uuid)
+
+        # Nodes still being introspected when the previous run was
+        # interrupted are waited for, not introspected again, unless
+        # discoverd doesn't know about their introspection.
         node_uuids = []
+        for uuid in journal.in_flight() if parsed_args.resume else []:
+            try:
+                discoverd_client.get_status(
+                    uuid,
+                    base_url=parsed_args.discoverd_url,
+                    auth_token=auth_token)
+            except requests.HTTPError as e:
+                self.log.debug("Introspection of node {0} can't be resumed: "
+                               "{1}".format(uuid, e))
+                continue
+            print("Resuming introspection of node: {0}".format(uuid))
+            node_uuids.append(uuid)
+        in_flight = set(node_uuids)
 
         print("Setting available nodes to manageable...")
         self.log.debug("Moving available nodes to manageable state.")
         available_nodes = [node for node in client.node.list()
-                           if node.provision_state == "available"]
+                           if node.provision_state == "available" and
+                           is_selected(node) and not is_skipped(node)]
         for uuid in utils.set_nodes_state(client, available_nodes, 'manage',
                                           'manageable'):
             self.log.debug("Node {0} has been set to manageable.".format(uuid))
 
         for node in client.node.list():
-            if node.provision_state != "manageable":
+            if (node.provision_state != "manageable" or
+                    node.uuid in in_flight or not is_selected(node)):
                 continue
 
-            node_uuids.append(node.uuid)
+            if is_skipped(node):
+                print("Skipping node {0}, its introspection already "
+                      "finished.".format(node.uuid))
+                continue
 
             print("Starting introspection of node: {0}".format(node.uuid))
             discoverd_client.introspect(
                 node.uuid,
                 base_url=parsed_args.discoverd_url,
                 auth_token=auth_token)
+            # Only recorded once discoverd accepted it, so a failed request
+            # doesn't leave the node in flight.
+            node_uuids.append(node.uuid)
+            journal.start(node.uuid)
 
             # NOTE(dtantsur): PXE firmware on virtual machines misbehaves when
             # a lot of nodes start DHCPing simultaneously: it ignores NACK from
@@ -242,6 +340,7 @@ class StartBaremetalIntrospectionBulk(IntrospectionParser, command.Command):
         for uuid, status in utils.wait_for_node_discovery(
                 discoverd_client, auth_token, parsed_args.discoverd_url,
                 node_uuids):
+            journal.finish(uuid, status['error'])
             if status['error'] is None:
                 print("Discovery for UUID {0} finished successfully."
                       .format(uuid))
@@ -258,8 +357,11 @@ class StartBaremetalIntrospectionBulk(IntrospectionParser, command.Command):
         available_nodes = [node for node in client.node.list()
                            if node.provision_state == "manageable"]
         for uuid in utils.set_nodes_state(
-                baremetal_client, baremetal_client.node.list(), 'provide',
-                'available', skipped_states=("available", "active")):
+                baremetal_client,
+                [node for node in baremetal_client.node.list()
+                 if is_selected(node)],
+                'provide', 'available',
+                skipped_states=("available", "active")):
             print("Node {0} has been set to available.".format(uuid))
 
         if has_errors:
@@ -275,6 +377,8 @@ class StatusBaremetalIntrospectionBulk(IntrospectionParser, lister.Lister):
 
     def take_action(self, parsed_args):
 
+        from ironic_discoverd import client as discoverd_client
+
         self.log.debug("take_action(%s)" % parsed_args)
         client = self.app.client_manager.rdomanager_oscplugin.baremetal()
 
@@ -296,18 +400,25 @@ class StatusBaremetalIntrospectionBulk(IntrospectionParser, lister.Lister):
         )
 
 
-class ConfigureReadyState(IntrospectionParser, command.Command):
+class ConfigureReadyState(NodeFilterParser, IntrospectionParser,
+                          command.Command):
     """Configure all baremetal nodes for enrollment"""
 
     log = logging.getLogger(__name__ + ".ConfigureReadyState")
     sleep_time = 15
     loops = 120
+    retry_policy = baremetal_bulk.conflict_retry_policy()
+
+    def _bulk_client(self):
+        return baremetal_bulk.BulkNodeClient(self.bm_client,
+                                             retry_policy=self.retry_policy)
 
     def _configure_bios(self, nodes):
         for node in nodes:
             print("Configuring BIOS for node {0}".format(node.uuid))
-            self.bm_client.node.vendor_passthru(
-                node.uuid, 'configure_bios_settings', http_method='POST')
+        self._bulk_client().vendor_passthru_many(
+            [node.uuid for node in nodes], 'configure_bios_settings',
+            http_method='POST').raise_for_errors()
 
         # NOTE(ifarkas): give the DRAC card some time to process the job
         time.sleep(self.sleep_time)
@@ -316,10 +427,10 @@ class ConfigureReadyState(IntrospectionParser, command.Command):
         for node in nodes:
             print("Configuring root RAID volume for node {0}"
                   .format(node.uuid))
-            self.bm_client.node.vendor_passthru(
-                node.uuid, 'create_raid_configuration',
-                {'create_root_volume': True, 'create_nonroot_volumes': False},
-                'POST')
+        self._bulk_client().vendor_passthru_many(
+            [node.uuid for node in nodes], 'create_raid_configuration',
+            {'create_root_volume': True, 'create_nonroot_volumes': False},
+            'POST').raise_for_errors()
 
         # NOTE(ifarkas): give the DRAC card some time to process the job
         time.sleep(self.sleep_time)
@@ -328,10 +439,10 @@ class ConfigureReadyState(IntrospectionParser, command.Command):
         for node in nodes:
             print("Configuring non-root RAID volume for node {0}"
                   .format(node.uuid))
-            self.bm_client.node.vendor_passthru(
-                node.uuid, 'create_raid_configuration',
-                {'create_root_volume': False, 'create_nonroot_volumes': True},
-                'POST')
+        self._bulk_client().vendor_passthru_many(
+            [node.uuid for node in nodes], 'create_raid_configuration',
+            {'create_root_volume': False, 'create_nonroot_volumes': True},
+            'POST').raise_for_errors()
 
         # NOTE(ifarkas): give the DRAC card some time to process the job
         time.sleep(self.sleep_time)
@@ -342,7 +453,8 @@ class ConfigureReadyState(IntrospectionParser, command.Command):
                   .format(node.uuid))
 
             for _ in range(self.loops):
-                resp = self.bm_client.node.vendor_passthru(
+                resp = self.retry_policy.call(
+                    self.bm_client.node.vendor_passthru,
                     node.uuid, 'list_unfinished_jobs', http_method='GET')
                 if not resp.unfinished_jobs:
                     break
@@ -359,13 +471,15 @@ class ConfigureReadyState(IntrospectionParser, command.Command):
         for node in nodes:
             print("Deleting RAID volumes on node {0}".format(node.uuid))
 
-            resp = self.bm_client.node.vendor_passthru(
+            resp = self.retry_policy.call(
+                self.bm_client.node.vendor_passthru,
                 node.uuid, 'list_virtual_disks', http_method='GET')
             virtual_disks = resp.virtual_disks
 
             changed_raid_controllers = set()
             for disk in virtual_disks:
-                self.bm_client.node.vendor_passthru(
+                self.retry_policy.call(
+                    self.bm_client.node.vendor_passthru,
                     node.uuid, 'delete_virtual_disk',
                     {'virtual_disk': disk['id']}, 'POST')
                 changed_raid_controllers.add(disk['controller'])
@@ -374,7 +488,8 @@ class ConfigureReadyState(IntrospectionParser, command.Command):
                 nodes_with_reboot_request.add(node)
 
             for controller in changed_raid_controllers:
-                self.bm_client.node.vendor_passthru(
+                self.retry_policy.call(
+                    self.bm_client.node.vendor_passthru,
                     node.uuid, 'apply_pending_raid_config',
                     {'raid_controller': controller}, 'POST')
 
@@ -387,9 +502,13 @@ class ConfigureReadyState(IntrospectionParser, command.Command):
         for node in nodes:
             print("Changing power state on "
                   "node {0} to {1}".format(node.uuid, target_power_state))
-            self.bm_client.node.set_power_state(node.uuid, target_power_state)
+        self._bulk_client().set_power_state_many(
+            [node.uuid for node in nodes],
+            target_power_state).raise_for_errors()
 
     def _run_introspection(self, nodes):
+        from ironic_discoverd import client as discoverd_client
+
         auth_token = self.app.client_manager.auth_ref.auth_token
         node_uuids = []
 
@@ -425,7 +544,8 @@ class ConfigureReadyState(IntrospectionParser, command.Command):
         self.bm_client = (
             self.app.client_manager.rdomanager_oscplugin.baremetal())
         self.discoverd_url = parsed_args.discoverd_url
-        drac_nodes = [node for node in self.bm_client.node.list(detail=True)
+        drac_nodes = [node for node in _select_nodes(self.bm_client,
+                                                     parsed_args, detail=True)
                       if 'drac' in node.driver]
 
         if parsed_args.delete_raid_volumes:
@@ -447,12 +567,13 @@ class ConfigureReadyState(IntrospectionParser, command.Command):
         self._change_power_state(drac_nodes, 'off')
 
 
-class ConfigureBaremetalBoot(command.Command):
+class ConfigureBaremetalBoot(NodeFilterParser, command.Command):
     """Configure baremetal boot for all nodes"""
 
     log = logging.getLogger(__name__ + ".ConfigureBaremetalBoot")
     loops = 12
     sleep_time = 10
+    retry_policy = baremetal_bulk.conflict_retry_policy()
 
     def take_action(self, parsed_args):
 
@@ -481,7 +602,8 @@ class ConfigureBaremetalBoot(command.Command):
         self.log.debug("Using kernel ID: {0} and ramdisk ID: {1}".format(
             kernel_id, ramdisk_id))
 
-        for node in bm_client.node.list(maintenance=False):
+        nodes = _select_nodes(bm_client, parsed_args, maintenance=False)
+        for node in nodes:
             # NOTE(bnemec): Ironic won't let us update the node while the
             # power_state is transitioning.
             if node.power_state is None:
@@ -500,8 +622,14 @@ class ConfigureBaremetalBoot(command.Command):
                            node.uuid)
                     raise exceptions.Timeout(msg)
 
-            # Get the full node info
-            node_detail = bm_client.node.get(node.uuid)
+        bulk_client = baremetal_bulk.BulkNodeClient(
+            bm_client, retry_policy=self.retry_policy)
+
+        # Get the full node info
+        details = bulk_client.get_many([node.uuid for node in nodes])
+
+        patches = collections.OrderedDict()
+        for uuid, node_detail in six.iteritems(details.results):
             capabilities = node_detail.properties.get('capabilities', None)
 
             # Only update capabilities to add boot_option if it doesn't exist.
@@ -511,10 +639,9 @@ class ConfigureBaremetalBoot(command.Command):
             else:
                 capabilities = "boot_option:local"
 
-            self.log.debug("Configuring boot for Node {0}".format(
-                node.uuid))
+            self.log.debug("Configuring boot for Node {0}".format(uuid))
 
-            bm_client.node.update(node.uuid, [
+            patches[uuid] = [
                 {
                     'op': 'add',
                     'path': '/properties/capabilities',
@@ -530,7 +657,11 @@ class ConfigureBaremetalBoot(command.Command):
                     'path': '/driver_info/deploy_kernel',
                     'value': kernel_id,
                 },
-            ])
+            ]
+
+        updates = bulk_client.update_many(patches)
+        details.raise_for_errors()
+        updates.raise_for_errors()
 
 
 class ShowNodeCapabilities(lister.Lister):
@@ -540,9 +671,11 @@ class ShowNodeCapabilities(lister.Lister):
 
     def take_action(self, parsed_args):
         bm_client = self.app.client_manager.rdomanager_oscplugin.baremetal()
+        details = baremetal_bulk.BulkNodeClient(bm_client).get_many(
+            [node.uuid for node in bm_client.node.list()])
+        details.raise_for_errors()
         rows = []
-        for node in bm_client.node.list():
-            node_detail = bm_client.node.get(node.uuid)
+        for uuid, node_detail in six.iteritems(details.results):
             capabilities = node_detail.properties.get('capabilities')
-            rows.append((node.uuid, capabilities))
+            rows.append((uuid, capabilities))
         return (("Node UUID", "Node Capabilities"), rows, )
@@ -25,18 +25,18 @@ import tempfile
 import uuid
 
 from cliff import command
-from heatclient.common import template_utils
-from heatclient.exc import HTTPNotFound
 from openstackclient.common import exceptions as oscexc
 from openstackclient.common import utils as osc_utils
 from openstackclient.i18n import _
-from os_cloud_config import keystone
-from os_cloud_config import keystone_pki
-from os_cloud_config.utils import clients
 from six.moves import configparser
-from tuskarclient.common import utils as tuskarutils
 
 from rdomanager_oscplugin import exceptions
+from rdomanager_oscplugin import heat_payload
+from rdomanager_oscplugin import keystone_endpoints
+from rdomanager_oscplugin import overcloud_secrets
+from rdomanager_oscplugin import profiling
+from rdomanager_oscplugin import stack_diff
+from rdomanager_oscplugin import template_cache
 from rdomanager_oscplugin import utils
 
 TRIPLEO_HEAT_TEMPLATES = "/usr/share/openstack-tripleo-heat-templates/"
@@ -100,6 +100,16 @@ class DeployOvercloud(command.Command):
     log = logging.getLogger(__name__ + ".DeployOvercloud")
     predeploy_errors = 0
     predeploy_warnings = 0
+    use_template_cache = False
+    heat_payload_file = None
+    prune_unused_files = False
+    force_stack_update = False
+
+    def __init__(self, *args, **kwargs):
+        super(DeployOvercloud, self).__init__(*args, **kwargs)
+        # Stateful, so they belong to a single command run.
+        self.profiler = profiling.NullProfiler()
+        self.secrets = overcloud_secrets.SecretsStage()
 
     def set_overcloud_passwords(self, parameters, parsed_args):
         """Add passwords to the parameters dictionary
@@ -111,7 +121,7 @@ class DeployOvercloud(command.Command):
         undercloud_ceilometer_snmpd_password = utils.get_config_value(
             "auth", "undercloud_ceilometer_snmpd_password")
 
-        self.passwords = passwords = utils.generate_overcloud_passwords()
+        self.passwords = passwords = self.secrets.passwords()
         ceilometer_pass = passwords['OVERCLOUD_CEILOMETER_PASSWORD']
         ceilometer_secret = passwords['OVERCLOUD_CEILOMETER_SECRET']
         if parsed_args.templates:
@@ -178,11 +188,13 @@ class DeployOvercloud(command.Command):
     def _get_stack(self, orchestration_client, stack_name):
         """Get the ID for the current deployed overcloud stack if it exists."""
 
+        from heatclient import exc as heat_exc
+
         try:
             stack = orchestration_client.stacks.get(stack_name)
             self.log.info("Stack found, will be doing a stack update")
             return stack
-        except HTTPNotFound:
+        except heat_exc.HTTPNotFound:
             self.log.info("No stack found, will be doing a stack create")
 
     def _update_paramaters(self, args, network_client, stack):
@@ -398,9 +410,23 @@ class DeployOvercloud(command.Command):
             temp_file.write(user_env)
         return [registry, environment, user_env_file]
 
-    def _heat_deploy(self, stack, stack_name, template_path, parameters,
-                     environments, timeout):
-        """Verify the Baremetal nodes are available and do a stack update"""
+    def _process_templates(self, template_path, environments):
+        """Return the template, environment and files map for a deploy
+
+        When the template cache is enabled, a bundle processed by a previous
+        deploy is reused as long as none of the local files it was built from
+        have changed.
+        """
+
+        from heatclient.common import template_utils
+
+        bundle_cache = None
+        if self.use_template_cache:
+            bundle_cache = template_cache.BundleCache()
+            bundle = bundle_cache.load(template_path, environments)
+            if bundle is not None:
+                self.log.debug("Using cached template bundle")
+                return bundle
 
         self.log.debug("Processing environment files")
         env_files, env = (
@@ -411,16 +437,36 @@ class DeployOvercloud(command.Command):
         template_files, template = template_utils.get_template_contents(
             template_path)
 
-        files = dict(list(template_files.items()) + list(env_files.items()))
+        files = dict(template_files)
+        files.update(env_files)
+
+        if bundle_cache is not None:
+            bundle_cache.store(template_path, environments, template, env,
+                               files)
+
+        return template, env, files
+
+    def _heat_deploy(self, stack, stack_name, template_path, parameters,
+                     environments, timeout):
+        """Verify the Baremetal nodes are available and do a stack update"""
+
+        with self.profiler.span('process_templates'):
+            template, env, files = self._process_templates(
+                template_path, environments)
+
+        if self.prune_unused_files or self.log.isEnabledFor(logging.DEBUG):
+            analysis = heat_payload.analyze(template, env, files)
+            heat_payload.log_analysis(self.log, analysis)
+            if self.prune_unused_files and analysis['unreachable']:
+                self.log.info("Removing %d unused files (%d bytes) from the "
+                              "Heat payload", len(analysis['unreachable']),
+                              analysis['unreachable_bytes'])
+                files = heat_payload.prune(files, analysis['unreachable'])
 
         clients = self.app.client_manager
         orchestration_client = clients.rdomanager_oscplugin.orchestration()
 
         self.log.debug("Deploying stack: %s", stack_name)
-        self.log.debug("Deploying template: %s", template)
-        self.log.debug("Deploying parameters: %s", parameters)
-        self.log.debug("Deploying environment: %s", env)
-        self.log.debug("Deploying files: %s", files)
 
         stack_args = {
             'stack_name': stack_name,
@@ -433,23 +479,56 @@ class DeployOvercloud(command.Command):
         if timeout:
             stack_args['timeout_mins'] = timeout
 
+        # The payload can be many MB and contains the overcloud passwords,
+        # so only a summary is logged. The full payload is only written out
+        # when explicitly requested.
+        if self.log.isEnabledFor(logging.DEBUG):
+            heat_payload.log_summary(self.log,
+                                     heat_payload.summarize(stack_args))
+        if self.heat_payload_file:
+            self.log.debug("Writing Heat payload to %s",
+                           self.heat_payload_file)
+            heat_payload.dump(self.heat_payload_file, stack_args)
+
+        fingerprint_store = stack_diff.FingerprintStore()
+
         if stack is None:
             self.log.info("Performing Heat stack create")
-            orchestration_client.stacks.create(**stack_args)
+            with self.profiler.span('stack_create'):
+                orchestration_client.stacks.create(**stack_args)
         else:
+            if not self.force_stack_update:
+                changes = stack_diff.changes(
+                    stack, fingerprint_store.load(stack_name), stack_args)
+                if not changes:
+                    print("Stack {0} is unchanged since the last deploy, "
+                          "skipping the stack update".format(stack_name))
+                    return
+                print("Updating stack {0}:".format(stack_name))
+                for change in changes:
+                    print("  {0}".format(change))
+
             self.log.info("Performing Heat stack update")
             # Make sure existing parameters for stack are reused
             stack_args['existing'] = 'true'
-            orchestration_client.stacks.update(stack.id, **stack_args)
+            with self.profiler.span('stack_update'):
+                orchestration_client.stacks.update(stack.id, **stack_args)
 
-        create_result = utils.wait_for_stack_ready(
-            orchestration_client, stack_name)
+        with self.profiler.span('stack_wait'):
+            create_result = utils.wait_for_stack_ready(
+                orchestration_client, stack_name)
         if not create_result:
             if stack is None:
                 raise Exception("Heat Stack create failed.")
             else:
                 raise Exception("Heat Stack update failed.")
 
+        # Fetched again for the updated_time of the deployed stack.
+        stack = orchestration_client.stacks.get(stack_name)
+        stack_args.pop('existing', None)
+        fingerprint_store.save(stack_name, stack_diff.fingerprint(
+            stack.id, stack_args, getattr(stack, 'updated_time', None)))
+
     def _get_overcloud_endpoint(self, stack):
         for output in stack.to_dict().get('outputs', {}):
             if output['output_key'] == 'KeystoneURL':
@@ -477,8 +556,9 @@ class DeployOvercloud(command.Command):
         clients = self.app.client_manager
         network_client = clients.network
 
-        parameters = self._update_paramaters(
-            parsed_args, network_client, stack)
+        with self.profiler.span('parameters'):
+            parameters = self._update_paramaters(
+                parsed_args, network_client, stack)
 
         utils.check_nodes_count(
             self.app.client_manager.rdomanager_oscplugin.baremetal(),
@@ -498,13 +578,15 @@ class DeployOvercloud(command.Command):
         print("Deploying templates in the directory {0}".format(
             os.path.abspath(tht_root)))
 
+        if stack is None:
+            pki = self.secrets.keystone_pki()
+            parameters['KeystoneCACertificate'] = pki['ca_cert']
+            parameters['KeystoneSigningCertificate'] = pki['signing_cert']
+            parameters['KeystoneSigningKey'] = pki['signing_key']
+
         self.log.debug("Creating Environment file")
         env_path = utils.create_environment_file()
 
-        if stack is None:
-            self.log.debug("Creating Keystone certificates")
-            keystone_pki.generate_certs_into_json(env_path, False)
-
         resource_registry_path = os.path.join(tht_root, RESOURCE_REGISTRY_NAME)
 
         environments = [resource_registry_path, env_path]
@@ -520,6 +602,7 @@ class DeployOvercloud(command.Command):
                           environments, parsed_args.timeout)
 
     def _deploy_tuskar(self, stack, parsed_args):
+        from tuskarclient.common import utils as tuskarutils
 
         clients = self.app.client_manager
         management = clients.rdomanager_oscplugin.management()
@@ -543,8 +626,9 @@ class DeployOvercloud(command.Command):
         # retrieve templates
         templates = management.plans.templates(management_plan.uuid)
 
-        parameters = self._update_paramaters(
-            parsed_args, network_client, stack)
+        with self.profiler.span('parameters'):
+            parameters = self._update_paramaters(
+                parsed_args, network_client, stack)
 
         utils.check_nodes_count(
             self.app.client_manager.rdomanager_oscplugin.baremetal(),
@@ -560,13 +644,12 @@ class DeployOvercloud(command.Command):
         )
 
         if stack is None:
-            ca_key_pem, ca_cert_pem = keystone_pki.create_ca_pair()
-            signing_key_pem, signing_cert_pem = (
-                keystone_pki.create_signing_pair(ca_key_pem, ca_cert_pem))
-            parameters['Controller-1::KeystoneCACertificate'] = ca_cert_pem
+            pki = self.secrets.keystone_pki()
+            parameters['Controller-1::KeystoneCACertificate'] = pki['ca_cert']
             parameters['Controller-1::KeystoneSigningCertificate'] = (
-                signing_cert_pem)
-            parameters['Controller-1::KeystoneSigningKey'] = signing_key_pem
+                pki['signing_cert'])
+            parameters['Controller-1::KeystoneSigningKey'] = (
+                pki['signing_key'])
 
         # Save the parameters to Tuskar so they can be used when redeploying.
         # Tuskar expects to get all values as strings. So we convert them all
@@ -673,6 +756,9 @@ class DeployOvercloud(command.Command):
     def _deploy_postconfig(self, stack, parsed_args):
         self.log.debug("_deploy_postconfig(%s)" % parsed_args)
 
+        from os_cloud_config import keystone
+        from os_cloud_config.utils import clients
+
         passwords = self.passwords
 
         overcloud_endpoint = self._get_overcloud_endpoint(stack)
@@ -685,19 +771,22 @@ class DeployOvercloud(command.Command):
 
         service_ips = self._get_service_ips(stack)
 
-        utils.remove_known_hosts(overcloud_ip)
+        vips = [ip for name, ip in service_ips.items()
+                if name.endswith('Vip') and ip]
+        utils.remove_known_hosts(overcloud_ip, *sorted(set(vips)))
 
         keystone_ip = service_ips.get('KeystoneAdminVip')
         if not keystone_ip:
             keystone_ip = overcloud_ip
 
-        keystone.initialize(
-            keystone_ip,
-            passwords['OVERCLOUD_ADMIN_TOKEN'],
-            'admin@example.com',
-            passwords['OVERCLOUD_ADMIN_PASSWORD'],
-            public=overcloud_ip,
-            user='heat-admin')
+        with self.profiler.span('keystone.initialize', 'keystone'):
+            keystone.initialize(
+                keystone_ip,
+                passwords['OVERCLOUD_ADMIN_TOKEN'],
+                'admin@example.com',
+                passwords['OVERCLOUD_ADMIN_PASSWORD'],
+                public=overcloud_ip,
+                user='heat-admin')
 
         # NOTE(bcrochet): Bad hack. Remove the ssl_port info from the
         # os_cloud_config.SERVICES dictionary
@@ -724,18 +813,20 @@ class DeployOvercloud(command.Command):
             passwords['OVERCLOUD_ADMIN_PASSWORD'],
             'admin',
             overcloud_endpoint)
-        keystone.setup_endpoints(
-            services,
-            client=keystone_client,
-            os_auth_url=overcloud_endpoint,
-            public_host=overcloud_ip)
+        with self.profiler.span('keystone.setup_endpoints', 'keystone'):
+            keystone_endpoints.setup_endpoints(
+                keystone_client,
+                services,
+                public_host=overcloud_ip,
+                internal_host=overcloud_ip)
 
         compute_client = clients.get_nova_bm_client(
             'admin',
             passwords['OVERCLOUD_ADMIN_PASSWORD'],
             'admin',
             overcloud_endpoint)
-        compute_client.flavors.create('m1.demo', 512, 1, 10, 'auto')
+        with self.profiler.span('flavors.create', 'nova'):
+            compute_client.flavors.create('m1.demo', 512, 1, 10, 'auto')
 
     def _validate_args(self, parsed_args):
         network_type = parsed_args.neutron_network_type
@@ -1101,6 +1192,49 @@ class DeployOvercloud(command.Command):
                    'or heat stack-update command. (Can be specified more than '
                    'once.)')
         )
+        parser.add_argument(
+            '--no-template-cache',
+            action='store_true',
+            default=False,
+            help=_('Always process the Heat templates and environment files '
+                   'instead of reusing a cached copy from a previous deploy '
+                   'when none of them have changed.')
+        )
+        parser.add_argument(
+            '--dump-heat-payload', metavar='<FILE>',
+            help=_('Write the full Heat stack create or update request, '
+                   'including passwords, to this file. The file is only '
+                   'readable by the current user.')
+        )
+        parser.add_argument(
+            '--prune-unused-files',
+            action='store_true',
+            default=False,
+            help=_('Do not send files that are not referenced by the '
+                   'template, the resource registry or a nested template to '
+                   'Heat.')
+        )
+        parser.add_argument(
+            '--force-stack-update',
+            action='store_true',
+            default=False,
+            help=_('Update an existing stack even if the parameters, '
+                   'environment and templates are unchanged since the last '
+                   'deploy.')
+        )
+        parser.add_argument(
+            '--profile-output', metavar='<FILE>',
+            help=_('Write the time spent in each deploy phase and in the '
+                   'calls to each remote API to this file.')
+        )
+        parser.add_argument(
+            '--profile-format',
+            choices=profiling.PROFILE_FORMATS,
+            default='json',
+            help=_('Format of the --profile-output file, either a JSON '
+                   'summary or a Chrome trace (chrome://tracing). '
+                   '(default: json)')
+        )
         parser.add_argument(
             '--validation-errors-fatal',
             action='store_true',
@@ -1155,9 +1289,42 @@ class DeployOvercloud(command.Command):
     def take_action(self, parsed_args):
         self.log.debug("take_action(%s)" % parsed_args)
 
+        if not parsed_args.profile_output:
+            return self._deploy(parsed_args)
+
+        self.profiler = profiling.Profiler()
+        client_manager = self.app.client_manager
+        self.app.client_manager = self.profiler.instrument(client_manager)
+        try:
+            with self.profiler.span('deploy'):
+                return self._deploy(parsed_args)
+        finally:
+            self.app.client_manager = client_manager
+            self.profiler.write(parsed_args.profile_output,
+                                parsed_args.profile_format)
+            print("Deploy profile written to {0}".format(
+                parsed_args.profile_output))
+
+    def _deploy(self, parsed_args):
         self._validate_args(parsed_args)
+        self.use_template_cache = not parsed_args.no_template_cache
+        self.heat_payload_file = parsed_args.dump_heat_payload
+        self.prune_unused_files = parsed_args.prune_unused_files
+        self.force_stack_update = parsed_args.force_stack_update
+
+        clients = self.app.client_manager
+        orchestration_client = clients.rdomanager_oscplugin.orchestration()
+
+        stack = self._get_stack(orchestration_client, parsed_args.stack)
+        stack_create = stack is None
 
-        errors, warnings = self._predeploy_verify_capabilities(parsed_args)
+        # Generating the passwords and the Keystone RSA keys of a new stack
+        # takes a while, do it while the deployment is validated.
+        self.secrets.start(keystone_pki=stack_create)
+
+        with self.profiler.span('validation'):
+            errors, warnings = self._predeploy_verify_capabilities(
+                parsed_args)
         if errors > 0:
             self.log.error(
                 "Configuration has %d errors, fix them before proceeding. "
@@ -1176,14 +1343,9 @@ class DeployOvercloud(command.Command):
             self.log.info("SUCCESS: No warnings or errors in deploy "
                           "configuration, proceeding.")
 
-        clients = self.app.client_manager
-        orchestration_client = clients.rdomanager_oscplugin.orchestration()
-
-        stack = self._get_stack(orchestration_client, parsed_args.stack)
-        stack_create = stack is None
-
         try:
-            self._pre_heat_deploy()
+            with self.profiler.span('pre_heat_deploy'):
+                self._pre_heat_deploy()
 
             if parsed_args.rhel_reg:
                 if parsed_args.reg_method == 'satellite':
@@ -1213,11 +1375,14 @@ class DeployOvercloud(command.Command):
             # a create then the previous stack object would be None.
             stack = self._get_stack(orchestration_client, parsed_args.stack)
 
-            self._create_overcloudrc(stack, parsed_args)
-            self._create_tempest_deployer_input()
+            with self.profiler.span('overcloudrc'):
+                self._create_overcloudrc(stack, parsed_args)
+            with self.profiler.span('tempest_config'):
+                self._create_tempest_deployer_input()
 
             if stack_create:
-                self._deploy_postconfig(stack, parsed_args)
+                with self.profiler.span('postconfig'):
+                    self._deploy_postconfig(stack, parsed_args)
 
             overcloud_endpoint = self._get_overcloud_endpoint(stack)
             print("Overcloud Endpoint: {0}".format(overcloud_endpoint))
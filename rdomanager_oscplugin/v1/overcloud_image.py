@@ -18,7 +18,6 @@ from __future__ import print_function
 import logging
 import os
 import re
-import requests
 import shutil
 import stat
 import subprocess
@@ -27,7 +26,6 @@ import sys
 from cliff import command
 from openstackclient.common import exceptions
 from openstackclient.common import utils
-from prettytable import PrettyTable
 from rdomanager_oscplugin import utils as plugin_utils
 
 
@@ -390,6 +388,8 @@ class BuildOvercloudImage(command.Command):
                     image_name)
             else:
                 # Download the image
+                import requests
+
                 r = requests.get(
                     'http://cloud.fedoraproject.org/fedora-21.x86_64.qcow2')
                 with open(image_name, 'wb') as f:
@@ -514,6 +514,8 @@ class UploadOvercloudImage(command.Command):
             self._copy_file(src_file, dest_file)
 
     def _print_image_info(self, image):
+        from prettytable import PrettyTable
+
         table = PrettyTable(['ID', 'Name', 'Disk Format', 'Size', 'Status'])
         table.add_row([image.id, image.name, image.disk_format, image.size,
                        image.status])
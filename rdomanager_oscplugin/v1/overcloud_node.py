@@ -17,7 +17,6 @@ import logging
 
 from cliff import command
 from openstackclient.common import utils
-from tripleo_common import scale
 
 TRIPLEO_HEAT_TEMPLATES = "/usr/share/openstack-tripleo-heat-templates/"
 
@@ -54,6 +53,8 @@ class DeleteNode(command.Command):
         return parser
 
     def take_action(self, parsed_args):
+        from tripleo_common import scale
+
         self.log.debug("take_action(%s)" % parsed_args)
         osc_plugin = self.app.client_manager.rdomanager_oscplugin
         if parsed_args.templates:
@@ -0,0 +1,583 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Validation of network environments and instackenv files
+
+The validators are generators of Finding tuples, so they can be used
+without the CLI, e.g. to validate many files in one process::
+
+    from rdomanager_oscplugin import validation
+
+    results = validation.validate_files(paths, validation.validate_netenv)
+    validation.write_junit(results, sys.stdout)
+"""
+
+import collections
+import glob
+import json
+import logging
+import os
+from xml.etree import ElementTree
+
+import six
+
+from rdomanager_oscplugin import ip_ranges
+from rdomanager_oscplugin import utils
+from rdomanager_oscplugin import yaml_cache
+
+ERROR = 'error'
+WARNING = 'warning'
+
+FORMATS = ('text', 'json', 'junit')
+
+# The files validated concurrently by validate_files
+DEFAULT_WORKERS = 4
+
+LOG = logging.getLogger(__name__)
+
+Finding = collections.namedtuple(
+    'Finding', ['rule', 'severity', 'file', 'path', 'message'])
+
+
+def error(rule, message, file=None, path=None):
+    return Finding(rule, ERROR, file, path, message)
+
+
+def warning(rule, message, file=None, path=None):
+    return Finding(rule, WARNING, file, path, message)
+
+
+def _param_path(name):
+    return None if name is None else '$.parameter_defaults.%s' % name
+
+
+def check_cidr_overlap(networks, file=None):
+    """Check the network CIDRs are valid and don't overlap
+
+    :param networks: The CIDRs, by parameter name when known
+    :type  networks: dict or [string]
+    """
+
+    if isinstance(networks, dict):
+        items = sorted(six.iteritems(networks))
+    else:
+        items = [(None, network) for network in networks]
+
+    ranges = []
+    for name, cidr in items:
+        try:
+            ranges.append(ip_ranges.network_range(cidr, label=(name, cidr)))
+        except ValueError:
+            yield error('netenv.cidr.invalid',
+                        'Invalid address: %s' % cidr, file, _param_path(name))
+
+    for net1, net2 in ip_ranges.find_overlaps(ranges):
+        yield error('netenv.cidr.overlap',
+                    'Overlapping networks detected {} {}'.format(
+                        net1.label[1], net2.label[1]),
+                    file, _param_path(net2.label[0]))
+
+
+def check_allocation_pools_pairing(filedata, pools, file=None):
+    """Check the allocation pools are valid and inside their subnet
+
+    :param filedata: The parameter defaults of the environment
+    :type  filedata: dict
+
+    :param pools: The names of the allocation pool parameters
+    :type  pools: iterable
+    """
+
+    for poolitem in pools:
+        pooldata = filedata[poolitem]
+
+        LOG.info('Checking allocation pool {}'.format(poolitem))
+
+        pool_ranges = []
+        for index, allocation_pool in enumerate(pooldata):
+            path = '%s[%d]' % (_param_path(poolitem), index)
+            valid = True
+            start, end = allocation_pool['start'], allocation_pool['end']
+            for key, address in (('start', start), ('end', end)):
+                try:
+                    ip_ranges.address_value(address)
+                except ValueError:
+                    yield error('netenv.pool.invalid-address',
+                                'Invalid address: %s' % address, file,
+                                '%s.%s' % (path, key))
+                    valid = False
+            if not valid:
+                continue
+            try:
+                pool_ranges.append(ip_ranges.address_range(start, end))
+            except ValueError:
+                yield error('netenv.pool.invalid-range',
+                            'Invalid address pool: %s, %s' % (start, end),
+                            file, path)
+
+        subnet_item = poolitem.split('AllocationPools')[0] + 'NetCidr'
+        try:
+            subnet = ip_ranges.network_range(filedata[subnet_item])
+        except ValueError:
+            yield error('netenv.subnet.invalid',
+                        'Invalid address: %s' % subnet_item, file,
+                        _param_path(subnet_item))
+            continue
+
+        for pool_range in pool_ranges:
+            if (pool_range.version != subnet.version or
+                    pool_range.start < subnet.start or
+                    pool_range.end > subnet.end):
+                yield error('netenv.pool.outside-subnet',
+                            'Allocation pool {} {} outside of subnet {}: {}'
+                            .format(poolitem, pooldata, subnet_item,
+                                    subnet.label),
+                            file, _param_path(poolitem))
+                break
+
+
+def check_vlan_ids(vlans, file=None):
+    """Check no VLAN ID is used by two networks
+
+    :param vlans: The VLAN IDs by parameter name
+    :type  vlans: dict
+    """
+
+    invertdict = {}
+    for k, v in sorted(six.iteritems(vlans)):
+        LOG.info('Checking Vlan ID {}'.format(k))
+        if v not in invertdict:
+            invertdict[v] = k
+        else:
+            yield error('netenv.vlan.duplicate',
+                        'Vlan ID {} ({}) already exists in {}'.format(
+                            v, k, invertdict[v]),
+                        file, _param_path(k))
+
+
+def check_nic_config(resource, path, documents=None):
+    """Check the bridges of a NIC config template
+
+    Every bridge may have a single bond, or a single interface if it has no
+    bond.
+
+    :param resource: The resource registry entry of the template
+    :type  resource: string
+
+    :param path: The path of the template
+    :type  path: string
+
+    :param documents: The cache of parsed YAML files
+    :type  documents: rdomanager_oscplugin.yaml_cache.YamlCache
+    """
+
+    documents = documents or yaml_cache.YamlCache()
+    try:
+        nic_data = documents.load(path)
+    except (IOError, OSError):
+        yield error('netenv.nic.missing-file',
+                    'The resource "%s" reference file does not exist: "%s"' %
+                    (resource, path), path)
+        return
+
+    for item in nic_data['resources']:
+        bridges = nic_data['resources'][item]['properties']['config'][
+            'os_net_config']['network_config']
+        bridges_path = ('$.resources.%s.properties.config.os_net_config.'
+                        'network_config' % item)
+        for index, bridge in enumerate(bridges):
+            if bridge['type'] != 'ovs_bridge':
+                continue
+
+            bond_count = 0
+            interface_count = 0
+            for bond in bridge['members']:
+                if bond['type'] == 'ovs_bond':
+                    bond_count += 1
+                if bond['type'] == 'interface':
+                    interface_count += 1
+
+            bridge_path = '%s[%d]' % (bridges_path, index)
+            LOG.debug('There are %d bonds for bridge %s of resource %s in %s',
+                      bond_count, bridge['name'], item, path)
+            if bond_count == 2:
+                yield error('netenv.nic.bonds',
+                            'Invalid bonding: There are 2 bonds for bridge '
+                            '%s of resource %s in %s' %
+                            (bridge['name'], item, path),
+                            path, bridge_path)
+            if bond_count == 0 and interface_count > 1:
+                yield error('netenv.nic.interfaces',
+                            'Invalid interface: When not using a bond, there '
+                            'can only be 1 interface for bridge %s of '
+                            'resource %s in %s' %
+                            (bridge['name'], item, path),
+                            path, bridge_path)
+
+
+def validate_netenv(path, documents=None):
+    """Validate a network environment and the NIC templates it refers to
+
+    :param path: The path of the network environment
+    :type  path: string
+
+    :param documents: The cache of parsed YAML files, shared between the
+                      validations of many environments
+    :type  documents: rdomanager_oscplugin.yaml_cache.YamlCache
+    """
+
+    documents = documents or yaml_cache.YamlCache()
+    network_data = documents.load(path)
+
+    nic_configs = []
+    for item in network_data['resource_registry']:
+        if item.endswith("Net::SoftwareConfig"):
+            data = network_data['resource_registry'][item]
+            data_path = os.path.join(os.path.dirname(path), data)
+            nic_configs.append((item, data, data_path))
+
+    # Parse the NIC templates concurrently, then validate them in order
+    # from the cache.
+    documents.preload(nic_path for _, _, nic_path in nic_configs)
+    for item, data, data_path in nic_configs:
+        LOG.info('Validating %s', data)
+        for finding in check_nic_config(item, data_path, documents):
+            yield finding
+
+    cidrinfo = {}
+    poolsinfo = {}
+    vlaninfo = {}
+    for item, data in six.iteritems(network_data['parameter_defaults']):
+        if item.endswith('NetCidr'):
+            cidrinfo[item] = data
+        elif item.endswith('AllocationPools'):
+            poolsinfo[item] = data
+        elif item.endswith('NetworkVlanID'):
+            vlaninfo[item] = data
+
+    for finding in check_cidr_overlap(cidrinfo, path):
+        yield finding
+    for finding in check_allocation_pools_pairing(
+            network_data['parameter_defaults'], sorted(poolsinfo), path):
+        yield finding
+    for finding in check_vlan_ids(vlaninfo, path):
+        yield finding
+
+
+def _check_field(node, field, name, path, file):
+    try:
+        if len(node[field]) == 0:
+            yield error('instackenv.%s.empty' % field,
+                        '%s 0 length.' % name, file,
+                        '%s.%s' % (path, field))
+    except Exception as e:
+        yield error('instackenv.%s.missing' % field,
+                    '%s does not exist: %s' % (name, e), file,
+                    '%s.%s' % (path, field))
+
+
+def validate_instackenv(path, check_ipmi=True):
+    """Validate the nodes of an instackenv.json file
+
+    :param path: The path of the instackenv.json file
+    :type  path: string
+
+    :param check_ipmi: Whether to check the IPMI credentials of the
+                       baremetal nodes with ipmitool
+    :type  check_ipmi: bool
+    """
+
+    with open(path, 'r') as net_file:
+        env_data = json.load(net_file)
+
+    maclist = []
+    baremetal_ips = []
+    for index, node in enumerate(env_data['nodes']):
+        node_path = '$.nodes[%d]' % index
+        LOG.info("Checking node %s" % node.get('pm_addr'))
+
+        for field, name in (('pm_password', 'Password'),
+                            ('pm_user', 'User'),
+                            ('mac', 'MAC address')):
+            for finding in _check_field(node, field, name, node_path, path):
+                yield finding
+        maclist.extend(node.get('mac') or [])
+
+        if node.get('pm_type') == "pxe_ssh":
+            LOG.debug("Identified virtual node")
+
+        if node.get('pm_type') == "pxe_ipmitool":
+            LOG.debug("Identified baremetal node")
+
+            if check_ipmi:
+                cmd = ('ipmitool -R 1 -I lanplus -H %s -U %s -P %s chassis '
+                       'status' % (node['pm_addr'], node['pm_user'],
+                                   node['pm_password']))
+                LOG.debug("Executing: %s", cmd)
+                status = utils.run_shell(cmd)
+                if status != 0:
+                    yield error('instackenv.ipmi.failed', 'ipmitool failed',
+                                path, node_path)
+            baremetal_ips.append(node['pm_addr'])
+
+    if not utils.all_unique(baremetal_ips):
+        yield error('instackenv.pm_addr.duplicate',
+                    'Baremetals IPs are not all unique.', path, '$.nodes')
+    else:
+        LOG.debug('Baremetal IPs are all unique.')
+
+    if not utils.all_unique(maclist):
+        yield error('instackenv.mac.duplicate',
+                    'MAC addresses are not all unique.', path, '$.nodes')
+    else:
+        LOG.debug('MAC addresses are all unique.')
+
+
+class ConflictIndex(object):
+    """Find conflicts between network environments and instackenv files
+
+    The VLAN IDs, MAC addresses and BMC addresses of every file are indexed
+    in dicts, and the allocation pools in a RangeIndex, so checking a whole
+    fleet takes about linear time. Duplicates inside a single file are left
+    to the per file validators, only the ones spanning files are reported.
+
+    :param documents: The cache of parsed YAML files
+    :type  documents: rdomanager_oscplugin.yaml_cache.YamlCache
+    """
+
+    def __init__(self, documents=None):
+        self.documents = documents or yaml_cache.YamlCache()
+        self._vlans = collections.defaultdict(list)
+        self._macs = collections.defaultdict(list)
+        self._bmc_addresses = collections.defaultdict(list)
+        self._pools = []
+
+    def add_netenv(self, path):
+        parameters = self.documents.load(path).get('parameter_defaults') or {}
+        for name, value in sorted(six.iteritems(parameters)):
+            if name.endswith('NetworkVlanID'):
+                self._vlans[value].append((path, _param_path(name)))
+            elif name.endswith('AllocationPools'):
+                for index, allocation_pool in enumerate(value or []):
+                    try:
+                        self._pools.append(ip_ranges.address_range(
+                            allocation_pool['start'], allocation_pool['end'],
+                            label=(path, name)))
+                    except (KeyError, TypeError, ValueError):
+                        # Reported by check_allocation_pools_pairing
+                        continue
+
+    def add_instackenv(self, path):
+        with open(path, 'r') as f:
+            env_data = json.load(f)
+
+        for index, node in enumerate(env_data.get('nodes') or []):
+            node_path = '$.nodes[%d]' % index
+            for mac_index, mac in enumerate(node.get('mac') or []):
+                self._macs[mac.lower()].append(
+                    (path, '%s.mac[%d]' % (node_path, mac_index)))
+            if node.get('pm_addr'):
+                self._bmc_addresses[node['pm_addr']].append(
+                    (path, '%s.pm_addr' % node_path))
+
+    @staticmethod
+    def _spanning_files(index):
+        """Yield the uses after the first of values used by several files"""
+
+        for value, uses in sorted(six.iteritems(index),
+                                  key=lambda item: str(item[0])):
+            first_file, first_path = uses[0]
+            if all(use_file == first_file for use_file, _ in uses):
+                continue
+            for use_file, use_path in uses[1:]:
+                yield value, first_file, first_path, use_file, use_path
+
+    def findings(self):
+        for vlan, first_file, first_path, use_file, use_path in (
+                self._spanning_files(self._vlans)):
+            yield warning('index.vlan.reused',
+                          'Vlan ID {} is also used by {} in {}'.format(
+                              vlan, first_path, first_file),
+                          use_file, use_path)
+
+        for mac, first_file, first_path, use_file, use_path in (
+                self._spanning_files(self._macs)):
+            yield error('index.mac.duplicate',
+                        'MAC address {} is also used by {} in {}'.format(
+                            mac, first_path, first_file),
+                        use_file, use_path)
+
+        for address, first_file, first_path, use_file, use_path in (
+                self._spanning_files(self._bmc_addresses)):
+            yield error('index.pm_addr.duplicate',
+                        'BMC address {} is also used by {} in {}'.format(
+                            address, first_path, first_file),
+                        use_file, use_path)
+
+        pools = ip_ranges.RangeIndex(self._pools)
+        for address, uses in sorted(six.iteritems(self._bmc_addresses)):
+            try:
+                version, value = ip_ranges.address_value(address)
+            except ValueError:
+                # A host name
+                continue
+            for pool_range in pools.containing(version, value):
+                pool_file, pool_name = pool_range.label
+                for use_file, use_path in uses:
+                    yield error('index.bmc.in-pool',
+                                'BMC address {} is inside the allocation '
+                                'pool {} of {}'.format(address, pool_name,
+                                                       pool_file),
+                                use_file, use_path)
+
+
+def find_conflicts(netenvs=(), instackenvs=(), documents=None):
+    """Return the conflicts between many netenv and instackenv files
+
+    Files which can't be read are skipped, the per file validators report
+    them.
+
+    :param netenvs: The paths of the network environments
+    :type  netenvs: [string]
+
+    :param instackenvs: The paths of the instackenv.json files
+    :type  instackenvs: [string]
+
+    :param documents: The cache of parsed YAML files
+    :type  documents: rdomanager_oscplugin.yaml_cache.YamlCache
+    """
+
+    index = ConflictIndex(documents)
+    for add, paths in ((index.add_netenv, netenvs),
+                       (index.add_instackenv, instackenvs)):
+        for path in paths:
+            try:
+                add(path)
+            except Exception as e:
+                LOG.debug("Not indexing %s: %s", path, e)
+    return list(index.findings())
+
+
+def expand_paths(patterns):
+    """Expand glob patterns into file paths, in order and without duplicates
+
+    A pattern matching no file is kept as is, so it is reported when it is
+    validated.
+    """
+
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def _validate_file(args):
+    path, validator, kwargs = args
+    try:
+        return list(validator(path, **kwargs))
+    except Exception as e:
+        return [error('file.unreadable',
+                      'Failed to validate %s: %s' % (path, e), path)]
+
+
+def validate_files(paths, validator, workers=DEFAULT_WORKERS, **kwargs):
+    """Run a validator on many files, collecting the findings of each
+
+    The files are validated over a pool of threads. A file which can't be
+    read or parsed is reported as a finding, so one broken file doesn't stop
+    the others from being validated. Pass the same YamlCache as documents
+    to validate_netenv to parse the NIC templates shared by many
+    environments once.
+
+    :param paths: The files to validate
+    :type  paths: [string]
+
+    :param validator: validate_netenv or validate_instackenv
+    :type  validator: callable
+
+    :param workers: The number of files validated concurrently
+    :type  workers: int
+
+    :param kwargs: The extra arguments of the validator
+    :type  kwargs: dict
+
+    :returns: The findings, by file
+    :rtype: collections.OrderedDict
+    """
+
+    outcomes = utils.concurrent_map(
+        _validate_file, [(path, validator, kwargs) for path in paths],
+        workers)
+
+    return collections.OrderedDict(zip(paths, outcomes))
+
+
+def error_count(findings):
+    return sum(1 for finding in findings if finding.severity == ERROR)
+
+
+def write_json(results, stream):
+    """Write the findings by file as a JSON document"""
+
+    json.dump(
+        collections.OrderedDict(
+            (path, [finding._asdict() for finding in findings])
+            for path, findings in six.iteritems(results)),
+        stream, indent=2)
+    stream.write('\n')
+
+
+def write_junit(results, stream, name='validation'):
+    """Write the findings by file as a JUnit XML report
+
+    Every file is a test suite. Each finding is a failed test case, and a
+    file without findings has a single passing one.
+    """
+
+    suites = ElementTree.Element('testsuites', name=name)
+    for path, findings in six.iteritems(results):
+        suite = ElementTree.SubElement(
+            suites, 'testsuite', name=path, tests=str(max(1, len(findings))),
+            failures=str(error_count(findings)), errors='0')
+        if not findings:
+            ElementTree.SubElement(suite, 'testcase', classname=path,
+                                   name='valid')
+        for finding in findings:
+            case = ElementTree.SubElement(
+                suite, 'testcase', classname=path,
+                name='%s %s' % (finding.rule, finding.path or ''))
+            tag = 'failure' if finding.severity == ERROR else 'system-out'
+            element = ElementTree.SubElement(case, tag)
+            element.text = finding.message
+            if tag == 'failure':
+                element.set('type', finding.rule)
+                element.set('message', finding.message)
+
+    stream.write(ElementTree.tostring(suites).decode('utf-8'))
+    stream.write('\n')
+
+
+def write_report(results, output_format, stream):
+    """Write the findings by file in one of the machine readable FORMATS"""
+
+    if output_format == 'json':
+        write_json(results, stream)
+    elif output_format == 'junit':
+        write_junit(results, stream)
+    else:
+        raise ValueError('Unknown report format: %s' % output_format)
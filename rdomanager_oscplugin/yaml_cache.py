@@ -0,0 +1,93 @@
+#   Copyright 2015 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Parse YAML files once, with the libyaml loader when it is available"""
+
+import logging
+import os
+import threading
+
+from rdomanager_oscplugin import utils
+
+LOG = logging.getLogger(__name__)
+
+# Parsing is mostly CPU bound, so a few threads are enough to overlap the
+# reads.
+DEFAULT_WORKERS = 4
+
+
+def safe_loader():
+    """Return the libyaml safe loader, or the pure Python one without it"""
+
+    import yaml
+
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class YamlCache(object):
+    """Parsed YAML documents, by path
+
+    A document is parsed again only when the mtime or the size of its file
+    changed. The parsed documents are shared between the callers, who must
+    not modify them.
+    """
+
+    def __init__(self):
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        """Return the parsed document of a file
+
+        :raises IOError, OSError: if the file can't be read
+        """
+
+        import yaml
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (stat.st_mtime, stat.st_size)
+
+        with self._lock:
+            cached = self._documents.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        LOG.debug("Parsing %s", path)
+        with open(path, 'r') as f:
+            document = yaml.load(f, Loader=safe_loader())
+
+        with self._lock:
+            self._documents[path] = (key, document)
+        return document
+
+    def _preload(self, path):
+        try:
+            self.load(path)
+        except (IOError, OSError):
+            # Reported when the document is used.
+            pass
+        except Exception as e:
+            LOG.debug("Failed to parse %s: %s", path, e)
+
+    def preload(self, paths, workers=DEFAULT_WORKERS):
+        """Parse many files concurrently, ignoring those that fail
+
+        Each distinct path is parsed once. The errors are raised again by
+        load() when the documents are used.
+        """
+
+        paths = sorted(set(os.path.abspath(path) for path in paths))
+        utils.concurrent_map(self._preload, paths, workers)